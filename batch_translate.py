@@ -0,0 +1,378 @@
+"""
+Headless batch translation for whole directory trees.
+
+Every markdown file found under the given directories (or matching the
+given globs) is translated through one shared concurrency and rate-limit
+budget. The output directory mirrors the input tree. Files whose content
+and translation settings have not changed since the last run are skipped.
+
+Usage:
+    python batch_translate.py docs/ -o translated/
+    python batch_translate.py "docs/**/*.md" -o translated/ --concurrency 8 --rpm 120
+    python batch_translate.py docs/ --plan
+    python batch_translate.py docs/ --tune
+"""
+
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import load_settings, get_provider_settings
+from config.translation_config import TranslationConfig, CONTEXT_MODES, TUNE_APPLY
+from src.job_history import DEFAULT_HISTORY_PATH, LatencyModel, get_job_history
+from src.planner import plan_translation
+from src.rate_limit import RateLimiter
+from src.sharding import get_shard_set
+from src.translator import DocumentTranslator
+
+logger = logging.getLogger("batch_translate")
+
+MANIFEST_NAME = ".infinity_translator_manifest.json"
+# 清单每隔这么久最多写一次（以及批量任务结束时），而不是每个文件写一次
+MANIFEST_SAVE_SECONDS = 10.0
+
+# 只影响速度、不影响译文的配置项，不参与“是否需要重新翻译”的判断
+RUNTIME_ONLY_FIELDS = ("max_concurrent", "max_retries", "retry_delay", "requests_per_minute", "job_history",
+                       "auto_tune", "tune_objective", "max_error_rate", "max_tuned_concurrency",
+                       "max_concurrent_requests")
+# --auto-tune 按任务历史选择的分块设置；调优后的值每次运行都可能不同，不参与判断，实际值记录在清单中
+TUNED_FIELDS = ("chunk_size", "chunk_overlap")
+
+
+def collect_files(inputs: List[str], pattern: str) -> List[Tuple[Path, Path]]:
+    """Return (absolute source path, path relative to its input root) for every input file"""
+    files: Dict[Path, Path] = {}
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            for source in sorted(path.glob(pattern)):
+                if source.is_file():
+                    files.setdefault(source.resolve(), source.relative_to(path))
+        elif glob.has_magic(item):
+            # 以通配符之前的目录作为相对路径的根
+            root_parts = []
+            for part in path.parts:
+                if glob.has_magic(part):
+                    break
+                root_parts.append(part)
+            root = Path(*root_parts) if root_parts else Path('.')
+            for match in sorted(glob.glob(item, recursive=True)):
+                source = Path(match)
+                if source.is_file():
+                    files.setdefault(source.resolve(), source.relative_to(root))
+        elif path.is_file():
+            files.setdefault(path.resolve(), Path(path.name))
+        else:
+            logger.warning(f"No such file or directory: {item}")
+    return sorted(files.items(), key=lambda item: str(item[1]))
+
+
+def settings_fingerprint(provider: str, provider_settings: dict, config: TranslationConfig,
+                         exclude: Tuple[str, ...] = ()) -> str:
+    """Hash of everything that changes the translation output, except the `exclude` config fields"""
+    config_data = {key: value for key, value in asdict(config).items()
+                   if key not in RUNTIME_ONLY_FIELDS and key not in exclude}
+    data = {
+        "provider": provider,
+        "model_name": provider_settings.get("model_name"),
+        "base_url": provider_settings.get("base_url"),
+        "config": config_data,
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def load_manifest(output_dir: Path) -> dict:
+    manifest_path = output_dir / MANIFEST_NAME
+    if manifest_path.is_file():
+        try:
+            return json.loads(manifest_path.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Ignoring unreadable manifest {manifest_path}: {e}")
+    return {}
+
+
+def read_source(source: Path) -> Tuple[bytes, str]:
+    content = source.read_bytes()
+    return content, hashlib.sha256(content).hexdigest()
+
+
+def save_manifest(output_dir: Path, manifest: dict):
+    manifest_path = output_dir / MANIFEST_NAME
+    tmp_path = manifest_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp_path.replace(manifest_path)
+
+
+class BatchStats:
+    def __init__(self):
+        self.translated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.source_chars = 0
+        self.usage: Dict[str, float] = {}
+
+    def add_usage(self, usage: Dict[str, float]):
+        for key, value in usage.items():
+            if key != "cache_hit_rate":
+                self.usage[key] = self.usage.get(key, 0) + value
+
+
+def job_settings(args) -> Tuple[dict, str, dict, TranslationConfig]:
+    """(settings, provider, provider settings, translation config) for the command line arguments"""
+    settings = load_settings()
+    if args.provider:
+        if args.provider not in settings.get("providers", {}):
+            raise SystemExit(f"Unknown provider '{args.provider}'")
+        settings["active_provider"] = args.provider
+    provider, provider_settings = get_provider_settings(settings)
+    provider_settings = dict(provider_settings)
+    if args.model:
+        provider_settings["model_name"] = args.model
+
+    config = TranslationConfig(
+        max_concurrent=args.concurrency or TranslationConfig.max_concurrent,
+        context_mode=args.context_mode,
+        requests_per_minute=args.rpm,
+        target_language=args.target_language or settings.get("target_language"),
+    )
+    if args.chunk_size:
+        config.chunk_size = args.chunk_size
+    if args.memory:
+        config.translation_memory = args.memory
+    config.job_history = settings.get("job_history", str(DEFAULT_HISTORY_PATH)) or None
+    if settings.get("shards") and not args.no_shards:
+        config.shards = settings["shards"]
+    # 全局调度器的总名额（文件逐个翻译时使用），自动调优可以把单个任务的并发调到 max_tuned_concurrency
+    config.max_concurrent_requests = max(config.max_concurrent, config.max_tuned_concurrency if args.auto_tune else 0)
+    if args.auto_tune:
+        tuning = recommended_settings(provider, provider_settings, config)
+        if tuning is not None and tuning.best is not None:
+            # 命令行显式指定的值优先
+            if not args.chunk_size:
+                config.chunk_size, config.chunk_overlap = tuning.chunk_size, tuning.chunk_overlap
+            if not args.concurrency:
+                config.max_concurrent = tuning.max_concurrent
+            logger.info(f"Auto-tuned: chunk_size {config.chunk_size}, concurrency {config.max_concurrent} "
+                        f"({tuning.basis})")
+        if args.max_files == 1 and not args.chunk_size and not args.concurrency:
+            # 文件逐个翻译时每个文件都是独立的任务，可以逐步尝试相邻的设置
+            config.auto_tune = TUNE_APPLY
+    return settings, provider, provider_settings, config
+
+
+def recommended_settings(provider: str, provider_settings: dict, config: TranslationConfig):
+    """Best measured chunk size and concurrency in the job history, or None if it is disabled"""
+    if not config.job_history:
+        return None
+    translator = DocumentTranslator(config, provider=provider, provider_settings=provider_settings)
+    return translator.recommend_settings(explore=False)
+
+
+def print_tuning(args):
+    _, provider, provider_settings, config = job_settings(args)
+    tuning = recommended_settings(provider, provider_settings, config)
+    if tuning is None:
+        print("The job history is disabled (\"job_history\": false in settings)")
+        return
+    print(f"Provider {provider}, model {provider_settings.get('model_name')}, "
+          f"target {config.target_language}, context mode {config.context_mode}")
+    print(f"{'Chunk size':>10} {'Concurrency':>11} {'Jobs':>5} {'Chars/s':>9} {'Chunks/s':>9} {'Errors':>7}")
+    for stats in tuning.settings:
+        print(f"{stats.chunk_size:>10} {stats.concurrency:>11} {stats.jobs:>5} {stats.chars_per_second:>9.0f} "
+              f"{stats.chunks_per_second:>9.2f} {stats.error_rate:>7.1%}")
+    print(f"\nRecommended: chunk_size {tuning.chunk_size}, chunk_overlap {tuning.chunk_overlap}, "
+          f"concurrency {tuning.max_concurrent} ({tuning.basis})")
+
+
+async def run_batch(args) -> BatchStats:
+    settings, provider, provider_settings, config = job_settings(args)
+    shards = None
+    if config.shards:
+        shards = get_shard_set(config.shards, settings.get("providers", {}), config.max_concurrent)
+
+    # 所有文件共用同一个并发和限速预算（多服务商模式下为各分片并发之和）
+    semaphore = asyncio.Semaphore(shards.total_concurrency if shards else config.max_concurrent)
+    if shards:
+        config.max_concurrent_requests = max(config.max_concurrent_requests, shards.total_concurrency)
+    rate_limiter = RateLimiter(config.requests_per_minute) if config.requests_per_minute else None
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    tuned_fields = TUNED_FIELDS if args.auto_tune and not args.chunk_size else ()
+    fingerprint = settings_fingerprint(provider, provider_settings, config, tuned_fields)
+    files = collect_files(args.inputs, args.pattern)
+    stats = BatchStats()
+    file_slots = asyncio.Semaphore(args.max_files)
+    manifest_saved = time.monotonic()
+    manifest_changed = False
+
+    async def update_manifest(key: str, entry: dict):
+        nonlocal manifest_saved, manifest_changed
+        manifest[key] = entry
+        manifest_changed = True
+        if time.monotonic() - manifest_saved >= MANIFEST_SAVE_SECONDS:
+            manifest_saved = time.monotonic()
+            manifest_changed = False
+            await asyncio.to_thread(save_manifest, output_dir, dict(manifest))
+
+    logger.info(f"{len(files)} files, provider {provider}, model {provider_settings.get('model_name')}, "
+                f"target {config.target_language}, concurrency {config.max_concurrent}")
+
+    async def translate_file(source: Path, relative: Path):
+        key = relative.as_posix()
+        target = output_dir / relative
+        entry = manifest.get(key, {})
+
+        # 占到文件名额后才读取和计算哈希，同时在内存中的文件不超过 max_files 个
+        async with file_slots:
+            content, source_hash = await asyncio.to_thread(read_source, source)
+            if (not args.force and target.is_file() and entry.get("source_hash") == source_hash
+                    and entry.get("settings_hash") == fingerprint):
+                stats.skipped += 1
+                return
+
+            # 一次只翻译一个文件时不必共用信号量，任务耗时只取决于本任务的设置，可用于自动调优
+            translator = DocumentTranslator(config, provider=provider, provider_settings=provider_settings,
+                                            semaphore=semaphore if args.max_files > 1 else None,
+                                            rate_limiter=rate_limiter)
+            start = time.perf_counter()
+            try:
+                text = content.decode("utf-8")
+                translated, _ = await translator.translate_document(text, source.name)
+            except Exception as e:
+                stats.failed += 1
+                logger.error(f"Failed: {key}: {e}")
+                return
+            finally:
+                stats.add_usage(translator.usage)
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(translated)
+        entry = {"source_hash": source_hash, "settings_hash": fingerprint}
+        # 自动调优时记录本文件实际使用的分块设置（可能在翻译器内逐个文件调整过）
+        entry.update({field: getattr(translator.config, field) for field in tuned_fields})
+        await update_manifest(key, entry)
+        stats.translated += 1
+        stats.source_chars += len(text)
+        logger.info(f"Translated {key} ({len(text)} chars) in {time.perf_counter() - start:.1f}s")
+
+    try:
+        await asyncio.gather(*[translate_file(source, relative) for source, relative in files])
+    finally:
+        if manifest_changed:
+            save_manifest(output_dir, manifest)
+    return stats
+
+
+async def plan_batch(args) -> Tuple[List[dict], int]:
+    """Plans (sections, chunks, token estimates, projected time) of the input files, without translating"""
+    settings, provider, provider_settings, config = job_settings(args)
+    translator = DocumentTranslator(config, provider=provider, provider_settings=provider_settings)
+    history = config.job_history
+    latency = (get_job_history(history).latency_model(provider, provider_settings.get("model_name"))
+               if history else LatencyModel())
+    plans = []
+    for source, relative in collect_files(args.inputs, args.pattern):
+        with open(source, encoding="utf-8") as lines:
+            # translate_document plans the whole file as one window
+            plan = await plan_translation(translator, lines, latency, source.stat().st_size,
+                                          include_sections=args.plan_json is not None)
+        plans.append(dict(plan, file=relative.as_posix()))
+    return plans, translator.max_concurrent
+
+
+def print_plans(plans: List[dict], concurrency: int):
+    print(f"{'File':40} {'Chars':>10} {'Sections':>8} {'Chunks':>7} {'Requests':>8} "
+          f"{'In tokens':>10} {'Out tokens':>10} {'Est. time':>10}")
+    for plan in plans:
+        print(f"{plan['file'][-40:]:40} {plan['chars']:>10} {plan['sections']:>8} {plan['chunks']:>7} "
+              f"{plan['requests']['total']:>8} {plan['input_tokens']:>10} {plan['output_tokens']:>10} "
+              f"{plan['estimated_seconds']:>9.0f}s")
+    if not plans:
+        return
+    # 所有文件共享并发名额：总时间至少是请求总耗时 / 并发数，也不少于最长的单个文件
+    request_seconds = sum(plan['request_seconds'] for plan in plans)
+    total = max(request_seconds / max(1, concurrency), max(plan['estimated_seconds'] for plan in plans))
+    print(f"\n{len(plans)} files, {sum(plan['requests']['total'] for plan in plans)} requests, "
+          f"about {total / 60:.1f} min with concurrency {concurrency} "
+          f"(latency from {plans[0]['latency']['basis']}), planned in "
+          f"{sum(plan['plan_seconds'] for plan in plans):.2f}s")
+
+
+def print_summary(stats: BatchStats, elapsed: float):
+    usage = stats.usage
+    print("\nBatch translation summary")
+    print(f"  Files translated: {stats.translated}, skipped (unchanged): {stats.skipped}, failed: {stats.failed}")
+    print(f"  Wall time: {elapsed:.1f}s")
+    if elapsed > 0:
+        print(f"  Throughput: {stats.translated / elapsed:.2f} files/s, {stats.source_chars / elapsed:.0f} chars/s")
+    if usage:
+        print(f"  Requests: {int(usage.get('requests', 0))}, "
+              f"prompt tokens: {int(usage.get('prompt_tokens', 0))} (cached {int(usage.get('cached_tokens', 0))}), "
+              f"completion tokens: {int(usage.get('completion_tokens', 0))}")
+        if elapsed > 0:
+            print(f"  Request rate: {usage.get('requests', 0) / elapsed * 60:.1f} requests/min")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Translate markdown files in bulk")
+    parser.add_argument("inputs", nargs="+", help="Directories, files or glob patterns")
+    parser.add_argument("-o", "--output", help="Output directory (mirrors the input tree)")
+    parser.add_argument("--pattern", default="**/*.md", help="Glob used inside input directories")
+    parser.add_argument("--provider", help="Provider from settings.json (default: active_provider)")
+    parser.add_argument("--model", help="Model id (default: the provider's model_name)")
+    parser.add_argument("--target-language", help="Target language code (default: from settings.json)")
+    parser.add_argument("--concurrency", type=int,
+                        help=f"Concurrent LLM requests shared by all files (default {TranslationConfig.max_concurrent})")
+    parser.add_argument("--rpm", type=float, help="Maximum requests per minute shared by all files")
+    parser.add_argument("--max-files", type=int, default=4, help="Files translated at the same time")
+    parser.add_argument("--chunk-size", type=int, help="Override TranslationConfig.chunk_size")
+    parser.add_argument("--context-mode", choices=CONTEXT_MODES, default=TranslationConfig.context_mode)
+    parser.add_argument("--memory", help="Translation memory file reused across runs")
+    parser.add_argument("--force", action="store_true", help="Translate files even if unchanged")
+    parser.add_argument("--no-shards", action="store_true",
+                        help="Ignore the \"shards\" setting and use only the selected provider")
+    parser.add_argument("--plan", action="store_true",
+                        help="Only split the files and print chunk counts, token estimates and projected time")
+    parser.add_argument("--plan-json", metavar="PATH",
+                        help="With --plan, also write the full plans (per-section chunk tokens) as JSON")
+    parser.add_argument("--tune", action="store_true",
+                        help="Print the measured throughput per chunk size and concurrency and the recommended "
+                             "settings from the job history")
+    parser.add_argument("--auto-tune", action="store_true",
+                        help="Use the best measured chunk size and concurrency unless given explicitly; with "
+                             "--max-files 1, also try neighbouring settings file by file")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.tune:
+        print_tuning(args)
+        return 0
+    if args.plan:
+        plans, concurrency = asyncio.run(plan_batch(args))
+        print_plans(plans, concurrency)
+        if args.plan_json:
+            Path(args.plan_json).write_text(json.dumps(plans, ensure_ascii=False, indent=2), encoding="utf-8")
+        return 0
+    if not args.output:
+        parser.error("the following arguments are required: -o/--output")
+    start = time.perf_counter()
+    stats = asyncio.run(run_batch(args))
+    print_summary(stats, time.perf_counter() - start)
+    return 0 if stats.failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
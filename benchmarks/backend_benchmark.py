@@ -0,0 +1,109 @@
+"""
+Compare the LangChain and native LLM backends on the same document.
+
+By default a mock OpenAI-compatible provider (benchmarks/mock_llm_server.py)
+is started locally so the numbers reflect client-side overhead only. Pass
+--base-url/--model/--api-key to benchmark against a real provider.
+
+Usage:
+    python benchmarks/backend_benchmark.py --file docs/README_fr.md
+    python benchmarks/backend_benchmark.py --base-url https://api.siliconflow.cn/v1 --model zai-org/GLM-4.5 --api-key sk-...
+"""
+
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config.translation_config import TranslationConfig  # noqa: E402
+from src.translator import DocumentTranslator  # noqa: E402
+
+
+def find_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mock_server(latency: float):
+    port = find_free_port()
+    process = subprocess.Popen(
+        [sys.executable, str(PROJECT_ROOT / "benchmarks" / "mock_llm_server.py"),
+         "--port", str(port), "--latency", str(latency)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/docs", timeout=1)
+            return process, f"http://127.0.0.1:{port}/v1"
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Mock provider did not start")
+
+
+async def run_backend(backend: str, text: str, args, base_url: str):
+    provider_settings = {
+        "name": f"benchmark ({backend})",
+        "base_url": base_url,
+        "model_name": args.model,
+        "backend": backend,
+    }
+    config = TranslationConfig(max_concurrent=args.concurrency)
+    translator = DocumentTranslator(config, provider="benchmark", provider_settings=provider_settings,
+                                    api_key=args.api_key)
+    start = time.perf_counter()
+    await translator.translate_document(text, "benchmark.md")
+    elapsed = time.perf_counter() - start
+    return elapsed, translator.usage
+
+
+async def run_all(text: str, args, base_url: str):
+    # All rounds share one event loop: LangChain caches its async HTTP client globally
+    for backend in args.backends.split(","):
+        timings = []
+        usage = {}
+        for _ in range(args.rounds):
+            elapsed, usage = await run_backend(backend, text, args, base_url)
+            timings.append(elapsed)
+        print(f"{backend:<10} best {min(timings):7.3f}s  mean {sum(timings) / len(timings):7.3f}s  "
+              f"requests {usage['requests']}  prompt_tokens {usage['prompt_tokens']}  "
+              f"completion_tokens {usage['completion_tokens']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LLM backends against each other")
+    parser.add_argument("--file", default=str(PROJECT_ROOT / "readme.md"), help="Markdown document to translate")
+    parser.add_argument("--backends", default="langchain,native")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=3)
+    parser.add_argument("--base-url", help="Real provider base URL (default: local mock provider)")
+    parser.add_argument("--model", default="mock-model")
+    parser.add_argument("--api-key", default="sk-benchmark")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock provider latency per request")
+    args = parser.parse_args()
+
+    text = Path(args.file).read_text(encoding="utf-8")
+    mock = None
+    base_url = args.base_url
+    if base_url is None:
+        mock, base_url = start_mock_server(args.latency)
+
+    try:
+        asyncio.run(run_all(text, args, base_url))
+    finally:
+        if mock is not None:
+            mock.terminate()
+
+
+if __name__ == "__main__":
+    main()
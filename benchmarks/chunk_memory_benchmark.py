@@ -0,0 +1,79 @@
+"""
+Measure the memory held by chunk bookkeeping for a document.
+
+Compares the previous representation (a list of (section, index, text)
+tuples holding a copy of every chunk) with ChunkTable (offsets into the
+section texts). Only memory allocated while building the chunk list is
+counted, using tracemalloc; the section texts themselves are shared by
+both and excluded.
+
+Usage:
+    python benchmarks/chunk_memory_benchmark.py --chunks 10000
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "benchmarks"))
+
+from config.translation_config import TranslationConfig  # noqa: E402
+from memory_benchmark import PARAGRAPH  # noqa: E402
+from src.chunks import ChunkTable  # noqa: E402
+from src.translator import DocumentTranslator  # noqa: E402
+
+
+def build_tuples(sections, splitter):
+    section_chunks = [splitter.split_text(text) for text in sections]
+    return [(i, j, chunk) for i, chunks in enumerate(section_chunks) for j, chunk in enumerate(chunks)]
+
+
+def build_table(sections, splitter):
+    return ChunkTable.from_sections(sections, splitter)
+
+
+def measure(build, sections, splitter):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(sections, splitter)
+    elapsed = time.perf_counter() - start
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = snapshot.statistics("filename")
+    retained = sum(stat.size for stat in stats)
+    blocks = sum(stat.count for stat in stats)
+    return result, retained, blocks, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory used by chunk records")
+    parser.add_argument("--chunks", type=int, default=10000, help="Approximate number of chunks")
+    parser.add_argument("--chunk-size", type=int, default=TranslationConfig.chunk_size)
+    args = parser.parse_args()
+
+    config = TranslationConfig(chunk_size=args.chunk_size)
+    translator = DocumentTranslator(config, provider="benchmark",
+                                    provider_settings={"base_url": "http://127.0.0.1", "model_name": "m"})
+    splitter = translator.text_splitter
+
+    # 每个章节约 4 个块
+    section_text = PARAGRAPH * max(1, (args.chunk_size * 4) // len(PARAGRAPH))
+    probe = len(splitter.split_text(section_text))
+    sections = [section_text.replace("chunk by chunk", f"chunk by chunk ({i})")
+                for i in range(max(1, args.chunks // probe))]
+
+    print(f"{'representation':<16} {'chunks':>7} {'retained':>11} {'blocks':>8} {'peak':>11} {'time':>8}")
+    for name, build in (("tuples", build_tuples), ("ChunkTable", build_table)):
+        result, retained, blocks, peak, elapsed = measure(build, sections, splitter)
+        print(f"{name:<16} {len(result):>7} {retained / 1024:>9.0f}KB {blocks:>8} {peak / 1024:>9.0f}KB "
+              f"{elapsed:>7.2f}s")
+        del result
+
+
+if __name__ == "__main__":
+    main()
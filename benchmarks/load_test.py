@@ -0,0 +1,329 @@
+"""
+HTTP load test for web_app.py.
+
+Starts a mock LLM provider (benchmarks/mock_llm_server.py) and the web app
+in a separate process, then ramps up simulated users. Each step runs for a
+fixed time with:
+
+- N clients uploading a document to /translate over and over
+- N x --listeners-per-client clients following /translate-progress (SSE)
+- one client changing the target language through /api/set-language
+
+Reported per step: latency percentiles of /translate and the settings
+writes, SSE delivery lag (time between a progress update on the server and
+its arrival at the listener), event loop stalls of the server and its
+memory growth. The server runs with a temporary settings file, so the
+user's settings are not touched.
+
+Results are saved as JSON (benchmarks/results/ by default) so runs of
+different versions can be compared with --compare.
+
+Usage:
+    python benchmarks/load_test.py --clients 1,4,16 --duration 20
+    python benchmarks/load_test.py --compare benchmarks/results/load-old.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "benchmarks"))
+
+from backend_benchmark import find_free_port, start_mock_server  # noqa: E402
+from memory_benchmark import PARAGRAPH  # noqa: E402
+
+LANGUAGES = ("zh-Hans", "ja", "fr", "de")
+HEARTBEAT_INTERVAL = 0.01
+STALL_THRESHOLD = 0.05  # 超过该时长的事件循环阻塞计入 stall_total
+
+
+def percentiles(values, points=(50, 90, 99)) -> dict:
+    if not values:
+        return {f"p{point}": None for point in points} | {"max": None, "count": 0}
+    ordered = sorted(values)
+    result = {f"p{point}": round(ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))], 4)
+              for point in points}
+    result["max"] = round(ordered[-1], 4)
+    result["count"] = len(ordered)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Server side: the web app with a loop monitor, run in its own process
+# ---------------------------------------------------------------------------
+
+def current_rss_mb() -> float:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def serve(port: int, provider_url: str, settings_dir: str):
+    import config.settings as settings_module
+
+    settings_path = Path(settings_dir) / "settings.user.json"
+    settings = settings_module.get_default_settings()
+    settings["providers"] = {"loadtest": {"name": "Load test (mock)", "base_url": provider_url,
+                                          "model_name": "mock-model", "backend": "native",
+                                          "models": [{"id": "mock-model", "name": "mock-model"}]}}
+    settings["active_provider"] = "loadtest"
+    settings["result_store"] = str(Path(settings_dir) / "results")
+    settings["job_history"] = str(Path(settings_dir) / "job_history.json")
+    settings_path.write_text(json.dumps(settings), encoding="utf-8")
+
+    def save_settings(new_settings):
+        settings_path.write_text(json.dumps(new_settings, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    # 在导入 web_app 之前替换设置文件的位置
+    settings_module._settings_paths = lambda: (settings_path,)
+    settings_module.save_settings = save_settings
+
+    import uvicorn
+    import web_app
+
+    lags = []
+
+    async def monitor():
+        while True:
+            expected = time.perf_counter() + HEARTBEAT_INTERVAL
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    @web_app.app.on_event("startup")
+    async def start_monitor():
+        web_app.app.state.load_test_monitor = asyncio.create_task(monitor())
+
+    @web_app.app.post("/_load_test/stats")
+    async def stats(reset: bool = False):
+        data = {
+            "stall": percentiles(lags, (50, 99)),
+            "stall_total": round(sum(lag for lag in lags if lag >= STALL_THRESHOLD), 3),
+            "rss_mb": round(current_rss_mb(), 1),
+        }
+        if reset:
+            lags.clear()
+        return data
+
+    uvicorn.run(web_app.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_web_app(provider_url: str, settings_dir: str):
+    port = find_free_port()
+    process = subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve()), "--serve", str(port),
+         "--provider-url", provider_url, "--settings-dir", settings_dir],
+        cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url + "/api/languages", timeout=1)
+            return process, url
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Web app did not start")
+
+
+# ---------------------------------------------------------------------------
+# Client side
+# ---------------------------------------------------------------------------
+
+def generate_upload(size_kb: int) -> bytes:
+    parts, written, section = [], 0, 0
+    while written < size_kb * 1024:
+        section += 1
+        block = f"## Section {section}\n\n" + PARAGRAPH * 2
+        parts.append(block)
+        written += len(block)
+    return "".join(parts).encode("utf-8")
+
+
+async def uploader(client, url: str, document: bytes, stop: float, results: dict):
+    while time.perf_counter() < stop:
+        start = time.perf_counter()
+        try:
+            response = await client.post(url + "/translate", data={"model_name": "mock-model",
+                                                                   "job_id": uuid.uuid4().hex},
+                                         files={"file": ("load.md", document, "text/markdown")})
+            await response.aread()
+            ok = response.status_code == 200
+        except Exception:
+            ok = False
+        (results["translate"] if ok else results["translate_errors"]).append(time.perf_counter() - start)
+
+
+async def settings_writer(client, url: str, stop: float, results: dict):
+    index = 0
+    while time.perf_counter() < stop:
+        index += 1
+        start = time.perf_counter()
+        try:
+            response = await client.post(url + "/api/set-language",
+                                         json={"language": LANGUAGES[index % len(LANGUAGES)]})
+            ok = response.status_code == 200
+        except Exception:
+            ok = False
+        (results["settings"] if ok else results["settings_errors"]).append(time.perf_counter() - start)
+        await asyncio.sleep(0.2)
+
+
+async def listener(client, url: str, stop: float, results: dict):
+    try:
+        async with client.stream("GET", url + "/translate-progress") as response:
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    event = json.loads(line[5:])
+                    if "timestamp" in event:
+                        results["sse_lag"].append(max(0.0, time.time() - event["timestamp"]))
+                if time.perf_counter() >= stop:
+                    break
+    except Exception:
+        results["sse_errors"].append(1)
+
+
+async def run_step(url: str, clients: int, listeners: int, duration: float, document: bytes) -> dict:
+    import httpx
+
+    results = {key: [] for key in ("translate", "translate_errors", "settings", "settings_errors",
+                                   "sse_lag", "sse_errors")}
+    limits = httpx.Limits(max_connections=clients + listeners + 8)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(300.0), limits=limits) as client:
+        before = (await client.post(url + "/_load_test/stats", params={"reset": True})).json()
+        stop = time.perf_counter() + duration
+        listener_tasks = [asyncio.create_task(listener(client, url, stop, results)) for _ in range(listeners)]
+        await asyncio.gather(*[uploader(client, url, document, stop, results) for _ in range(clients)],
+                             settings_writer(client, url, stop, results))
+        elapsed = time.perf_counter() - stop + duration
+        for task in listener_tasks:
+            task.cancel()
+        await asyncio.gather(*listener_tasks, return_exceptions=True)
+        after = (await client.post(url + "/_load_test/stats", params={"reset": True})).json()
+
+    return {
+        "clients": clients,
+        "listeners": listeners,
+        "seconds": round(elapsed, 2),
+        "uploads_per_second": round(len(results["translate"]) / elapsed, 3),
+        "translate_latency": percentiles(results["translate"]),
+        "translate_errors": len(results["translate_errors"]),
+        "settings_latency": percentiles(results["settings"]),
+        "settings_errors": len(results["settings_errors"]),
+        "sse_lag": percentiles(results["sse_lag"]),
+        "sse_errors": len(results["sse_errors"]),
+        "loop_stall": after["stall"],
+        "loop_stall_total": after["stall_total"],
+        "rss_mb": after["rss_mb"],
+        "rss_growth_mb": round(after["rss_mb"] - before["rss_mb"], 1),
+    }
+
+
+def print_step(step: dict, baseline: dict = None):
+    def fmt(value, unit="s"):
+        return "-" if value is None else (f"{value * 1000:.0f}ms" if unit == "s" else f"{value}")
+
+    def delta(key, sub):
+        if baseline is None or baseline.get(key, {}).get(sub) in (None, 0) or step[key][sub] is None:
+            return ""
+        return f" ({(step[key][sub] / baseline[key][sub] - 1) * 100:+.0f}%)"
+
+    print(f"\n{step['clients']} uploaders, {step['listeners']} SSE listeners, {step['seconds']}s")
+    print(f"  /translate        p50 {fmt(step['translate_latency']['p50'])} p99 {fmt(step['translate_latency']['p99'])}"
+          f"{delta('translate_latency', 'p99')}  {step['uploads_per_second']} uploads/s, "
+          f"{step['translate_errors']} errors")
+    print(f"  /api/set-language p50 {fmt(step['settings_latency']['p50'])} p99 {fmt(step['settings_latency']['p99'])}"
+          f"{delta('settings_latency', 'p99')}  {step['settings_errors']} errors")
+    print(f"  SSE lag           p50 {fmt(step['sse_lag']['p50'])} p99 {fmt(step['sse_lag']['p99'])}"
+          f"{delta('sse_lag', 'p99')}  {step['sse_lag']['count']} events, {step['sse_errors']} errors")
+    print(f"  loop stall        p99 {fmt(step['loop_stall']['p99'])} max {fmt(step['loop_stall']['max'])}"
+          f"{delta('loop_stall', 'max')}  total >= {STALL_THRESHOLD * 1000:.0f}ms: {step['loop_stall_total']}s")
+    print(f"  server RSS        {step['rss_mb']}MB ({step['rss_growth_mb']:+.1f}MB during the step)")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the web app against a mock provider")
+    parser.add_argument("--clients", default="1,4,16", help="Comma-separated numbers of concurrent uploaders")
+    parser.add_argument("--listeners-per-client", type=int, default=4, help="SSE listeners per uploader")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per step")
+    parser.add_argument("--size", type=int, default=20, help="Uploaded document size in KB")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock provider latency per request")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/load-<revision>-<time>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare with")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--provider-url", help=argparse.SUPPRESS)
+    parser.add_argument("--settings-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.provider_url, args.settings_dir)
+        return
+
+    import logging
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    baseline = {}
+    if args.compare:
+        baseline = {step["clients"]: step for step in json.loads(Path(args.compare).read_text())["steps"]}
+
+    document = generate_upload(args.size)
+    mock, provider_url = start_mock_server(args.latency)
+    with tempfile.TemporaryDirectory() as settings_dir:
+        server, url = start_web_app(provider_url, settings_dir)
+        try:
+            steps = []
+            for clients in [int(value) for value in args.clients.split(",")]:
+                step = asyncio.run(run_step(url, clients, clients * args.listeners_per_client,
+                                            args.duration, document))
+                print_step(step, baseline.get(clients))
+                steps.append(step)
+        finally:
+            server.terminate()
+            mock.terminate()
+
+    result = {
+        "revision": git_revision(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "parameters": {"size_kb": args.size, "latency": args.latency, "duration": args.duration,
+                       "listeners_per_client": args.listeners_per_client},
+        "steps": steps,
+    }
+    output = Path(args.output) if args.output else (
+        PROJECT_ROOT / "benchmarks" / "results" / f"load-{result['revision']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    print(f"\nResults saved to {output}")
+    if args.compare:
+        print(f"Compared with {args.compare} (revision {json.loads(Path(args.compare).read_text())['revision']})")
+
+
+if __name__ == "__main__":
+    main()
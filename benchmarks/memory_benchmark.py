@@ -0,0 +1,125 @@
+"""
+Measure peak memory (RSS) of whole-document vs streaming translation.
+
+Synthetic markdown documents of the given sizes are generated and
+translated through a local mock provider (benchmarks/mock_llm_server.py),
+each run in its own process so peak RSS is measured independently:
+
+- document: read the whole file, translate_document(), write the result
+- stream:   translate_stream() reading line by line and writing to a file
+
+Usage:
+    python benchmarks/memory_benchmark.py --sizes 1,5,20
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "benchmarks"))
+
+from backend_benchmark import start_mock_server  # noqa: E402
+
+MODES = ("document", "stream")
+
+PARAGRAPH = (
+    "Large language models translate long documents chunk by chunk. Each chunk is sent "
+    "with a short instruction prefix, and the results are assembled in the original order. "
+    "Formatting such as `inline code`, [links](https://example.com) and lists must survive.\n\n"
+    "- The first item of a list\n- The second item of a list\n\n"
+)
+
+
+def generate_document(path: Path, size_mb: float):
+    """Write a markdown document of about `size_mb` megabytes with a header every few paragraphs"""
+    target = int(size_mb * 1024 * 1024)
+    written = 0
+    section = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            section += 1
+            block = f"## Section {section}\n\n" + PARAGRAPH * 8
+            if section % 10 == 1:
+                block = f"# Part {section // 10 + 1}\n\n" + block
+            f.write(block)
+            written += len(block)
+
+
+def peak_rss_mb() -> float:
+    # Linux 上 ru_maxrss 以 KB 为单位，macOS 上以字节为单位
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+async def translate(mode: str, source: Path, target: Path, base_url: str):
+    from config.translation_config import TranslationConfig
+    from src.translator import DocumentTranslator
+
+    provider_settings = {"name": "benchmark", "base_url": base_url, "model_name": "mock-model", "backend": "native"}
+    translator = DocumentTranslator(TranslationConfig(max_concurrent=8, context_mode="source"),
+                                    provider="benchmark", provider_settings=provider_settings,
+                                    api_key="sk-benchmark")
+    if mode == "document":
+        text = source.read_text(encoding="utf-8")
+        content, _ = await translator.translate_document(text, source.name)
+        target.write_bytes(content)
+    else:
+        with open(source, encoding="utf-8") as lines, open(target, "wb") as output:
+            await translator.translate_stream(lines, source.name, output, source.stat().st_size)
+    return translator.usage["requests"]
+
+
+def run_worker(args):
+    import logging
+    logging.disable(logging.INFO)
+    start = time.perf_counter()
+    requests = asyncio.run(translate(args.worker, Path(args.source), Path(args.target), args.base_url))
+    print(json.dumps({"seconds": time.perf_counter() - start, "peak_rss_mb": peak_rss_mb(), "requests": requests}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of document and streaming translation")
+    parser.add_argument("--sizes", default="1,5,20", help="Comma-separated document sizes in MB")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--source", help=argparse.SUPPRESS)
+    parser.add_argument("--target", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    mock, base_url = start_mock_server(0.0)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"{'size':>8} {'mode':<10} {'peak RSS':>10} {'time':>9} {'requests':>9}")
+            for size in [float(s) for s in args.sizes.split(",")]:
+                source = Path(tmp) / f"document_{size:g}mb.md"
+                generate_document(source, size)
+                for mode in args.modes.split(","):
+                    target = Path(tmp) / f"translated_{mode}.md"
+                    result = subprocess.run(
+                        [sys.executable, __file__, "--worker", mode, "--source", str(source),
+                         "--target", str(target), "--base-url", base_url],
+                        capture_output=True, text=True, check=True,
+                    )
+                    stats = json.loads(result.stdout.strip().splitlines()[-1])
+                    print(f"{size:>6g}MB {mode:<10} {stats['peak_rss_mb']:>8.1f}MB {stats['seconds']:>8.1f}s "
+                          f"{stats['requests']:>9}")
+                source.unlink()
+    finally:
+        mock.terminate()
+
+
+if __name__ == "__main__":
+    main()
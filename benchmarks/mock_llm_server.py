@@ -0,0 +1,195 @@
+"""
+Mock OpenAI-compatible provider used by the benchmarks.
+
+It serves POST /v1/chat/completions (plain and streaming). The "translation"
+is the text after the last "Text to be translated:" line (or the JSON array
+after "Segments to be translated") in the prompt with every word replaced:
+by one CJK character when the system prompt asks for Chinese, Japanese,
+Korean or Thai, otherwise by the reversed word. Placeholders, URLs, JSON
+escapes and markdown markup are kept, so the output has the same structure
+as the input. Latency is simulated with a fixed delay per request plus a
+delay per generated token.
+
+With --key-rpm, each API key (Authorization header) may send that many
+requests per minute; further requests get 429 with Retry-After. Keys listed
+in --reject-keys get 401. With --stall-rate, that fraction of streamed
+responses stops sending after the first half of the pieces. With
+--fault-rate, that fraction of single-chunk responses is broken (truncated,
+returned untranslated, or missing placeholders); requests that say an earlier
+translation was rejected are always answered correctly.
+
+Usage:
+    python benchmarks/mock_llm_server.py --port 9100 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import random
+import re
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+app = FastAPI(title="Mock LLM provider")
+app.state.latency = 0.2
+app.state.token_delay = 0.0
+app.state.key_rpm = None
+app.state.reject_keys = set()
+app.state.stall_rate = 0.0
+app.state.fault_rate = 0.0
+# 每个密钥最近一分钟内的请求时间
+key_requests = collections.defaultdict(collections.deque)
+
+
+MARKERS = ("Text to be translated", "Segments to be translated")
+
+
+def extract_text(prompt: str) -> str:
+    # The text to translate follows the last marker line
+    position = max(prompt.rfind(marker) for marker in MARKERS)
+    if position == -1:
+        return prompt
+    return prompt[position:].split("\n", 1)[-1].strip()
+
+
+WIDE_LANGUAGES = ("Chinese", "Japanese", "Korean", "Thai")
+_WORD_PATTERN = re.compile(r'\\u[0-9a-fA-F]{4}|\\.|__[A-Z_]+_\d+__|https?://[^\s)"\]]+|([A-Za-z]+)')
+_PLACEHOLDER_PATTERN = re.compile(r'__[A-Z_]+_\d+__')
+
+
+def pseudo_translate(text: str, wide: bool) -> str:
+    def word(match):
+        if match.group(1) is None:
+            return match.group()
+        if wide:
+            return chr(0x4e00 + sum(map(ord, match.group(1))) % 0x5000)
+        return match.group(1)[::-1]
+    return _WORD_PATTERN.sub(word, text)
+
+
+def break_translation(source: str, translation: str) -> str:
+    fault = random.choice(("truncated", "untranslated", "placeholders"))
+    if fault == "truncated":
+        return translation[:len(translation) // 3]
+    if fault == "untranslated":
+        return source
+    return _PLACEHOLDER_PATTERN.sub("", translation)
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def usage_for(prompt: str, completion: str) -> dict:
+    prompt_tokens = count_tokens(prompt)
+    completion_tokens = count_tokens(completion)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def check_key(request: Request):
+    """Error response for a rejected or rate limited key, or None"""
+    key = request.headers.get("authorization", "").removeprefix("Bearer ")
+    if key in app.state.reject_keys:
+        return JSONResponse({"error": {"message": "Invalid API key"}}, status_code=401)
+    if app.state.key_rpm:
+        now = time.monotonic()
+        recent = key_requests[key]
+        while recent and recent[0] <= now - 60:
+            recent.popleft()
+        if len(recent) >= app.state.key_rpm:
+            retry_after = max(1, int(recent[0] + 60 - now) + 1)
+            return JSONResponse({"error": {"message": "Rate limit exceeded"}}, status_code=429,
+                                headers={"Retry-After": str(retry_after)})
+        recent.append(now)
+    return None
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    error = check_key(request)
+    if error is not None:
+        return error
+    body = await request.json()
+    prompt = "\n".join(message.get("content", "") for message in body.get("messages", []))
+    system = "\n".join(message.get("content", "") for message in body.get("messages", [])
+                       if message.get("role") == "system")
+    source = extract_text(prompt)
+    completion = pseudo_translate(source, any(language in system for language in WIDE_LANGUAGES))
+    if random.random() < app.state.fault_rate and "was rejected" not in prompt and not source.startswith("["):
+        completion = break_translation(source, completion)
+    model = body.get("model", "mock")
+    created = int(time.time())
+
+    await asyncio.sleep(app.state.latency)
+
+    if not body.get("stream"):
+        return JSONResponse({
+            "id": "mock-completion",
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": completion}, "finish_reason": "stop"}],
+            "usage": usage_for(prompt, completion),
+        })
+
+    async def event_stream():
+        pieces = [completion[i:i + 16] for i in range(0, len(completion), 16)] or [""]
+        stall_at = max(1, len(pieces) // 2) if random.random() < app.state.stall_rate else None
+        for index, piece in enumerate(pieces):
+            if index == stall_at:
+                await asyncio.sleep(3600)
+            if app.state.token_delay:
+                await asyncio.sleep(app.state.token_delay)
+            chunk = {
+                "id": "mock-completion",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        final = {
+            "id": "mock-completion",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [],
+            "usage": usage_for(prompt, completion),
+        }
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI-compatible provider")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds of delay per request")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds of delay per streamed piece")
+    parser.add_argument("--key-rpm", type=int, default=None, help="Requests per minute allowed per API key")
+    parser.add_argument("--reject-keys", default="", help="Comma-separated API keys answered with 401")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Fraction of streams that stop halfway")
+    parser.add_argument("--fault-rate", type=float, default=0.0,
+                        help="Fraction of responses that are truncated, untranslated or miss placeholders")
+    args = parser.parse_args()
+
+    app.state.latency = args.latency
+    app.state.token_delay = args.token_delay
+    app.state.key_rpm = args.key_rpm
+    app.state.reject_keys = {key for key in args.reject_keys.split(",") if key}
+    app.state.stall_rate = args.stall_rate
+    app.state.fault_rate = args.fault_rate
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Measure time to first LLM request and event loop stalls for large documents,
+with preprocessing done inline or in the process pool.
+
+No provider is needed: the translation is cancelled as soon as the first
+request would be sent. A heartbeat task records the longest time the event
+loop was blocked while the document was being prepared.
+
+Usage:
+    python benchmarks/prep_benchmark.py --size 20 --workers 1,4
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "benchmarks"))
+
+from config.translation_config import TranslationConfig  # noqa: E402
+from memory_benchmark import generate_document  # noqa: E402
+from src.cancellation import CancellationToken, TranslationCancelled  # noqa: E402
+from src.preprocessing import get_process_pool  # noqa: E402
+from src.translator import DocumentTranslator  # noqa: E402
+
+
+class FirstRequestProbe(DocumentTranslator):
+    """Records when the first request would be sent, then cancels the job"""
+    first_request = None
+
+    async def complete(self, *args, **kwargs):
+        if self.first_request is None:
+            self.first_request = time.perf_counter()
+            self.cancel_token.cancel("first request reached")
+        await asyncio.sleep(3600)
+
+
+async def heartbeat(ticks: list, interval: float = 0.01):
+    while True:
+        ticks.append(time.perf_counter())
+        await asyncio.sleep(interval)
+
+
+def longest_stall(ticks: list, interval: float = 0.01) -> float:
+    ticks = ticks + [time.perf_counter()]
+    return max((b - a - interval for a, b in zip(ticks, ticks[1:])), default=0.0)
+
+
+async def run(mode: str, workers: int, path: Path):
+    config = TranslationConfig(prep_workers=workers, target_language="zh-Hans")
+    translator = FirstRequestProbe(config, provider="benchmark",
+                                   provider_settings={"base_url": "http://127.0.0.1", "model_name": "m"})
+    ticks = []
+    beat = asyncio.create_task(heartbeat(ticks))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    try:
+        if mode == "document":
+            text = path.read_text(encoding="utf-8")
+            start = time.perf_counter()
+            await translator.translate_document(text, path.name, CancellationToken())
+        else:
+            with open(path, encoding="utf-8") as lines, tempfile.TemporaryFile() as output:
+                await translator.translate_stream(lines, path.name, output, path.stat().st_size,
+                                                  CancellationToken())
+    except TranslationCancelled:
+        pass
+    finally:
+        beat.cancel()
+    return translator.first_request - start, longest_stall(ticks)
+
+
+async def main_async(args, path: Path):
+    worker_counts = [int(w) for w in args.workers.split(",")]
+    # 进程池预先启动，结果不包含进程创建时间（服务常驻时只需创建一次）
+    for workers in worker_counts:
+        if workers > 1:
+            pool = get_process_pool(workers)
+            await asyncio.gather(*[asyncio.get_running_loop().run_in_executor(pool, time.sleep, 0.1)
+                                   for _ in range(workers)])
+        for mode in args.modes.split(","):
+            first_request, stall = await run(mode, workers, path)
+            print(f"{mode:<10} {workers:>7} {first_request:>18.2f}s {stall * 1000:>15.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to first request with inline vs pooled preprocessing")
+    parser.add_argument("--size", type=float, default=20, help="Document size in MB")
+    parser.add_argument("--workers", default="1,4", help="Comma-separated worker counts (1 = inline)")
+    parser.add_argument("--modes", default="document,stream")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "document.md"
+        generate_document(path, args.size)
+        print(f"{'mode':<10} {'workers':>7} {'first request after':>19} {'max loop stall':>17}")
+        asyncio.run(main_async(args, path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Startup benchmark for Infinity Translator.
+
+Measures, over several cold runs:
+  - import time of the web_app module (source builds only)
+  - time from process launch to the first successful `GET /` response
+
+Usage:
+    python benchmarks/startup_benchmark.py                      # source build
+    python benchmarks/startup_benchmark.py --frozen dist/infinity_translator_v2/infinity_translator.exe
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import web_app; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def find_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import_time() -> float:
+    """Import web_app in a fresh interpreter and return the import time in seconds"""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure_first_response(command, timeout: float) -> float:
+    """Launch the server and return the seconds until `GET /` answers with 200"""
+    port = find_free_port()
+    env = dict(os.environ, INFINITY_TRANSLATOR_PORT=str(port))
+    url = f"http://127.0.0.1:{port}/"
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command,
+        cwd=PROJECT_ROOT,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited early with code {process.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                time.sleep(0.02)
+        raise TimeoutError(f"No response from {url} within {timeout}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def summarize(name: str, samples) -> None:
+    print(f"{name:<28} median {statistics.median(samples):7.3f}s  "
+          f"min {min(samples):7.3f}s  max {max(samples):7.3f}s  (n={len(samples)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start time of Infinity Translator")
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold starts to measure")
+    parser.add_argument("--frozen", help="Path to a PyInstaller executable to benchmark instead of the source tree")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for the first response")
+    args = parser.parse_args()
+
+    if args.frozen:
+        command = [str(Path(args.frozen).resolve())]
+        print(f"Benchmarking frozen build: {command[0]}")
+    else:
+        command = [sys.executable, "web_app.py"]
+        print(f"Benchmarking source build with {sys.executable}")
+        summarize("import web_app", [measure_import_time() for _ in range(args.runs)])
+
+    summarize("launch -> first GET /", [measure_first_response(command, args.timeout) for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
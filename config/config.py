@@ -1,22 +1,9 @@
 import os
-import sys
 from pathlib import Path
+from typing import List
 from dotenv import load_dotenv
 
-def get_resource_path(relative_path):
-    """Get absolute path to resource, works for dev and for PyInstaller"""
-    try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        base_path = sys._MEIPASS
-        print(f"Using PyInstaller MEIPASS path: {base_path}")
-    except AttributeError:
-        # Running in development mode
-        base_path = Path(__file__).parent.parent.absolute()
-        print(f"Using development path: {base_path}")
-    
-    full_path = Path(base_path) / relative_path
-    print(f"Resource path for '{relative_path}': {full_path} (exists: {full_path.exists()})")
-    return full_path
+from config.paths import get_resource_path
 
 def load_environment():
     """Load environment variables from .env file"""
@@ -36,8 +23,37 @@ def load_environment():
 # Load environment variables
 load_environment()
 
-SILICONFLOW_API_KEY = os.getenv("SILICONFLOW_API_KEY")
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+def load_api_keys(name: str) -> List[str]:
+    """
+    All keys configured for `name`, e.g. SILICONFLOW_API_KEY.
+
+    Several keys can be given comma-separated in NAME or NAMES, or one per
+    variable as NAME_1, NAME_2, ...; duplicates are removed.
+    """
+    values = [os.getenv(name), os.getenv(name + "S")]
+    index = 1
+    while os.getenv(f"{name}_{index}"):
+        values.append(os.getenv(f"{name}_{index}"))
+        index += 1
+    keys = []
+    for value in values:
+        for key in (value or "").split(","):
+            key = key.strip().strip('"\'')
+            if key and key not in keys:
+                keys.append(key)
+    return keys
+
+SILICONFLOW_API_KEYS = load_api_keys("SILICONFLOW_API_KEY")
+OPENROUTER_API_KEYS = load_api_keys("OPENROUTER_API_KEY")
+
+def get_api_keys(provider: str) -> List[str]:
+    """Key pool for a provider: <PROVIDER>_API_KEY, falling back to the OpenRouter keys"""
+    if provider == 'siliconflow':
+        return SILICONFLOW_API_KEYS
+    return load_api_keys(f"{provider.upper().replace('-', '_')}_API_KEY") or OPENROUTER_API_KEYS
+
+SILICONFLOW_API_KEY = SILICONFLOW_API_KEYS[0] if SILICONFLOW_API_KEYS else None
+OPENROUTER_API_KEY = OPENROUTER_API_KEYS[0] if OPENROUTER_API_KEYS else None
 
 if not SILICONFLOW_API_KEY and not OPENROUTER_API_KEY:
     print("Warning: No API keys found. Please configure API keys in the .env file or environment variables.")
@@ -0,0 +1,20 @@
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+
+@lru_cache(maxsize=1)
+def get_base_path() -> Path:
+    """Return the application root, works for dev and for PyInstaller"""
+    # PyInstaller creates a temp folder and stores path in _MEIPASS
+    base_path = getattr(sys, '_MEIPASS', None)
+    if base_path is not None:
+        return Path(base_path)
+    # Running in development mode
+    return Path(__file__).parent.parent.absolute()
+
+
+@lru_cache(maxsize=None)
+def get_resource_path(relative_path: str) -> Path:
+    """Get absolute path to resource (cached, does not touch the filesystem)"""
+    return get_base_path() / relative_path
@@ -1,27 +1,16 @@
 import json
-import os
-import sys
+import logging
+from functools import lru_cache
 from pathlib import Path
 
-def get_resource_path(relative_path):
-    """Get absolute path to resource, works for dev and for PyInstaller"""
-    try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        base_path = sys._MEIPASS
-        print(f"Settings: Using PyInstaller MEIPASS path: {base_path}")
-    except AttributeError:
-        # Running in development mode
-        base_path = Path(__file__).parent.parent.absolute()
-        print(f"Settings: Using development path: {base_path}")
-    
-    full_path = Path(base_path) / relative_path
-    print(f"Settings: Resource path for '{relative_path}': {full_path} (exists: {full_path.exists()})")
-    return full_path
+from config.paths import get_resource_path
 
-def load_settings():
-    """Load settings from settings.json file"""
-    # Try multiple possible locations for settings.json
-    settings_paths = [
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=1)
+def _settings_paths():
+    """Candidate settings files in priority order (resolved once per process)"""
+    return (
         get_resource_path('config/settings.user.json'),  # User custom settings (highest priority)
         Path(__file__).parent / 'settings.user.json',
         Path('config/settings.user.json'),
@@ -29,12 +18,12 @@ def load_settings():
         Path(__file__).parent / 'settings.json',
         Path('config/settings.json'),
         Path('settings.json')
-    ]
-    
-    print("Attempting to load settings from the following paths:")
-    for settings_path in settings_paths:
-        print(f"  - {settings_path} (exists: {settings_path.exists()})")
-        if settings_path.exists():
+    )
+
+def load_settings():
+    """Load settings from settings.json file"""
+    for settings_path in _settings_paths():
+        if settings_path.is_file():
             try:
                 with open(settings_path, 'r', encoding='utf-8') as f:
                     content = f.read()
@@ -57,7 +46,7 @@ def load_settings():
                     
                     cleaned_content = '\n'.join(cleaned_lines)
                     settings = json.loads(cleaned_content)
-                    print(f"Successfully loaded settings from {settings_path}")
+                    logger.debug(f"Loaded settings from {settings_path}")
                     return settings
             except (json.JSONDecodeError, IOError) as e:
                 print(f"Warning: Could not load settings from {settings_path}: {e}")
@@ -80,7 +69,8 @@ def get_default_settings():
                         "name": "Google/Gemini-2.0-flash"
                     }
                 ],
-                "model_name": "google/gemini-2.0-flash-001"
+                "model_name": "google/gemini-2.0-flash-001",
+                "backend": "langchain"
             }
         },
         "target_language": "zh-Hans",
@@ -1,15 +1,62 @@
 from dataclasses import dataclass
 from typing import Dict, Any, Optional, List
 
+# 上下文模式：只有 sequential 需要等待上一块的译文，其余模式下各块可以并行翻译
+CONTEXT_SEQUENTIAL = "sequential"  # 前文译文（原有行为）
+CONTEXT_SOURCE = "source"  # 前文原文
+CONTEXT_SUMMARY = "summary"  # 预先为每个章节生成的摘要
+CONTEXT_GLOSSARY = "glossary"  # 不带上下文，仅使用术语表
+CONTEXT_MODES = (CONTEXT_SEQUENTIAL, CONTEXT_SOURCE, CONTEXT_SUMMARY, CONTEXT_GLOSSARY)
+
+# 自动调优：根据任务历史选择 chunk_size 和并发数
+TUNE_OFF = "off"
+TUNE_RECOMMEND = "recommend"  # 只在日志和 /api/tuning 中给出建议
+TUNE_APPLY = "apply"  # 使用建议的设置，并逐步尝试相邻的设置
+TUNE_MODES = (TUNE_OFF, TUNE_RECOMMEND, TUNE_APPLY)
+TUNE_CHARS = "chars"  # 最大化每秒翻译的原文字符数
+TUNE_CHUNKS = "chunks"  # 最大化每秒完成的块数
+TUNE_OBJECTIVES = (TUNE_CHARS, TUNE_CHUNKS)
+
 @dataclass
 class TranslationConfig:
     chunk_size: int = 2000
     chunk_overlap: int = 200
     temperature: float = 0.1
     context_window: int = 2  # 保持多少个前文段落作为上下文
+    context_mode: str = CONTEXT_SEQUENTIAL  # 上下文模式，见 CONTEXT_MODES
     preserve_formatting: bool = True
     custom_separators: Optional[List[str]] = None
     glossary: Optional[Dict[str, str]] = None  # 术语表
     max_concurrent: int = 3  # 最大并发数
     max_retries: int = 3  # 最大重试次数
     retry_delay: float = 2.0  # 重试延迟
+    requests_per_minute: Optional[float] = None  # 请求速率上限，为空表示不限速
+    target_language: Optional[str] = None  # 为空时使用 settings 中的 target_language
+    batch_small_chunks: bool = True  # 将多个短块合并为一次请求
+    batch_threshold: int = 400  # 短于该长度的块才会被合并
+    batch_max_segments: int = 10  # 每次请求最多合并的块数
+    translation_memory: Optional[str] = None  # 翻译记忆库文件路径，为空表示不使用
+    stream_window_chars: int = 200000  # 流式翻译时每批处理的原文字符数，处理完即写出并释放
+    prep_workers: Optional[int] = None  # 预处理（分割、切块）的进程数，为空时自动选择，1 表示不使用进程池
+    parallel_prep_min_chars: int = 1000000  # 文档达到该长度才使用进程池预处理
+    memory_threshold: float = 0.7  # 相似度（估计的 Jaccard）达到该值才使用记忆库中的译文
+    shards: Optional[List[Dict[str, Any]]] = None  # 多服务商模式的分片（服务商、模型、权重、并发），为空表示只用当前服务商
+    trace: bool = False  # 记录每个块、每个章节各阶段的耗时
+    profile: bool = False  # 用 cProfile 分析整个任务
+    job_id: Optional[str] = None  # 任务标识，用于按任务推送进度和调度
+    client_id: Optional[str] = None  # 提交任务的客户端，调度器在客户端之间公平分配请求
+    priority: Optional[str] = None  # interactive 或 bulk，为空时按文档长度选择
+    client_max_concurrent: Optional[int] = None  # 每个客户端同时进行的请求数上限，为空表示不限
+    max_concurrent_requests: Optional[int] = None  # 所有任务共用的请求名额（全局调度器容量），为空时保持不变
+    stream_responses: bool = True  # 以流式方式接收模型输出（实时预览、首 token 时间和卡顿检测）
+    stream_first_token_timeout: float = 60.0  # 等待第一个 token 的最长时间（秒）
+    stream_stall_timeout: float = 20.0  # 两个 token 之间的最长间隔，超过即中止并重试
+    validate_output: bool = True  # 检查每块译文（长度比例、目标语言文字、占位符和链接、Markdown 结构），不通过的重新翻译
+    validation_retries: int = 1  # 未通过校验的块最多重新翻译几次
+    min_length_ratio: float = 0.3  # 译文与原文估计 token 数之比的下限
+    max_length_ratio: float = 3.0  # 译文与原文估计 token 数之比的上限
+    job_history: Optional[str] = None  # 任务历史文件，记录请求耗时和生成速度供 /plan 估算，为空表示不记录
+    auto_tune: str = TUNE_OFF  # 见 TUNE_MODES，需要 job_history
+    tune_objective: str = TUNE_CHARS  # 见 TUNE_OBJECTIVES
+    max_error_rate: float = 0.02  # 失败请求和未通过校验的块超过该比例的设置不会被选用
+    max_tuned_concurrency: int = 8  # 自动调优时并发数的上限
@@ -95,4 +95,7 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    # Worker processes (document preprocessing) re-run the entry point when frozen by PyInstaller
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -38,6 +38,7 @@ a = Analysis(
         'python-multipart',
         'tiktoken',
         'tenacity',
+        'httpx',
         'uvicorn.logging',
         'uvicorn.lifespan',
         'uvicorn.lifespan.on',
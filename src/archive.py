@@ -0,0 +1,93 @@
+from typing import BinaryIO, Iterator, Optional
+import io
+import logging
+import shutil
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+MARKDOWN_SUFFIXES = ('.md', '.markdown')
+COPY_BLOCK = 1 << 20
+# 超过该大小的条目直接使用 ZIP64（写入前不知道译文的最终大小）
+ZIP64_MIN_SIZE = 1 << 30
+_COMPRESSION = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA)
+
+
+def is_archive(filename: Optional[str], fileobj: BinaryIO) -> bool:
+    """True for a .zip upload that really is a zip file (the position of `fileobj` is kept)"""
+    if not filename or not filename.lower().endswith('.zip'):
+        return False
+    position = fileobj.tell()
+    try:
+        return zipfile.is_zipfile(fileobj)
+    finally:
+        fileobj.seek(position)
+
+
+def is_markdown(info: zipfile.ZipInfo) -> bool:
+    return not info.is_dir() and info.filename.lower().endswith(MARKDOWN_SUFFIXES)
+
+
+def entry_lines(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> Iterator[str]:
+    """Lines of a markdown entry, decompressed as they are read"""
+    with archive.open(info) as raw:
+        try:
+            yield from io.TextIOWrapper(raw, encoding='utf-8')
+        except UnicodeDecodeError as e:
+            raise ValueError(f"{info.filename} is not UTF-8 text") from e
+
+
+def _output_info(info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+    """Same name, date and permissions as the input entry"""
+    output = zipfile.ZipInfo(info.filename, info.date_time)
+    output.external_attr = info.external_attr
+    output.compress_type = info.compress_type if info.compress_type in _COMPRESSION else zipfile.ZIP_DEFLATED
+    return output
+
+
+def copy_entry(archive: zipfile.ZipFile, info: zipfile.ZipInfo, output: zipfile.ZipFile):
+    """Copy an entry (image, stylesheet, directory, ...) unchanged"""
+    if info.is_dir():
+        output.writestr(_output_info(info), b'')
+        return
+    with archive.open(info) as source, \
+            output.open(_output_info(info), 'w', force_zip64=info.file_size >= ZIP64_MIN_SIZE) as target:
+        shutil.copyfileobj(source, target, COPY_BLOCK)
+
+
+class ArchiveWriter:
+    """
+    Output zip written incrementally, with the layout of the input.
+
+    zipfile allows only one entry to be open for writing. Translated
+    documents are finished in input order, so only the document that spans
+    the end of a translation window stays open between windows.
+    """
+
+    def __init__(self, output: BinaryIO):
+        self.zip = zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED)
+        self._current: Optional[zipfile.ZipInfo] = None
+        self._handle = None
+
+    def copy(self, archive: zipfile.ZipFile, info: zipfile.ZipInfo):
+        copy_entry(archive, info, self.zip)
+
+    def write(self, info: zipfile.ZipInfo, text: str):
+        """Append `text` to the entry for `info`, opening it if needed"""
+        if self._current is not info:
+            self.finish()
+            output = _output_info(info)
+            output.compress_type = zipfile.ZIP_DEFLATED
+            self._handle = self.zip.open(output, 'w', force_zip64=info.file_size >= ZIP64_MIN_SIZE // 2)
+            self._current = info
+        if text:
+            self._handle.write(text.encode('utf-8'))
+
+    def finish(self):
+        if self._handle is not None:
+            self._handle.close()
+        self._current = self._handle = None
+
+    def close(self):
+        self.finish()
+        self.zip.close()
@@ -0,0 +1,79 @@
+from typing import List, Optional, Sequence
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# 模型有时会用 ```json ... ``` 包裹输出
+_FENCE_PATTERN = re.compile(r'^```(?:json)?\s*\n?(.*?)\n?```$', re.DOTALL)
+
+
+def pack_segments(lengths: Sequence[int], threshold: int, max_chars: int, max_segments: int) -> List[List[int]]:
+    """
+    Group consecutive small segments into batches.
+
+    Segments shorter than `threshold` characters are packed together (in order)
+    until a batch would exceed `max_chars` or `max_segments`. Larger segments
+    always form a batch of their own. Returns lists of segment indices.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_chars = 0
+
+    for index, length in enumerate(lengths):
+        if max_segments <= 1 or length >= threshold:
+            if current:
+                batches.append(current)
+                current, current_chars = [], 0
+            batches.append([index])
+            continue
+
+        if current and (len(current) >= max_segments or current_chars + length > max_chars):
+            batches.append(current)
+            current, current_chars = [], 0
+        current.append(index)
+        current_chars += length
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def encode_segments(segments: Sequence[str]) -> str:
+    """Serialize segments as a JSON array for the batch prompt"""
+    return json.dumps(list(segments), ensure_ascii=False, indent=0)
+
+
+def parse_batch_response(response: str, expected_count: int) -> Optional[List[str]]:
+    """
+    Parse the model's JSON array answer.
+
+    Returns None if the response is not a JSON array of exactly
+    `expected_count` strings, so the caller can fall back to translating
+    the segments one by one.
+    """
+    text = response.strip()
+    match = _FENCE_PATTERN.match(text)
+    if match:
+        text = match.group(1).strip()
+
+    # 容忍数组前后的多余说明文字
+    start, end = text.find('['), text.rfind(']')
+    if start == -1 or end <= start:
+        return None
+
+    try:
+        # strict=False 允许字符串中出现未转义的换行
+        segments = json.loads(text[start:end + 1], strict=False)
+    except json.JSONDecodeError as e:
+        logger.warning(f"Batch response is not valid JSON: {e}")
+        return None
+
+    if not isinstance(segments, list) or len(segments) != expected_count:
+        logger.warning(f"Batch response has {len(segments) if isinstance(segments, list) else 'no'} "
+                       f"segments, expected {expected_count}")
+        return None
+    if not all(isinstance(segment, str) for segment in segments):
+        return None
+    return segments
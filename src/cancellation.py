@@ -0,0 +1,53 @@
+from typing import Awaitable, Optional, Set, TypeVar
+import asyncio
+
+T = TypeVar("T")
+
+
+class TranslationCancelled(Exception):
+    """Raised when a translation job is cancelled before it finished"""
+
+
+class CancellationToken:
+    """
+    Cancels one translation job.
+
+    Work started through run() is cancelled as a task tree, so queued chunks
+    stop waiting for the semaphore and in-flight LLM requests are aborted
+    (the HTTP connection is closed) instead of running to completion.
+    """
+
+    def __init__(self):
+        self.reason: Optional[str] = None
+        self._tasks: Set[asyncio.Future] = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def cancel(self, reason: str = "cancelled"):
+        """Cancel the job (must be called from the event loop running it)"""
+        if self.cancelled:
+            return
+        self.reason = reason
+        for task in list(self._tasks):
+            task.cancel()
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise TranslationCancelled(self.reason)
+
+    async def run(self, awaitable: Awaitable[T]) -> T:
+        """Await `awaitable` as a task that cancel() aborts, raising TranslationCancelled"""
+        self.raise_if_cancelled()
+        task = asyncio.ensure_future(awaitable)
+        self._tasks.add(task)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            # 调用方自身被取消时（令牌未取消）照常向上传递
+            if self.cancelled:
+                raise TranslationCancelled(self.reason) from None
+            raise
+        finally:
+            self._tasks.discard(task)
@@ -0,0 +1,105 @@
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 块状态
+CHUNK_PENDING = 0
+CHUNK_DONE = 1
+CHUNK_FAILED = 2
+CHUNK_INVALID = 3  # 译文未通过校验，等待重新翻译
+
+
+def split_offsets(splitter, text: str) -> Iterator[Tuple[int, int, str]]:
+    """
+    (start, end, chunk) for every chunk of `text` produced by a LangChain text splitter.
+
+    The splitter returns substrings of the text (possibly with whitespace
+    stripped), so each chunk is located in the text the same way LangChain's
+    add_start_index does. end is -1 if a chunk cannot be found (e.g. with
+    keep_separator=False), in which case the caller has to keep the chunk.
+    """
+    overlap = getattr(splitter, '_chunk_overlap', 0)
+    previous_start, previous_length = -1, 0
+    for chunk in splitter.split_text(text):
+        offset = previous_start + previous_length - overlap
+        start = text.find(chunk, max(0, offset))
+        if start < 0:
+            yield previous_start, -1, chunk
+            continue
+        previous_start, previous_length = start, len(chunk)
+        yield start, start + len(chunk), chunk
+
+
+class ChunkTable(Sequence[str]):
+    """
+    The chunks of a list of sections, stored as offsets into the section texts.
+
+    Only the section strings are kept (shared, not copied); each chunk costs
+    a few bytes in parallel arrays and its text is sliced out on access, i.e.
+    when it is sent to the model. Indexing the table returns the chunk text.
+    """
+
+    __slots__ = ("sources", "section", "start", "end", "status", "section_starts", "_overrides")
+
+    def __init__(self, sources: Sequence[str]):
+        self.sources = sources
+        self.section = array('l')
+        self.start = array('q')
+        self.end = array('q')
+        self.status = bytearray()
+        self.section_starts = [0] * len(sources)  # 每个章节第一个块的序号
+        self._overrides: Dict[int, str] = {}  # 无法定位到原文中的块（极少见）
+
+    @classmethod
+    def from_sections(cls, sources: Sequence[str], splitter,
+                      offsets: Optional[Sequence[Optional[List[Tuple[int, int]]]]] = None) -> 'ChunkTable':
+        """Split every section, or use its precomputed (start, end) chunk offsets if given"""
+        table = cls(sources)
+        for section, text in enumerate(sources):
+            table.section_starts[section] = len(table)
+            if offsets is not None and offsets[section] is not None:
+                for start, end in offsets[section]:
+                    table.append(section, start, end)
+                continue
+            for start, end, chunk in split_offsets(splitter, text):
+                table.append(section, start, end, chunk if end < 0 else None)
+        return table
+
+    def append(self, section: int, start: int, end: int, text: str = None):
+        if text is not None:
+            self._overrides[len(self.status)] = text
+        self.section.append(section)
+        self.start.append(start)
+        self.end.append(end)
+        self.status.append(CHUNK_PENDING)
+
+    def __len__(self) -> int:
+        return len(self.status)
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if index in self._overrides:
+            return self._overrides[index]
+        return self.sources[self.section[index]][self.start[index]:self.end[index]]
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def length(self, index: int) -> int:
+        if index in self._overrides:
+            return len(self._overrides[index])
+        return self.end[index] - self.start[index]
+
+    def lengths(self) -> List[int]:
+        return [self.length(index) for index in range(len(self))]
+
+    def section_counts(self) -> List[int]:
+        """Number of chunks in every section"""
+        ends = self.section_starts[1:] + [len(self)]
+        return [end - start for start, end in zip(self.section_starts, ends)]
+
+    def position(self, index: int) -> Tuple[int, int]:
+        """(section, chunk number within the section)"""
+        section = self.section[index]
+        return section, index - self.section_starts[section]
@@ -97,6 +97,31 @@ class DocumentFormatter:
         
         return text
 
+    @staticmethod
+    def clean_header_text(header_content: str) -> str:
+        """Remove bold, italic and inline code marks from header text"""
+        # Remove bold formatting **text**
+        header_content = re.sub(r'\*\*(.*?)\*\*', r'\1', header_content)
+        # Remove italic formatting *text* or _text_
+        header_content = re.sub(r'\*(.*?)\*', r'\1', header_content)
+        header_content = re.sub(r'_(.*?)_', r'\1', header_content)
+        # Remove inline code formatting `code`
+        header_content = re.sub(r'`(.*?)`', r'\1', header_content)
+        return header_content.strip()
+
+    @staticmethod
+    def postprocess_section(headers: List[Tuple[int, str]], chunks: List[str]) -> str:
+        """
+        Assemble one translated section from already post-processed chunks.
+
+        Only the section boundaries are touched: header lines are cleaned and
+        every block is separated by exactly one blank line, so the sections can
+        be concatenated without another pass over the whole document.
+        """
+        blocks = [f"{'#' * level} {DocumentFormatter.clean_header_text(header)}" for level, header in headers]
+        blocks.extend(chunk.strip() for chunk in chunks)
+        return "\n\n".join(block for block in blocks if block)
+
     @staticmethod
     def _normalize_headers(text: str) -> str:
         """
@@ -113,16 +138,10 @@ class DocumentFormatter:
             header_content = match.group(2)  # Header content
             
             # Remove formatting marks from headers (e.g., **bold** or *italic*)
-            # Remove bold formatting **text**
-            header_content = re.sub(r'\*\*(.*?)\*\*', r'\1', header_content)
-            # Remove italic formatting *text* or _text_
-            header_content = re.sub(r'\*(.*?)\*', r'\1', header_content)
-            header_content = re.sub(r'_(.*?)_', r'\1', header_content)
-            # Remove inline code formatting `code` (这里应该已经被提取了)
-            header_content = re.sub(r'`(.*?)`', r'\1', header_content)
+            header_content = DocumentFormatter.clean_header_text(header_content)
             
             # Ensure headers have blank lines before and after
-            return f"\n\n{header_prefix} {header_content.strip()}\n\n"
+            return f"\n\n{header_prefix} {header_content}\n\n"
         
         # Apply header cleaning function
         placeholder_text = re.sub(r'\n?(#{1,6})\s+(.+?)\n', clean_header, placeholder_text)
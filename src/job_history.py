@@ -0,0 +1,138 @@
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_PATH = Path.home() / ".infinity_translator" / "job_history.json"
+MAX_JOBS = 50  # 估算延迟时每个服务商/模型使用的任务数
+MAX_STORED_JOBS = 1000
+# 没有历史数据时的假设
+DEFAULT_FIRST_TOKEN_SECONDS = 1.5
+DEFAULT_TOKENS_PER_SECOND = 40.0
+DEFAULT_OUTPUT_TOKENS_PER_CHAR = 0.35
+
+
+@dataclass
+class LatencyModel:
+    """Request latency as first-token time plus output tokens / generation speed"""
+    first_token_seconds: float = DEFAULT_FIRST_TOKEN_SECONDS
+    tokens_per_second: float = DEFAULT_TOKENS_PER_SECOND
+    output_tokens_per_char: float = DEFAULT_OUTPUT_TOKENS_PER_CHAR  # 每个原文字符对应的输出 token 数
+    basis: str = "defaults"
+
+    def seconds(self, output_tokens: int) -> float:
+        return self.first_token_seconds + output_tokens / self.tokens_per_second
+
+    def to_dict(self) -> Dict:
+        return {
+            "basis": self.basis,
+            "first_token_seconds": round(self.first_token_seconds, 3),
+            "tokens_per_second": round(self.tokens_per_second, 1),
+            "output_tokens_per_char": round(self.output_tokens_per_char, 3),
+        }
+
+
+@dataclass
+class JobTelemetry:
+    """Settings and outcome of one job, recorded with its request statistics for auto-tuning"""
+    target_language: str = ""
+    context_mode: str = ""
+    chunk_size: int = 0
+    chunk_overlap: int = 0
+    concurrency: int = 0  # 顺序上下文模式下为 1
+    shared: bool = False  # 与其他任务共用并发名额（批量 CLI），耗时不能反映本任务的设置
+    chunks: int = 0
+    chunk_chars: int = 0
+    output_chars: int = 0
+    failed_chunks: int = 0  # 最终仍是 [Translation Error] 的块
+    request_errors: int = 0  # 失败的请求（包括换密钥、换分片重试的）
+    invalid_chunks: int = 0  # 未通过译文校验的块
+    wall_seconds: float = 0.0
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data['wall_seconds'] = round(self.wall_seconds, 3)
+        return data
+
+
+class JobHistory:
+    """Request statistics of the last MAX_JOBS jobs per provider/model, kept in a JSON file"""
+
+    def __init__(self, path):
+        self.path = Path(path).expanduser()
+        self._lock = threading.Lock()
+        self.jobs: List[Dict] = []
+        if self.path.is_file():
+            try:
+                self.jobs = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not load job history {self.path}: {e}")
+
+    def record(self, provider: str, model_name: str, source_chars: Optional[int], usage: Dict,
+               streaming: Dict, telemetry: Optional[JobTelemetry] = None):
+        """Add a finished job (usage: UsageStats.to_dict(), streaming: StreamStats.to_dict())"""
+        if not usage.get('requests'):
+            return
+        job = {
+            "provider": provider,
+            "model_name": model_name,
+            "time": time.time(),
+            "source_chars": source_chars,
+            "requests": usage['requests'],
+            "request_seconds": round(usage.get('request_seconds', 0.0), 3),
+            # 流式响应不一定带 usage，此时用收到的片段数代替
+            "completion_tokens": usage.get('completion_tokens') or streaming.get('tokens', 0),
+            "ttft_p50": streaming.get('ttft_p50') or None,
+            "tokens_per_second": streaming.get('tokens_per_second') or None,
+        }
+        if telemetry is not None:
+            job.update(telemetry.to_dict())
+        with self._lock:
+            self.jobs.append(job)
+            self.jobs = self.jobs[-MAX_STORED_JOBS:]
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_suffix('.tmp')
+                tmp_path.write_text(json.dumps(self.jobs), encoding='utf-8')
+                tmp_path.replace(self.path)
+            except OSError as e:
+                logger.warning(f"Could not save job history {self.path}: {e}")
+
+    def latency_model(self, provider: str, model_name: str) -> LatencyModel:
+        """Latency model from the recent jobs of this provider and model, or defaults"""
+        jobs = [job for job in self.jobs if job['provider'] == provider and job['model_name'] == model_name]
+        jobs = jobs[-MAX_JOBS:]
+        if not jobs:
+            return LatencyModel()
+        model = LatencyModel(basis=f"{len(jobs)} recent jobs of {provider}/{model_name}")
+        streamed = [job for job in jobs if job.get('ttft_p50') and job.get('tokens_per_second')]
+        if streamed:
+            model.first_token_seconds = sum(job['ttft_p50'] for job in streamed) / len(streamed)
+            model.tokens_per_second = sum(job['tokens_per_second'] for job in streamed) / len(streamed)
+        else:
+            # 非流式请求只有总耗时：扣除假设的首 token 时间后估算生成速度
+            requests = sum(job['requests'] for job in jobs)
+            generation = sum(job['request_seconds'] for job in jobs) - requests * model.first_token_seconds
+            tokens = sum(job['completion_tokens'] for job in jobs)
+            if generation > 0 and tokens:
+                model.tokens_per_second = tokens / generation
+        sized = [job for job in jobs if job.get('source_chars') and job.get('completion_tokens')]
+        if sized:
+            model.output_tokens_per_char = (sum(job['completion_tokens'] for job in sized)
+                                            / sum(job['source_chars'] for job in sized))
+        return model
+
+
+_histories: Dict[str, JobHistory] = {}
+
+
+def get_job_history(path=DEFAULT_HISTORY_PATH) -> JobHistory:
+    key = str(Path(path).expanduser().resolve())
+    if key not in _histories:
+        _histories[key] = JobHistory(path)
+    return _histories[key]
@@ -0,0 +1,185 @@
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import time
+
+from .llm_backends import parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+# 被限速后默认的冷却时间（秒），连续被限速时加倍
+DEFAULT_COOLDOWN = 30.0
+MAX_COOLDOWN = 600.0
+# 密钥被拒绝（401/403）后的冷却时间
+AUTH_COOLDOWN = 600.0
+
+STATUS_RATE_LIMITED = 429
+AUTH_STATUSES = (401, 403)
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """HTTP status of a backend error (BackendError or an openai APIStatusError)"""
+    status = getattr(error, 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Retry-After given by the provider, if any"""
+    seconds = getattr(error, 'retry_after', None)
+    if seconds is not None:
+        return seconds
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    return parse_retry_after(headers.get('retry-after')) if headers is not None else None
+
+
+def is_key_error(error: BaseException) -> bool:
+    """True if the error is specific to the key (rate limited or rejected), so another key may succeed"""
+    status = error_status(error)
+    return status == STATUS_RATE_LIMITED or status in AUTH_STATUSES
+
+
+def mask_key(key: Optional[str]) -> str:
+    if not key:
+        return "(no key)"
+    return f"{key[:3]}...{key[-4:]}" if len(key) > 10 else "..." + key[-2:]
+
+
+class ApiKey:
+    """One key of a pool with its rate budget, bench state and usage counters"""
+
+    def __init__(self, key: Optional[str], requests_per_minute: Optional[float] = None):
+        self.key = key
+        self.label = mask_key(key)
+        self.rate = requests_per_minute / 60.0 if requests_per_minute else None
+        self.capacity = 1.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.benched_until = 0.0
+        self.bench_reason: Optional[str] = None
+        self.rate_limit_streak = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.auth_errors = 0
+
+    def budget(self, now: float) -> float:
+        """Requests the key may send now (infinite without a per-key limit)"""
+        if self.rate is None:
+            return float('inf')
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def ready_in(self, now: float) -> float:
+        """Seconds until the key can be used again"""
+        wait = max(0.0, self.benched_until - now)
+        if self.rate is not None:
+            wait = max(wait, (1 - self.budget(now)) / self.rate)
+        return wait
+
+    def bench(self, seconds: float, reason: str):
+        self.benched_until = max(self.benched_until, time.monotonic() + seconds)
+        self.bench_reason = reason
+        logger.warning(f"API key {self.label} benched for {seconds:.0f}s ({reason})")
+
+    def report(self) -> Dict:
+        benched = max(0.0, self.benched_until - time.monotonic())
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "auth_errors": self.auth_errors,
+            "in_flight": self.in_flight,
+            "benched_seconds": round(benched, 1),
+            "bench_reason": self.bench_reason if benched else None,
+        }
+
+
+class KeyPool:
+    """
+    API keys of one provider, balanced by remaining rate budget.
+
+    acquire() returns the usable key with the most budget left (ties go to
+    the key with the fewest requests in flight); release() records the
+    outcome. A key is benched after a 429 (for Retry-After, or an
+    exponentially growing cooldown) or an auth error. If every key is
+    benched, acquire() waits for the first one to come back; keys benched
+    for auth errors are only skipped while another key is usable, so a
+    pool of bad keys still fails fast with the provider's error.
+    """
+
+    def __init__(self, keys: Sequence[Optional[str]], requests_per_minute: Optional[float] = None,
+                 cooldown: float = DEFAULT_COOLDOWN, auth_cooldown: float = AUTH_COOLDOWN):
+        self.keys: List[ApiKey] = [ApiKey(key, requests_per_minute) for key in (keys or [None])]
+        self.cooldown = cooldown
+        self.auth_cooldown = auth_cooldown
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _pick(self, now: float) -> Tuple[Optional[ApiKey], float]:
+        """The key to use now, or None and how long to wait"""
+        candidates = [key for key in self.keys if key.benched_until <= now]
+        if not candidates and all(key.bench_reason == "auth" for key in self.keys):
+            # 全部因鉴权失败被停用时仍然使用，让请求直接返回服务商的错误
+            candidates = self.keys
+        if not candidates:
+            return None, min(key.ready_in(now) for key in self.keys)
+        ready = [key for key in candidates if key.budget(now) >= 1]
+        if not ready:
+            return None, min((1 - key.budget(now)) / key.rate for key in candidates)
+        return max(ready, key=lambda key: (key.budget(now), -key.in_flight, -key.requests)), 0.0
+
+    def ready_in(self) -> float:
+        """Seconds until acquire() can return a key (0 if it would not wait)"""
+        key, wait = self._pick(time.monotonic())
+        return 0.0 if key is not None else max(wait, 0.01)
+
+    async def acquire(self) -> ApiKey:
+        while True:
+            key, wait = self._pick(time.monotonic())
+            if key is not None:
+                if key.rate is not None:
+                    key.tokens -= 1
+                key.in_flight += 1
+                key.requests += 1
+                return key
+            await asyncio.sleep(max(wait, 0.01))
+
+    def release(self, key: ApiKey, error: Optional[BaseException] = None):
+        key.in_flight -= 1
+        if error is None:
+            key.rate_limit_streak = 0
+            return
+        key.errors += 1
+        status = error_status(error)
+        if status == STATUS_RATE_LIMITED:
+            key.rate_limited += 1
+            if key.benched_until <= time.monotonic():  # 同时在途的请求一起被限速只算一次
+                key.rate_limit_streak += 1
+            seconds = retry_after(error)
+            if seconds is None:
+                seconds = min(MAX_COOLDOWN, self.cooldown * 2 ** max(0, key.rate_limit_streak - 1))
+            key.bench(seconds, "rate limited")
+        elif status in AUTH_STATUSES:
+            key.auth_errors += 1
+            key.bench(self.auth_cooldown, "auth")
+
+    def report(self) -> Dict[str, Dict]:
+        """Per-key usage and bench state"""
+        return {key.label: key.report() for key in self.keys}
+
+
+# 每个服务商（及其密钥列表）共享一个密钥池，使停用状态和速率预算跨任务生效
+_pools: Dict[Hashable, KeyPool] = {}
+
+
+def get_key_pool(provider: str, keys: Sequence[Optional[str]],
+                 requests_per_minute: Optional[float] = None) -> KeyPool:
+    cache_key = (provider, tuple(keys), requests_per_minute)
+    if cache_key not in _pools:
+        _pools[cache_key] = KeyPool(keys, requests_per_minute)
+        if len(keys) > 1:
+            logger.info(f"{len(keys)} API keys for provider {provider}")
+    return _pools[cache_key]
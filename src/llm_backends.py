@@ -0,0 +1,291 @@
+from dataclasses import dataclass, asdict, field
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import json
+import logging
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+BACKEND_LANGCHAIN = "langchain"
+BACKEND_NATIVE = "native"
+
+
+@dataclass
+class UsageStats:
+    """Accumulated token usage and latency reported by a backend"""
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cached_tokens: int = 0  # 命中服务商提示词缓存的 prompt token
+    request_seconds: float = 0.0
+
+    def add(self, prompt_tokens: int = 0, completion_tokens: int = 0, total_tokens: int = 0,
+            cached_tokens: int = 0, seconds: float = 0.0):
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens or 0
+        self.cached_tokens += cached_tokens or 0
+        self.completion_tokens += completion_tokens or 0
+        self.total_tokens += total_tokens or (prompt_tokens or 0) + (completion_tokens or 0)
+        self.request_seconds += seconds
+
+    def to_dict(self) -> Dict[str, float]:
+        data = asdict(self)
+        data['cache_hit_rate'] = round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0
+        return data
+
+
+@dataclass
+class StreamStats:
+    """Time to first token and generation speed of streamed responses"""
+    streams: int = 0
+    stalls: int = 0
+    tokens: int = 0  # 流式返回的片段数，通常每个片段对应一个 token
+    first_token_seconds: List[float] = field(default_factory=list)
+    tokens_per_second: List[float] = field(default_factory=list)
+
+    def add(self, first_token: float, tokens: int, generation_seconds: float):
+        self.streams += 1
+        self.tokens += tokens
+        self.first_token_seconds.append(first_token)
+        if tokens > 1 and generation_seconds > 0:
+            self.tokens_per_second.append((tokens - 1) / generation_seconds)
+
+    @staticmethod
+    def _percentile(values: List[float], point: float) -> float:
+        ordered = sorted(values)
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * point))], 3) if ordered else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "streams": self.streams,
+            "stalls": self.stalls,
+            "tokens": self.tokens,
+            "ttft_p50": self._percentile(self.first_token_seconds, 0.5),
+            "ttft_p90": self._percentile(self.first_token_seconds, 0.9),
+            "tokens_per_second": round(sum(self.tokens_per_second) / len(self.tokens_per_second), 1)
+            if self.tokens_per_second else 0.0,
+        }
+
+
+def _messages(prompt: str, system: Optional[str]) -> List[Dict[str, str]]:
+    """Chat messages with the (job-constant) system prefix first"""
+    messages = [{"role": "system", "content": system}] if system else []
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+class LangChainBackend:
+    """Backend that goes through langchain_openai.ChatOpenAI"""
+    name = BACKEND_LANGCHAIN
+
+    def __init__(self, model_name: str, base_url: str, api_key: Optional[str], temperature: float):
+        self.model_name = model_name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.temperature = temperature
+        self.usage = UsageStats()
+        self._llm = None
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            from langchain_openai import ChatOpenAI
+            self._llm = ChatOpenAI(
+                model_name=self.model_name,
+                openai_api_base=self.base_url,
+                openai_api_key=self.api_key,
+                temperature=self.temperature,
+            )
+        return self._llm
+
+    def _record_usage(self, message, seconds: float):
+        usage = getattr(message, 'usage_metadata', None) or {}
+        self.usage.add(
+            prompt_tokens=usage.get('input_tokens', 0),
+            completion_tokens=usage.get('output_tokens', 0),
+            total_tokens=usage.get('total_tokens', 0),
+            cached_tokens=(usage.get('input_token_details') or {}).get('cache_read', 0),
+            seconds=seconds,
+        )
+
+    @staticmethod
+    def _input(prompt: str, system: Optional[str]):
+        return [(message["role"], message["content"]) for message in _messages(prompt, system)]
+
+    async def complete(self, prompt: str, system: Optional[str] = None) -> str:
+        start = time.perf_counter()
+        message = await self.llm.ainvoke(self._input(prompt, system))
+        self._record_usage(message, time.perf_counter() - start)
+        return message.content
+
+    async def stream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        start = time.perf_counter()
+        aggregate = None
+        async for piece in self.llm.astream(self._input(prompt, system), stream_usage=True):
+            aggregate = piece if aggregate is None else aggregate + piece
+            if piece.content:
+                yield piece.content
+        self._record_usage(aggregate, time.perf_counter() - start)
+
+    async def aclose(self):
+        pass
+
+
+# 每个事件循环、每个 base_url 共享一个 httpx.AsyncClient，以便跨请求、跨任务复用连接
+_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _get_shared_client(base_url: str, max_connections: int):
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    loop_clients = _clients.setdefault(loop, {})
+    client = loop_clients.get(base_url)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=base_url.rstrip('/') + '/',
+            timeout=httpx.Timeout(120.0, connect=10.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        loop_clients[base_url] = client
+    return client
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (only the delta-seconds form is supported)"""
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+class BackendError(Exception):
+    """Raised when the provider returns an error response"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after  # 服务商在 Retry-After 中给出的等待秒数
+
+
+class StreamStalled(BackendError):
+    """Raised when a streamed response stops producing tokens"""
+
+
+# 传输层异常所在的模块：原生后端的 httpx，LangChain 后端的 openai
+_TRANSPORT_MODULES = ('httpx', 'httpcore', 'openai')
+
+
+def is_transport_error(error: BaseException) -> bool:
+    """True if the request itself failed (error response, stalled stream, connection error), so it may be retried"""
+    if isinstance(error, (BackendError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    return type(error).__module__.split('.')[0] in _TRANSPORT_MODULES
+
+
+class OpenAICompatibleBackend:
+    """Lightweight backend that calls /chat/completions directly over a shared async HTTP client"""
+    name = BACKEND_NATIVE
+
+    def __init__(self, model_name: str, base_url: str, api_key: Optional[str], temperature: float,
+                 max_connections: int = 20):
+        self.model_name = model_name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.temperature = temperature
+        self.max_connections = max_connections
+        self.usage = UsageStats()
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _payload(self, prompt: str, system: Optional[str] = None, stream: bool = False) -> Dict:
+        payload = {
+            "model": self.model_name,
+            "messages": _messages(prompt, system),
+            "temperature": self.temperature,
+        }
+        if stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    def _record_usage(self, usage: Optional[Dict], seconds: float):
+        usage = usage or {}
+        # OpenAI 风格为 prompt_tokens_details.cached_tokens，DeepSeek 风格为 prompt_cache_hit_tokens
+        cached_tokens = (usage.get('prompt_tokens_details') or {}).get('cached_tokens') \
+            or usage.get('prompt_cache_hit_tokens', 0)
+        self.usage.add(
+            prompt_tokens=usage.get('prompt_tokens', 0),
+            completion_tokens=usage.get('completion_tokens', 0),
+            total_tokens=usage.get('total_tokens', 0),
+            cached_tokens=cached_tokens,
+            seconds=seconds,
+        )
+
+    @staticmethod
+    def _raise_for_status(response, body: str):
+        if response.status_code >= 400:
+            raise BackendError(f"HTTP {response.status_code}: {body[:500]}", status_code=response.status_code,
+                               retry_after=parse_retry_after(response.headers.get('retry-after')))
+
+    async def complete(self, prompt: str, system: Optional[str] = None) -> str:
+        client = _get_shared_client(self.base_url, self.max_connections)
+        start = time.perf_counter()
+        response = await client.post("chat/completions", headers=self._headers(), json=self._payload(prompt, system))
+        self._raise_for_status(response, response.text)
+        data = response.json()
+        self._record_usage(data.get('usage'), time.perf_counter() - start)
+        return data['choices'][0]['message']['content'] or ""
+
+    async def stream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        client = _get_shared_client(self.base_url, self.max_connections)
+        start = time.perf_counter()
+        usage = None
+        async with client.stream("POST", "chat/completions", headers=self._headers(),
+                                 json=self._payload(prompt, system, stream=True)) as response:
+            if response.status_code >= 400:
+                body = (await response.aread()).decode('utf-8', errors='replace')
+                self._raise_for_status(response, body)
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                if event.get('usage'):
+                    usage = event['usage']
+                for choice in event.get('choices') or []:
+                    content = (choice.get('delta') or {}).get('content')
+                    if content:
+                        yield content
+        self._record_usage(usage, time.perf_counter() - start)
+
+    async def aclose(self):
+        # 共享客户端由事件循环持有，这里不主动关闭
+        pass
+
+
+def create_backend(provider_settings: Dict, api_key: Optional[str], temperature: float):
+    """Create the backend selected by the provider's "backend" setting (defaults to LangChain)"""
+    backend_name = provider_settings.get('backend', BACKEND_LANGCHAIN)
+    backend_class = {
+        BACKEND_LANGCHAIN: LangChainBackend,
+        BACKEND_NATIVE: OpenAICompatibleBackend,
+    }.get(backend_name)
+    if backend_class is None:
+        logger.warning(f"Unknown backend '{backend_name}', falling back to {BACKEND_LANGCHAIN}")
+        backend_class = LangChainBackend
+    return backend_class(
+        model_name=provider_settings['model_name'],
+        base_url=provider_settings['base_url'],
+        api_key=api_key,
+        temperature=temperature,
+    )
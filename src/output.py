@@ -19,14 +19,16 @@ class TranslationOutputFormatter:
             tuple: (Formatted text, Output filename)
         """
         # Add translation info header
-        header = f"Translate by {self.provider_name} | {self.model_name}\n\n"
-        formatted_text = header + translated_text
+        formatted_text = self.header() + translated_text
+        return formatted_text, self.output_filename(original_filename)
 
-        # Generate output filename
+    def header(self) -> str:
+        """Translation info header placed before the translated text"""
+        return f"Translate by {self.provider_name} | {self.model_name}\n\n"
+
+    def output_filename(self, original_filename: str, suffix: str = ".md") -> str:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_filename = f"translated_{Path(original_filename).stem}_{timestamp}.md"
-        
-        return formatted_text, output_filename
+        return f"translated_{Path(original_filename).stem}_{timestamp}{suffix}"
 
 def create_translation_response(translated_text: str, original_filename: str, provider_name: str, model_name: str) -> tuple[bytes, str]:
     """
@@ -0,0 +1,225 @@
+from typing import Dict, Iterable, List, Optional
+import asyncio
+import collections
+import heapq
+import time
+
+from config.translation_config import CONTEXT_SEQUENTIAL, CONTEXT_SOURCE, CONTEXT_SUMMARY
+from .chunks import ChunkTable
+from .job_history import LatencyModel
+from .prompts import estimate_tokens
+from .preprocessing import aiter_sections
+from .translator import HEADER_LEVELS
+
+# 请求中除系统提示词和正文以外的固定部分（"Text to be translated:" 等）
+WRAPPER_TOKENS = 8
+# 批量请求中每个分段的 JSON 引号和分隔符
+SEGMENT_TOKENS = 2
+# 摘要模式下每个摘要的长度（最多三句话）
+SUMMARY_TOKENS = 80
+
+
+def makespan(durations: List[float], slots: int) -> float:
+    """Wall time of running `durations` in order on `slots` parallel slots (each request takes the first free one)"""
+    if not durations:
+        return 0.0
+    if slots <= 1:
+        return sum(durations)
+    free = [0.0] * min(slots, len(durations))
+    for duration in durations:
+        heapq.heapreplace(free, free[0] + duration)
+    return max(free)
+
+
+class _Window:
+    """Requests of one translation window, in the order the translator sends them"""
+
+    def __init__(self):
+        self.headers: List[float] = []
+        self.summaries: List[float] = []
+        self.chunks: List[float] = []
+
+
+class TranslationPlan:
+    """
+    Accumulates the requests a job would make and their estimated tokens and latency.
+
+    Mirrors DocumentTranslator.translate_sections: unique headers are
+    translated first, one batch at a time; in summary mode every section
+    spanning several chunks is summarized; then the chunk batches run
+    sequentially (sequential context) or on `concurrency` slots.
+    """
+
+    def __init__(self, translator, latency: LatencyModel, include_sections: bool = True):
+        self.translator = translator
+        self.config = translator.config
+        self.latency = latency
+        self.include_sections = include_sections
+        prompts = translator.prompts
+        self.chunk_overhead = estimate_tokens(prompts.chunk_system) + WRAPPER_TOKENS
+        self.batch_overhead = estimate_tokens(prompts.batch_system) + WRAPPER_TOKENS
+        self.summary_overhead = estimate_tokens(prompts.summary_system) + WRAPPER_TOKENS
+        self.seen_headers = set()
+        self.recent_context = collections.deque(maxlen=max(1, self.config.context_window))
+        self.windows: List[_Window] = []
+        self.sections: List[Dict] = []
+        self.chars = 0
+        self.section_count = 0
+        self.chunk_count = 0
+        self.chunk_tokens: List[int] = []
+        self.requests = {"headers": 0, "summaries": 0, "chunks": 0}
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def _request(self, input_tokens: int, source_chars: int) -> float:
+        output_tokens = max(1, round(source_chars * self.latency.output_tokens_per_char))
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        return self.latency.seconds(output_tokens)
+
+    def _context_tokens(self) -> int:
+        mode = self.config.context_mode
+        if mode in (CONTEXT_SEQUENTIAL, CONTEXT_SOURCE):
+            # 前几块的译文或原文
+            return sum(self.recent_context)
+        if mode == CONTEXT_SUMMARY:
+            return SUMMARY_TOKENS
+        return 0
+
+    def add_window(self, sections):
+        """Plan one window of sections (the whole document for translate_document)"""
+        window = _Window()
+        translator = self.translator
+        sources = [section.page_content for section in sections]
+        chunks = ChunkTable.from_sections(sources, translator.text_splitter,
+                                          [getattr(section, 'chunk_offsets', None) for section in sections])
+        tokens = [estimate_tokens(chunk) for chunk in chunks]
+        lengths = chunks.lengths()
+        section_counts = chunks.section_counts()
+
+        headers = []
+        for section in sections:
+            for value in (section.metadata[level] for level in HEADER_LEVELS if level in section.metadata):
+                if value not in self.seen_headers:
+                    self.seen_headers.add(value)
+                    headers.append(value)
+        for batch in translator.plan_batches([len(header) for header in headers]):
+            batch_headers = [headers[index] for index in batch]
+            overhead = self.chunk_overhead if len(batch) == 1 else self.batch_overhead + SEGMENT_TOKENS * len(batch)
+            window.headers.append(self._request(overhead + sum(estimate_tokens(h) for h in batch_headers),
+                                                sum(len(h) for h in batch_headers)))
+        self.requests["headers"] += len(window.headers)
+
+        if self.config.context_mode == CONTEXT_SUMMARY:
+            max_chars = self.config.chunk_size * 4
+            for source, count in zip(sources, section_counts):
+                if count > 1:
+                    window.summaries.append(self._request(
+                        self.summary_overhead + estimate_tokens(source[:max_chars]),
+                        round(SUMMARY_TOKENS / self.latency.output_tokens_per_char)))
+            self.requests["summaries"] += len(window.summaries)
+
+        for batch in translator.plan_batches(lengths):
+            payload = sum(tokens[index] for index in batch)
+            overhead = self.chunk_overhead if len(batch) == 1 else self.batch_overhead + SEGMENT_TOKENS * len(batch)
+            window.chunks.append(self._request(overhead + self._context_tokens() + payload,
+                                               sum(lengths[index] for index in batch)))
+            for index in batch:
+                if self.config.context_mode == CONTEXT_SEQUENTIAL:
+                    self.recent_context.append(round(lengths[index] * self.latency.output_tokens_per_char))
+                else:
+                    self.recent_context.append(tokens[index])
+        self.requests["chunks"] += len(window.chunks)
+
+        if self.include_sections:
+            for i, section in enumerate(sections):
+                start = chunks.section_starts[i]
+                self.sections.append({
+                    "headers": [section.metadata[level] for level in HEADER_LEVELS if level in section.metadata],
+                    "continued": getattr(section, 'continued', False),
+                    "chars": len(sources[i]),
+                    "chunk_tokens": tokens[start:start + section_counts[i]],
+                })
+        self.windows.append(window)
+        self.section_count += len(sections)
+        self.chunk_count += len(chunks)
+        self.chunk_tokens.extend(tokens)
+        self.chars += sum(len(source) for source in sources)
+
+    def estimated_seconds(self) -> float:
+        """Projected wall time; windows, and the phases inside a window, run one after another"""
+        slots = self.translator.effective_concurrency
+        sequential = self.translator.requires_sequential_context
+        total = 0.0
+        for window in self.windows:
+            total += sum(window.headers)
+            total += makespan(window.summaries, slots)
+            total += sum(window.chunks) if sequential else makespan(window.chunks, slots)
+        requests = sum(self.requests.values())
+        if self.config.requests_per_minute:
+            # 限速时至少需要 requests / rpm 分钟
+            total = max(total, requests / self.config.requests_per_minute * 60)
+        return total
+
+    def request_seconds(self) -> float:
+        return sum(sum(w.headers) + sum(w.summaries) + sum(w.chunks) for w in self.windows)
+
+    def to_dict(self) -> Dict:
+        tokens = self.chunk_tokens
+        seconds = self.estimated_seconds()
+        plan = {
+            "chars": self.chars,
+            "sections": self.section_count,
+            "chunks": self.chunk_count,
+            "windows": len(self.windows),
+            "chunk_tokens": {
+                "total": sum(tokens),
+                "min": min(tokens, default=0),
+                "mean": round(sum(tokens) / len(tokens), 1) if tokens else 0,
+                "max": max(tokens, default=0),
+            },
+            "requests": dict(self.requests, total=sum(self.requests.values())),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "context_mode": self.config.context_mode,
+            "concurrency": 1 if self.translator.requires_sequential_context else self.translator.effective_concurrency,
+            "requests_per_minute": self.config.requests_per_minute,
+            "latency": self.latency.to_dict(),
+            "request_seconds": round(self.request_seconds(), 1),
+            "estimated_seconds": round(seconds, 1),
+        }
+        if self.include_sections:
+            plan["section_list"] = self.sections
+        return plan
+
+
+async def plan_translation(translator, lines: Iterable[str], latency: LatencyModel,
+                           total_chars: Optional[int] = None, window_chars: Optional[int] = None,
+                           include_sections: bool = True) -> Dict:
+    """
+    Run only the preprocessing and splitting of a translation and return its plan.
+
+    Sections are produced exactly as for a real job (same splitter settings
+    and process pool) and planned window by window, so memory use stays
+    bounded for large inputs. `window_chars` should be the job's
+    stream_window_chars for translate_stream and None for
+    translate_document. Translation-memory hits are not looked up, so the
+    projection is an upper bound when a memory is configured.
+    """
+    start = time.perf_counter()
+    translator.compile_prompts()
+    plan = TranslationPlan(translator, latency, include_sections)
+    executor = translator.prep_executor(total_chars or 0)
+    window, size = [], 0
+    async for section in aiter_sections(lines, translator.chunk_settings, executor):
+        window.append(section)
+        size += len(section.page_content)
+        if window_chars is not None and size >= window_chars:
+            plan.add_window(window)
+            window, size = [], 0
+            await asyncio.sleep(0)  # 逐行处理时让出事件循环
+    if window:
+        plan.add_window(window)
+    result = plan.to_dict()
+    result["plan_seconds"] = round(time.perf_counter() - start, 3)
+    return result
@@ -0,0 +1,167 @@
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+import asyncio
+import collections
+import logging
+import multiprocessing
+import os
+import threading
+
+from .chunks import split_offsets
+from .streaming import DEFAULT_BLOCK_CHARS, Block, Section, SectionMerger, iter_blocks, split_block
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEPARATORS = [
+    "\n\n",  # Paragraph separator
+    "\n",    # Line separator
+    ". ",    # Period
+    "! ",    # Exclamation mark
+    "? ",    # Question mark
+    "。",    # Chinese period
+    "！",    # Chinese exclamation mark
+    "？",    # Chinese question mark
+    "；",    # Chinese semicolon
+    "; ",    # English semicolon
+]
+
+HEADERS_TO_SPLIT_ON = [
+    ("#", "header1"),
+    ("##", "header2"),
+    ("###", "header3"),
+    ("####", "header4"),
+    ("#####", "header5"),
+    ("######", "header6"),
+]
+
+# 每个子进程任务包含的原文字符数（太小时进程间通信开销占主导）
+DEFAULT_TASK_CHARS = 1024 * 1024
+
+# (chunk_size, chunk_overlap, separators)
+ChunkSettings = Tuple[int, int, Optional[Tuple[str, ...]]]
+
+
+def create_markdown_splitter():
+    from langchain_text_splitters import MarkdownHeaderTextSplitter
+    return MarkdownHeaderTextSplitter(headers_to_split_on=HEADERS_TO_SPLIT_ON)
+
+
+def create_text_splitter(chunk_size: int, chunk_overlap: int, separators: Optional[Sequence[str]] = None):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=list(separators or DEFAULT_SEPARATORS),
+    )
+
+
+# 子进程内按参数缓存分割器
+_worker_splitters: Dict[ChunkSettings, tuple] = {}
+
+
+def _splitters(settings: ChunkSettings):
+    if settings not in _worker_splitters:
+        _worker_splitters[settings] = (create_markdown_splitter(), create_text_splitter(*settings))
+    return _worker_splitters[settings]
+
+
+def prepare_blocks(blocks: List[Block], settings: ChunkSettings) -> List[List[Section]]:
+    """Preprocess, split and chunk a group of blocks (runs in a worker process)"""
+    markdown_splitter, text_splitter = _splitters(settings)
+    results = []
+    for prefix, block, _ in blocks:
+        sections = split_block(prefix, block, markdown_splitter)
+        for section in sections:
+            offsets = [(start, end) for start, end, _ in split_offsets(text_splitter, section.page_content)]
+            # 有块无法定位时交给主进程重新切分
+            section.chunk_offsets = offsets if all(end >= 0 for _, end in offsets) else None
+        results.append(sections)
+    return results
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    return max(1, min(4, (os.cpu_count() or 1) - 1))
+
+
+def get_process_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool shared by all translations (created on first use)"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn 在各平台（以及 PyInstaller 打包后）行为一致，且不会复制事件循环和线程
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _group_blocks(lines: Iterable[str], block_chars: int, task_chars: int) -> Iterable[List[Block]]:
+    group: List[Block] = []
+    group_chars = 0
+    for block in iter_blocks(lines, block_chars):
+        group.append(block)
+        group_chars += sum(len(line) + 1 for line in block[1])
+        if group_chars >= task_chars:
+            yield group
+            group, group_chars = [], 0
+    if group:
+        yield group
+
+
+async def aiter_sections(lines: Iterable[str], settings: ChunkSettings, executor: Optional[Executor] = None,
+                         block_chars: int = DEFAULT_BLOCK_CHARS, task_chars: int = DEFAULT_TASK_CHARS,
+                         prefetch: Optional[int] = None) -> AsyncIterator[Section]:
+    """
+    Sections of a markdown document, prepared in `executor` if given.
+
+    Blocks are grouped into tasks of about `task_chars` and up to `prefetch`
+    tasks run ahead in the pool; results are merged back in document order,
+    giving the same sections as iter_sections. Without an executor the work
+    is done inline.
+    """
+    merger = SectionMerger(block_chars)
+    if executor is None:
+        for group in _group_blocks(lines, block_chars, task_chars):
+            for (_, _, cut), sections in zip(group, prepare_blocks(group, settings)):
+                for section in merger.add(sections, cut):
+                    yield section
+        for section in merger.finish():
+            yield section
+        return
+
+    loop = asyncio.get_running_loop()
+    prefetch = prefetch or 2 * getattr(executor, '_max_workers', 2)
+    pending: Deque[Tuple[List[bool], asyncio.Future]] = collections.deque()
+    groups = iter(_group_blocks(lines, block_chars, task_chars))
+
+    try:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < prefetch:
+                group = next(groups, None)
+                if group is None:
+                    exhausted = True
+                    break
+                # 只保留切分标记，块内容交给子进程后即可释放
+                pending.append(([cut for _, _, cut in group],
+                                loop.run_in_executor(executor, prepare_blocks, group, settings)))
+                del group
+                await asyncio.sleep(0)  # 读取输入时让出事件循环
+            if not pending:
+                break
+            cuts, future = pending.popleft()
+            for cut, sections in zip(cuts, await future):
+                for section in merger.add(sections, cut):
+                    yield section
+        for section in merger.finish():
+            yield section
+    finally:
+        for _, future in pending:
+            future.cancel()
@@ -1,38 +1,65 @@
 import asyncio
+import itertools
 import json
 import time
-from typing import AsyncGenerator, Set, Optional
+from typing import AsyncGenerator, Dict, Set, Optional
 from weakref import WeakSet
 
+# 实时预览的推送间隔（秒），避免每个 token 都产生一条事件
+PREVIEW_INTERVAL = 0.25
+# 预览只保留译文末尾的这么多字符
+PREVIEW_MAX_CHARS = 4000
+
 class TranslationProgress:
     _instance: Optional['TranslationProgress'] = None
     _lock = asyncio.Lock()
+    # 每个任务单独的进度（job_id -> 实例），没有 job_id 的任务使用共享实例
+    _jobs: Dict[str, 'TranslationProgress'] = {}
+    # 订阅者队列 -> 只接收该 job_id 的事件（None 表示接收所有任务的事件）
+    _subscribers: Dict[asyncio.Queue, Optional[str]] = {}
 
-    def __init__(self):
+    def __init__(self, job_id: Optional[str] = None):
+        self.job_id = job_id
         self.progress = 0
         self.translated_chunks = 0
         self.total_chunks = 0
         self.status = "Preparing..."
-        self._subscribers: Set = set()  # 改为普通set，手动管理
+        self.queue_position: Optional[int] = None  # 在调度器中的排队位置，0 表示正在翻译
         self.start_time = None
         self.chunk_times = []
         self._max_chunk_times = 10  # 限制记录的时间数量
 
     @classmethod
-    async def get_instance(cls) -> 'TranslationProgress':
+    async def get_instance(cls, job_id: Optional[str] = None) -> 'TranslationProgress':
+        if job_id is not None:
+            return cls.for_job(job_id)
         if cls._instance is None:
             async with cls._lock:
                 if cls._instance is None:
                     cls._instance = cls()
         return cls._instance
 
-    async def subscribe(self):
+    @classmethod
+    def for_job(cls, job_id: str) -> 'TranslationProgress':
+        """Progress of one job, created on first use"""
+        if job_id not in cls._jobs:
+            cls._jobs[job_id] = cls(job_id)
+        return cls._jobs[job_id]
+
+    @classmethod
+    def discard(cls, job_id: Optional[str]):
+        """Drop the progress of a finished job"""
+        if job_id is not None:
+            cls._jobs.pop(job_id, None)
+
+    async def subscribe(self, job_id: Optional[str] = None):
+        """Queue of progress events, of one job or (job_id None) of all jobs"""
         queue = asyncio.Queue()
-        self._subscribers.add(queue)
+        self._subscribers[queue] = job_id
         return queue
 
     async def unsubscribe(self, queue):
-        self._subscribers.discard(queue)  # 使用discard避免KeyError
+        self._subscribers.pop(queue, None)
 
     def add_chunk_time(self, time_taken: float):
         """添加处理时间，保持固定长度"""
@@ -83,21 +110,57 @@ class TranslationProgress:
         remaining_time = self.estimate_remaining_time()
         self.status = f"{status} (Estimated time remaining: {remaining_time})"
 
+        self.publish(current_time)
+
+    def update_queue_position(self, position: int):
+        """Report the job's place in the scheduler queue (0: its requests are running)"""
+        self.queue_position = position
+        if position > 0:
+            self.status = f"Waiting in queue (position {position})"
+        self.publish(time.time())
+
+    def has_preview_subscribers(self) -> bool:
+        """Whether anyone subscribed to this job's events; only they receive its previews"""
+        return self.job_id is not None and any(job_filter == self.job_id for job_filter in self._subscribers.values())
+
+    def preview(self, stream_id: int, text: str, done: bool = False, **stats):
+        """Publish the text generated so far by one streaming request (a "preview" event)"""
+        event = {"type": "preview", "stream": stream_id, "text": text[-PREVIEW_MAX_CHARS:], "done": done,
+                 "timestamp": time.time(), **stats}
+        if self.job_id is not None:
+            event["job_id"] = self.job_id
+        # 预览包含译文，只发给订阅了本任务的客户端，不发给未过滤的 /translate-progress 订阅者
+        self._send(event, job_only=True)
+
+    def publish(self, current_time: float):
         # Notify all subscribers, 移除失效的队列
+        event = {
+            "progress": self.progress,
+            "translated_chunks": self.translated_chunks,
+            "total_chunks": self.total_chunks,
+            "status": self.status,
+            "timestamp": current_time,  # 服务端发出时间，客户端可据此计算推送延迟
+        }
+        if self.job_id is not None:
+            event["job_id"] = self.job_id
+            event["queue_position"] = self.queue_position
+        self._send(event)
+
+    def _send(self, event: dict, job_only: bool = False):
         failed_queues = set()
-        for queue in self._subscribers:
+        for queue, job_filter in list(self._subscribers.items()):
+            if job_filter is not None and job_filter != self.job_id:
+                continue
+            if job_only and (job_filter is None or self.job_id is None):
+                continue
             try:
-                await queue.put({
-                    "progress": self.progress,
-                    "translated_chunks": self.translated_chunks,
-                    "total_chunks": self.total_chunks,
-                    "status": self.status
-                })
+                queue.put_nowait(event)  # 队列不限长度，不会阻塞
             except Exception:
                 failed_queues.add(queue)
         
         # 清理失效的队列
-        self._subscribers -= failed_queues
+        for queue in failed_queues:
+            self._subscribers.pop(queue, None)
 
     def reset(self):
         """重置进度"""
@@ -105,5 +168,32 @@ class TranslationProgress:
         self.translated_chunks = 0
         self.total_chunks = 0
         self.status = "Preparing..."
+        self.queue_position = None
         self.start_time = None
         self.chunk_times = []
+
+
+class StreamPreview:
+    """Forwards the text of one streaming response to a job's progress channel, at most every PREVIEW_INTERVAL"""
+    _ids = itertools.count(1)
+
+    def __init__(self, progress: TranslationProgress):
+        self.progress = progress
+        self.stream_id = next(self._ids)
+        self.pieces = []
+        self.last_sent = 0.0
+
+    def reset(self):
+        """The request is retried: start over"""
+        self.pieces = []
+        self.last_sent = 0.0
+
+    def add(self, piece: str):
+        self.pieces.append(piece)
+        now = time.monotonic()
+        if now - self.last_sent >= PREVIEW_INTERVAL:
+            self.last_sent = now
+            self.progress.preview(self.stream_id, "".join(self.pieces))
+
+    def finish(self, **stats):
+        self.progress.preview(self.stream_id, "".join(self.pieces), done=True, **stats)
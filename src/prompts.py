@@ -0,0 +1,154 @@
+from typing import Dict, Optional, Sequence, Tuple
+import re
+
+from config.translation_config import CONTEXT_SEQUENTIAL, CONTEXT_SOURCE, CONTEXT_SUMMARY
+
+LANGUAGE_DESCRIPTIONS = {
+    'zh-Hans': 'fluent, professional Simplified Chinese that conforms to Chinese reading habits',
+    'zh-Hant': 'fluent, professional Traditional Chinese that conforms to Traditional Chinese reading habits',
+    'en': 'fluent, professional English that conforms to English writing conventions',
+    'ja': 'fluent, professional Japanese that conforms to Japanese writing conventions',
+    'ko': 'fluent, professional Korean that conforms to Korean writing conventions',
+    'fr': 'fluent, professional French that conforms to French writing conventions',
+    'de': 'fluent, professional German that conforms to German writing conventions',
+    'es': 'fluent, professional Spanish that conforms to Spanish writing conventions',
+    'pt': 'fluent, professional Portuguese that conforms to Portuguese writing conventions',
+    'ru': 'fluent, professional Russian that conforms to Russian writing conventions',
+    'ar': 'fluent, professional Arabic that conforms to Arabic writing conventions',
+    'hi': 'fluent, professional Hindi that conforms to Hindi writing conventions',
+    'it': 'fluent, professional Italian that conforms to Italian writing conventions',
+    'tr': 'fluent, professional Turkish that conforms to Turkish writing conventions',
+    'vi': 'fluent, professional Vietnamese that conforms to Vietnamese writing conventions',
+    'th': 'fluent, professional Thai that conforms to Thai writing conventions',
+    'id': 'fluent, professional Indonesian that conforms to Indonesian writing conventions',
+    'fa': 'fluent, professional Persian that conforms to Persian writing conventions'
+}
+
+CONTEXT_DESCRIPTIONS = {
+    CONTEXT_SEQUENTIAL: "the previous paragraph's translation",
+    CONTEXT_SOURCE: "the preceding original text",
+    CONTEXT_SUMMARY: "a summary of the section this text belongs to",
+}
+
+# CJK、假名、韩文等字符大致一个字符一个 token，其余文字大约四个字符一个 token
+_WIDE_CHAR_PATTERN = re.compile(r'[\u0e00-\u0e7f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate that does not need a tokenizer"""
+    if not text:
+        return 0
+    wide = len(_WIDE_CHAR_PATTERN.findall(text))
+    return wide + (len(text) - wide + 3) // 4
+
+
+class PromptBuilder:
+    """
+    Prompts for one translation job.
+
+    Everything that is the same for every request of the job (role, target
+    language, formatting rules) is compiled once into the system messages,
+    so providers with prefix caching can reuse it. The per-request parts
+    (context, then the text) go into the user message, at the end.
+    """
+
+    def __init__(self, target_language: str, context_mode: str = CONTEXT_SEQUENTIAL):
+        self.target_language = target_language
+        self.language_description = LANGUAGE_DESCRIPTIONS.get(target_language, LANGUAGE_DESCRIPTIONS['zh-Hans'])
+        self.context_description = CONTEXT_DESCRIPTIONS.get(context_mode, CONTEXT_DESCRIPTIONS[CONTEXT_SEQUENTIAL])
+
+        self.chunk_system = f"""You are an expert academic translator and formatter. Your task is to translate academic papers while preserving and improving their formatting.
+
+Instructions:
+1. Translate the text after "Text to be translated:" into {self.language_description}.
+2. Maintain all markdown formatting including headers, lists, code blocks, and links.
+3. Keep the same header hierarchy.
+4. Only output the translated {target_language} content, do not include the original text.
+5. Remove any extra spaces between characters or words in the main text.
+6. Preserve all links, image references, URLs and placeholders such as __CODE_BLOCK_0__ and __LINK_ELEMENT_0__ exactly as they appear.
+7. Correct any header levels if needed (e.g., 1, 2, 3 are first-level; 1.1, 1.2 are second-level).
+8. Ensure headers are properly separated with blank lines before and after.
+9. If a reference text is given, use it only to keep terminology and writing style consistent; never translate or repeat it.
+10. If an earlier translation of a similar text is given, reuse its wording where the texts agree and translate only what differs.
+11. Output only the translated text without any additional labels or explanations."""
+
+        self.batch_system = f"""You are an expert academic translator and formatter. Your task is to translate academic papers while preserving and improving their formatting.
+
+Instructions:
+1. The text after "Segments to be translated:" is a JSON array of independent text segments. Translate every segment into {self.language_description}.
+2. Maintain all markdown formatting including headers, lists, code blocks, and links.
+3. Preserve all links, URLs and placeholders such as __CODE_BLOCK_0__ and __LINK_ELEMENT_0__ exactly as they appear.
+4. Answer with a JSON array containing exactly one {target_language} string per input segment, in the same order. Do not merge, split, or skip segments, and do not add any other text.
+5. If a reference text is given, use it only to keep terminology and writing style consistent; never translate or repeat it."""
+
+        self.summary_system = (
+            f"Summarize the document section given by the user in {self.language_description}. "
+            "Use at most three sentences, mention the topic and the key terminology, "
+            "and output only the summary."
+        )
+
+        # 估算的指令开销（每个请求除正文外额外发送的 token 数）
+        self.requests = 0
+        self.overhead_tokens = 0
+        self.context_tokens = 0
+        self._system_tokens: Dict[str, int] = {}
+
+    def _reference(self, context: Optional[str]) -> str:
+        if not context:
+            return ""
+        return f"Reference ({self.context_description}):\n{context}\n\n"
+
+    def _track(self, system: str, user: str, payload: str, context: Optional[str] = None):
+        if system not in self._system_tokens:
+            self._system_tokens[system] = estimate_tokens(system)
+        context_tokens = estimate_tokens(context) if context else 0
+        self.requests += 1
+        self.context_tokens += context_tokens
+        self.overhead_tokens += (self._system_tokens[system] + estimate_tokens(user)
+                                 - estimate_tokens(payload) - context_tokens)
+
+    @staticmethod
+    def _memory(memory: Optional[Tuple[str, str]]) -> str:
+        if not memory:
+            return ""
+        source, translation = memory
+        return f"Earlier translation of a similar text:\nOriginal:\n{source}\nTranslation:\n{translation}\n\n"
+
+    def _rejected(self, reasons: Optional[Sequence[str]]) -> str:
+        if not reasons:
+            return ""
+        return (f"A previous translation of this text was rejected because {'; '.join(reasons)}. "
+                f"Translate the complete text into {self.language_description}, keeping every placeholder, "
+                "URL, header and list item.\n\n")
+
+    def chunk(self, text: str, context: Optional[str] = None,
+              memory: Optional[Tuple[str, str]] = None, rejected: Optional[Sequence[str]] = None) -> Tuple[str, str]:
+        """
+        (system, user) messages for translating one chunk or header, optionally with a
+        translation-memory match and the reasons an earlier translation was rejected
+        """
+        reference = self._reference(context) + self._memory(memory) + self._rejected(rejected)
+        user = f"{reference}Text to be translated:\n{text}"
+        self._track(self.chunk_system, user, text, reference)
+        return self.chunk_system, user
+
+    def batch(self, segments_json: str, segment_count: int, context: Optional[str] = None) -> Tuple[str, str]:
+        """(system, user) messages for translating a JSON array of segments"""
+        user = f"{self._reference(context)}Segments to be translated ({segment_count}):\n{segments_json}"
+        self._track(self.batch_system, user, segments_json, context)
+        return self.batch_system, user
+
+    def summary(self, text: str) -> Tuple[str, str]:
+        user = f"Section:\n{text}"
+        self._track(self.summary_system, user, text)
+        return self.summary_system, user
+
+    def stats(self) -> Dict[str, float]:
+        """Estimated per-request prompt overhead (instructions) and context size, excluding the text itself"""
+        requests = self.requests or 1
+        return {
+            "requests": self.requests,
+            "instruction_prefix_tokens": estimate_tokens(self.chunk_system),
+            "overhead_tokens_per_request": round(self.overhead_tokens / requests, 1),
+            "context_tokens_per_request": round(self.context_tokens / requests, 1),
+        }
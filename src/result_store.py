@@ -0,0 +1,205 @@
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE_HOURS = 24 * 7
+DEFAULT_MAX_TOTAL_MB = 1024
+READ_BLOCK = 1 << 20
+COMPRESS_LEVEL = 6
+# 本存储写入的文件名；目录中的其他文件（例如用户自己的 .gz 文件）从不删除
+BLOB_NAME = re.compile(r'[0-9a-f]{64}\.gz')
+TMP_NAME = re.compile(r'[0-9a-f]{32}\.tmp|index\.json\.tmp')
+
+
+@dataclass
+class StoredResult:
+    job_id: str
+    digest: str  # 原始内容的 SHA-256，相同内容只保存一份
+    filename: str
+    size: int  # 原始大小
+    compressed_size: int
+    created: float
+
+
+class ResultStore:
+    """
+    Translated documents kept on disk, gzip-compressed, by job id.
+
+    Files are stored once per content hash (`<sha256>.gz`) with an index
+    file mapping job ids to them, so a result can be downloaded again after
+    the original response failed. Results older than `max_age_hours` are
+    removed, then the oldest ones until the compressed total is below
+    `max_total_mb`.
+    """
+
+    def __init__(self, directory, max_age_hours: float = DEFAULT_MAX_AGE_HOURS,
+                 max_total_mb: float = DEFAULT_MAX_TOTAL_MB):
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / 'index.json'
+        self.max_age = max_age_hours * 3600
+        self.max_total_bytes = int(max_total_mb * 2 ** 20)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, StoredResult] = {}
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def blob_path(self, digest: str) -> Path:
+        return self.directory / f"{digest}.gz"
+
+    def load(self):
+        if self.index_path.is_file():
+            try:
+                data = json.loads(self.index_path.read_text(encoding='utf-8'))
+                self._entries = {job_id: StoredResult(**entry) for job_id, entry in data.items()}
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning(f"Could not load result index {self.index_path}: {e}")
+        # 丢弃文件已不存在的记录和没有记录引用的文件（例如写入过程中进程退出）
+        self._entries = {job_id: entry for job_id, entry in self._entries.items()
+                         if self.blob_path(entry.digest).is_file()}
+        referenced = {entry.digest for entry in self._entries.values()}
+        for path in self.directory.iterdir():
+            if TMP_NAME.fullmatch(path.name) or (BLOB_NAME.fullmatch(path.name) and path.stem not in referenced):
+                path.unlink(missing_ok=True)
+        self.evict()
+
+    def _save_index(self):
+        tmp_path = self.index_path.with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps({job_id: asdict(entry) for job_id, entry in self._entries.items()}),
+                            encoding='utf-8')
+        tmp_path.replace(self.index_path)
+
+    def save(self, job_id: str, source: BinaryIO, filename: str) -> StoredResult:
+        """Compress `source` into the store under `job_id` (blocking; run it in a thread for large files)"""
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = self.directory / f"{uuid.uuid4().hex}.tmp"
+        try:
+            # mtime=0：相同内容得到相同的压缩文件
+            with open(tmp_path, 'wb') as raw, gzip.GzipFile(filename='', mode='wb', fileobj=raw,
+                                                             compresslevel=COMPRESS_LEVEL, mtime=0) as compressed:
+                while block := source.read(READ_BLOCK):
+                    digest.update(block)
+                    size += len(block)
+                    compressed.write(block)
+            entry = StoredResult(job_id, digest.hexdigest(), filename, size, tmp_path.stat().st_size, time.time())
+            with self._lock:
+                blob = self.blob_path(entry.digest)
+                if blob.exists():
+                    tmp_path.unlink()
+                else:
+                    os.replace(tmp_path, blob)
+                self._entries[job_id] = entry
+                self._evict_locked()
+                self._save_index()
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        return entry
+
+    def get(self, job_id: str) -> Optional[StoredResult]:
+        entry = self._entries.get(job_id)
+        if entry is None or entry.created < time.time() - self.max_age:
+            return None
+        return entry
+
+    def entries(self) -> List[StoredResult]:
+        """Results that can still be downloaded (expired ones wait for eviction but are already missing for get)"""
+        oldest = time.time() - self.max_age
+        return sorted((entry for entry in self._entries.values() if entry.created >= oldest),
+                      key=lambda entry: entry.created, reverse=True)
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            entry = self._entries.pop(job_id, None)
+            if entry is None:
+                return False
+            self._drop_unreferenced(entry.digest)
+            self._save_index()
+        return True
+
+    def _drop_unreferenced(self, digest: str):
+        if not any(entry.digest == digest for entry in self._entries.values()):
+            try:
+                self.blob_path(digest).unlink(missing_ok=True)
+            except OSError as e:  # Windows 上正在下载的文件无法删除，下次启动时清理
+                logger.warning(f"Could not remove stored result {digest}: {e}")
+
+    def evict(self):
+        with self._lock:
+            if self._evict_locked():
+                self._save_index()
+
+    def _evict_locked(self) -> bool:
+        """Remove expired results, then the oldest ones until the size limit is met"""
+        cutoff = time.time() - self.max_age
+        removed = {job_id for job_id, entry in self._entries.items() if entry.created < cutoff}
+        blobs = {}
+        for entry in self._entries.values():
+            if entry.job_id not in removed:
+                blobs[entry.digest] = entry.compressed_size
+        total = sum(blobs.values())
+        for entry in sorted(self._entries.values(), key=lambda entry: entry.created):
+            if total <= self.max_total_bytes:
+                break
+            if entry.job_id in removed:
+                continue
+            removed.add(entry.job_id)
+            if not any(other.digest == entry.digest for other in self._entries.values()
+                       if other.job_id not in removed):
+                total -= blobs.pop(entry.digest)
+        for job_id in removed:
+            entry = self._entries.pop(job_id)
+            self._drop_unreferenced(entry.digest)
+        if removed:
+            logger.info(f"Removed {len(removed)} stored results (retention {self.max_age / 3600:g}h, "
+                        f"{self.max_total_bytes / 2 ** 20:g} MB)")
+        return bool(removed)
+
+    def read_compressed(self, entry: StoredResult, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Bytes start..end (inclusive) of the stored gzip file"""
+        end = entry.compressed_size - 1 if end is None else end
+        with open(self.blob_path(entry.digest), 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0 and (block := f.read(min(READ_BLOCK, remaining))):
+                remaining -= len(block)
+                yield block
+
+    def read(self, entry: StoredResult, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Bytes start..end (inclusive) of the original content, decompressed on the fly"""
+        end = entry.size - 1 if end is None else end
+        with gzip.open(self.blob_path(entry.digest), 'rb') as f:
+            f.seek(start)  # gzip 不支持随机访问，seek 会解压并丢弃前面的内容
+            remaining = end - start + 1
+            while remaining > 0 and (block := f.read(min(READ_BLOCK, remaining))):
+                remaining -= len(block)
+                yield block
+
+
+_stores: Dict[str, ResultStore] = {}
+
+
+def get_result_store(directory, max_age_hours: float = DEFAULT_MAX_AGE_HOURS,
+                     max_total_mb: float = DEFAULT_MAX_TOTAL_MB) -> ResultStore:
+    """Shared store per directory; the retention limits follow the latest settings"""
+    key = str(Path(directory).expanduser().resolve())
+    store = _stores.get(key)
+    if store is None:
+        store = _stores[key] = ResultStore(directory, max_age_hours, max_total_mb)
+    else:
+        store.max_age = max_age_hours * 3600
+        store.max_total_bytes = int(max_total_mb * 2 ** 20)
+    return store
@@ -0,0 +1,147 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+import re
+
+# 内容类型
+CONTENT_HEADER = "header"
+CONTENT_TABLE = "table"
+CONTENT_LIST = "list"
+CONTENT_CODE = "code"
+CONTENT_SHORT = "short"
+CONTENT_PROSE = "prose"
+
+PRIMARY_ROUTE = "primary"
+FALLBACK_ROUTE = "fallback"
+
+_LIST_ITEM_PATTERN = re.compile(r'^\s*(?:[-*+]|\d+[.)])\s')
+_CODE_BLOCK_PATTERN = re.compile(r'```[\s\S]*?```')
+
+
+def classify_segment(text: str, short_chars: int = 200) -> str:
+    """Classify a segment by structure and length (cheap, no model involved)"""
+    stripped = text.strip()
+    lines = [line for line in stripped.split('\n') if line.strip()]
+    if not lines:
+        return CONTENT_SHORT
+
+    if len(lines) == 1 and lines[0].lstrip().startswith('#'):
+        return CONTENT_HEADER
+    if sum(1 for line in lines if line.lstrip().startswith('|')) * 2 >= len(lines):
+        return CONTENT_TABLE
+    code_chars = sum(len(match) for match in _CODE_BLOCK_PATTERN.findall(stripped))
+    if code_chars * 2 >= len(stripped):
+        return CONTENT_CODE
+    if sum(1 for line in lines if _LIST_ITEM_PATTERN.match(line)) * 2 >= len(lines):
+        return CONTENT_LIST
+    if len(stripped) < short_chars:
+        return CONTENT_SHORT
+    return CONTENT_PROSE
+
+
+@dataclass
+class Route:
+    """A model to use for segments matching the content types and size limit"""
+    name: str
+    model_name: str
+    content_types: Optional[List[str]] = None  # 为空表示匹配所有类型
+    max_chars: Optional[int] = None  # 为空表示不限长度
+
+    def matches(self, content_type: str, length: int) -> bool:
+        if self.content_types is not None and content_type not in self.content_types:
+            return False
+        return self.max_chars is None or length <= self.max_chars
+
+
+@dataclass
+class RouteStats:
+    requests: int = 0
+    segments: int = 0
+    chars: int = 0
+    seconds: float = 0.0
+    errors: int = 0
+    content_types: Dict[str, int] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "segments": self.segments,
+            "chars": self.chars,
+            "errors": self.errors,
+            "avg_latency": round(self.seconds / self.requests, 3) if self.requests else 0.0,
+            "content_types": dict(self.content_types),
+        }
+
+
+class ModelRouter:
+    """
+    Pick a model per segment from the provider's "routes" setting.
+
+    Routes are checked in order and the first match wins; segments that match
+    no route use the provider's model_name (the "primary" route). Example:
+
+        "routes": [
+            {"name": "fast", "model_name": "google/gemini-flash-1.5-8b",
+             "content_types": ["header", "table", "list", "short"], "max_chars": 400}
+        ]
+    """
+
+    def __init__(self, provider_settings: Dict, short_chars: int = 200):
+        self.short_chars = short_chars
+        self.primary = Route(PRIMARY_ROUTE, provider_settings['model_name'])
+        # 重新翻译未通过校验的块时使用的模型，为空时仍使用原来的模型
+        fallback_model = provider_settings.get('fallback_model')
+        self.fallback = Route(FALLBACK_ROUTE, fallback_model) if fallback_model else None
+        self.routes = [
+            Route(
+                name=route.get('name', route['model_name']),
+                model_name=route['model_name'],
+                content_types=route.get('content_types'),
+                max_chars=route.get('max_chars'),
+            )
+            for route in provider_settings.get('routes', [])
+        ]
+        self.stats: Dict[str, RouteStats] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.routes) or self.fallback is not None
+
+    def route(self, text: str, content_type: Optional[str] = None) -> Route:
+        if not self.routes:
+            return self.primary
+        content_type = content_type or classify_segment(text, self.short_chars)
+        length = len(text)
+        for route in self.routes:
+            if route.matches(content_type, length):
+                return route
+        return self.primary
+
+    def route_batch(self, texts: Sequence[str], content_type: Optional[str] = None) -> Route:
+        """A batch goes to a non-primary route only if every segment would"""
+        routes = [self.route(text, content_type) for text in texts]
+        return routes[0] if all(route is routes[0] for route in routes) else self.primary
+
+    def record(self, route: Route, texts: Sequence[str], seconds: float, error: bool = False,
+               content_type: Optional[str] = None):
+        stats = self.stats.setdefault(route.name, RouteStats())
+        stats.requests += 1
+        stats.segments += len(texts)
+        stats.seconds += seconds
+        if error:
+            stats.errors += 1
+        for text in texts:
+            stats.chars += len(text)
+            kind = content_type or classify_segment(text, self.short_chars)
+            stats.content_types[kind] = stats.content_types.get(kind, 0) + 1
+
+    def report(self) -> Dict[str, Dict]:
+        return {
+            name: dict(stats.to_dict(), model_name=self._model_of(name))
+            for name, stats in self.stats.items()
+        }
+
+    def _model_of(self, name: str) -> str:
+        for route in [self.primary, self.fallback] + self.routes:
+            if route is not None and route.name == name:
+                return route.model_name
+        return ""
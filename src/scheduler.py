@@ -0,0 +1,265 @@
+from typing import Callable, Deque, Dict, List, Optional
+import asyncio
+import collections
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# 优先级：交互式任务（小文档、用户在等待）与批量任务
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK = "bulk"
+PRIORITY_WEIGHTS = {PRIORITY_INTERACTIVE: 8.0, PRIORITY_BULK: 1.0}
+# 未指定优先级时，短于该长度的文档按交互式任务调度
+INTERACTIVE_MAX_CHARS = 100000
+DEFAULT_CLIENT = "default"
+
+
+class ScheduledJob:
+    """
+    One job's handle on the scheduler.
+
+    Used like a semaphore (`async with job:` or acquire()/release()) around
+    each LLM request of the job, so it can replace a translator's own
+    semaphore. `max_concurrent` caps the job's own requests within the
+    scheduler's capacity.
+    """
+
+    def __init__(self, scheduler: 'JobScheduler', job_id: str, client: '_Client', priority: str, seq: int,
+                 max_concurrent: Optional[int] = None):
+        self.scheduler = scheduler
+        self.max_concurrent = max_concurrent
+        self.job_id = job_id
+        self.client = client
+        self.priority = priority
+        self.weight = PRIORITY_WEIGHTS[priority]
+        self.seq = seq
+        self.vtime = 0.0  # 已获得的服务量 / 权重
+        self.waiting: Deque[asyncio.Future] = collections.deque()
+        self.running = 0
+        self.requests = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self.position: Optional[int] = None  # 排队位置，0 表示正在执行
+        self.on_position: Optional[Callable[[int], None]] = None
+
+    @property
+    def active(self) -> bool:
+        return bool(self.waiting) or self.running > 0
+
+    def has_room(self) -> bool:
+        return (self.max_concurrent is None or self.running < self.max_concurrent) and self.client.has_room()
+
+    async def acquire(self):
+        await self.scheduler.acquire(self)
+
+    def release(self):
+        self.scheduler.release(self)
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc):
+        self.release()
+        return False
+
+    def close(self):
+        self.scheduler.unregister(self)
+
+    def report(self) -> Dict:
+        return {
+            "client": self.client.name,
+            "priority": self.priority,
+            "max_concurrent": self.max_concurrent,
+            "requests": self.requests,
+            "running": self.running,
+            "waiting": len(self.waiting),
+            "queue_position": self.position,
+            "avg_wait": round(self.wait_seconds / self.requests, 3) if self.requests else 0.0,
+            "max_wait": round(self.max_wait, 3),
+        }
+
+
+class _Client:
+    def __init__(self, name: str, max_concurrent: Optional[int]):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.vtime = 0.0
+        self.running = 0
+        self.jobs = 0
+
+    def has_room(self) -> bool:
+        return self.max_concurrent is None or self.running < self.max_concurrent
+
+
+class JobScheduler:
+    """
+    Shares the LLM request slots between all running jobs.
+
+    Requests are dispatched by weighted fair queuing on two levels: first
+    the client with the least service received (relative to the weight of
+    its jobs), then that client's job with the least service. Interactive
+    jobs weigh 8x bulk jobs, so a short document gets most of the freed
+    slots while a book is being translated, without starving the book. A
+    client can be limited to a number of concurrent requests, and each job
+    to its own max_concurrent; jobs and clients that were idle start at the
+    current virtual time instead of collecting credit. The capacity is the
+    process-wide number of request slots, independent of any job's setting.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.running = 0
+        self._jobs: Dict[str, ScheduledJob] = {}
+        self._clients: Dict[str, _Client] = {}
+        self._seq = itertools.count()
+
+    def register(self, job_id: str, client_id: Optional[str] = None, priority: str = PRIORITY_INTERACTIVE,
+                 client_max_concurrent: Optional[int] = None, max_concurrent: Optional[int] = None) -> ScheduledJob:
+        if priority not in PRIORITY_WEIGHTS:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {tuple(PRIORITY_WEIGHTS)}")
+        name = client_id or DEFAULT_CLIENT
+        client = self._clients.get(name)
+        if client is None:
+            client = self._clients[name] = _Client(name, client_max_concurrent)
+        elif client_max_concurrent is not None:
+            client.max_concurrent = client_max_concurrent
+        client.jobs += 1
+        job = ScheduledJob(self, job_id, client, priority, next(self._seq), max_concurrent)
+        self._jobs[f"{job_id}#{job.seq}"] = job
+        return job
+
+    def unregister(self, job: ScheduledJob):
+        if self._jobs.pop(f"{job.job_id}#{job.seq}", None) is None:
+            return
+        job.client.jobs -= 1
+        self._drop_idle_client(job.client)
+        self._dispatch()
+
+    def _drop_idle_client(self, client: _Client):
+        if client.jobs == 0 and client.running == 0 and self._clients.get(client.name) is client:
+            del self._clients[client.name]
+
+    def _catch_up(self, job: ScheduledJob):
+        """An idle job or client starts at the lowest virtual time of the active ones"""
+        client = job.client
+        if not any(other.active for other in self._jobs.values() if other.client is client):
+            active = [c.vtime for c in self._active_clients() if c is not client]
+            if active:
+                client.vtime = max(client.vtime, min(active))
+        siblings = [other.vtime for other in self._jobs.values()
+                    if other.client is client and other is not job and other.active]
+        if siblings:
+            job.vtime = max(job.vtime, min(siblings))
+
+    def _active_clients(self) -> List[_Client]:
+        return list({job.client.name: job.client for job in self._jobs.values() if job.active}.values())
+
+    def _start(self, job: ScheduledJob):
+        job.running += 1
+        job.requests += 1
+        job.client.running += 1
+        self.running += 1
+        job.vtime += 1.0 / job.weight
+        job.client.vtime += 1.0 / job.weight
+
+    async def acquire(self, job: ScheduledJob):
+        if not job.active:
+            self._catch_up(job)
+        if self.running < self.capacity and job.has_room() and not any(j.waiting for j in self._jobs.values()):
+            self._start(job)
+            self._update_positions()
+            return
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        job.waiting.append(waiter)
+        # 其他排队的请求可能只是受客户端或任务配额限制，空闲名额可以直接分给这个请求
+        self._dispatch()
+        if not waiter.done():
+            self._update_positions()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 名额已分配但任务被取消：交还给下一个请求
+                self.release(job)
+            elif waiter in job.waiting:
+                job.waiting.remove(waiter)
+                self._update_positions()
+            raise
+        waited = time.perf_counter() - start
+        job.wait_seconds += waited
+        job.max_wait = max(job.max_wait, waited)
+
+    def release(self, job: ScheduledJob):
+        job.running -= 1
+        job.client.running -= 1
+        self.running -= 1
+        self._drop_idle_client(job.client)
+        self._dispatch()
+
+    def _next(self) -> Optional[ScheduledJob]:
+        candidates = [job for job in self._jobs.values() if job.waiting and job.has_room()]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda job: (job.client.vtime, job.vtime, job.seq))
+
+    def _dispatch(self):
+        dispatched = False
+        while self.running < self.capacity:
+            job = self._next()
+            if job is None:
+                break
+            self._start(job)
+            job.waiting.popleft().set_result(None)
+            dispatched = True
+        if dispatched:
+            self._update_positions()
+
+    def _update_positions(self):
+        """Queue position of every job: 0 while it has a request running, else its rank among waiting jobs"""
+        queued = sorted((job for job in self._jobs.values() if job.waiting and not job.running),
+                        key=lambda job: (job.client.vtime, job.vtime, job.seq))
+        positions = {id(job): rank for rank, job in enumerate(queued, 1)}
+        for job in self._jobs.values():
+            position = 0 if job.running else positions.get(id(job))
+            if position is not None and position != job.position:
+                job.position = position
+                if job.on_position is not None:
+                    job.on_position(position)
+
+    def report(self) -> Dict:
+        return {
+            "capacity": self.capacity,
+            "running": self.running,
+            "clients": {client.name: {"running": client.running, "max_concurrent": client.max_concurrent}
+                        for client in self._clients.values()},
+            "jobs": {job.job_id: job.report() for job in self._jobs.values()},
+        }
+
+
+_scheduler: Optional[JobScheduler] = None
+DEFAULT_CAPACITY = 3
+
+
+def get_scheduler(capacity: Optional[int] = None) -> JobScheduler:
+    """
+    The process-wide scheduler. `capacity` is the total number of request
+    slots shared by all jobs (the "max_concurrent_requests" setting), never a
+    single job's concurrency; None keeps the current capacity.
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = JobScheduler(capacity or DEFAULT_CAPACITY)
+    elif capacity is not None and _scheduler.capacity != capacity:
+        _scheduler.capacity = capacity
+        _scheduler._dispatch()
+    return _scheduler
+
+
+def default_priority(total_chars: Optional[int], interactive_max_chars: int = INTERACTIVE_MAX_CHARS) -> str:
+    """Interactive for short (or unknown-size) documents, bulk for long ones"""
+    if total_chars is not None and total_chars > interactive_max_chars:
+        return PRIORITY_BULK
+    return PRIORITY_INTERACTIVE
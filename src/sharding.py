@@ -0,0 +1,216 @@
+from typing import Deque, Dict, Hashable, Iterable, List, Optional, Tuple
+import asyncio
+import collections
+import json
+import logging
+import time
+
+from config.config import get_api_keys
+from .key_pool import STATUS_RATE_LIMITED, KeyPool, error_status, get_key_pool
+
+logger = logging.getLogger(__name__)
+
+# 观测值的指数滑动平均系数
+EWMA_ALPHA = 0.2
+# 错误率再高也保留的最小权重比例，使故障恢复后仍能被探测到
+MIN_HEALTH = 0.05
+# 连续失败达到该次数后暂停使用分片，暂停时间随连续失败次数加倍
+SHARD_FAILURE_STREAK = 3
+SHARD_COOLDOWN = 5.0
+MAX_SHARD_COOLDOWN = 300.0
+# 固定配置的字段，其余字段覆盖服务商设置
+_SHARD_FIELDS = ("name", "provider", "weight", "max_concurrent")
+
+
+class Shard:
+    """One provider/model of a multi-provider job with its live throughput and error statistics"""
+
+    def __init__(self, name: str, provider: str, provider_settings: Dict, key_pool: KeyPool,
+                 weight: float = 1.0, max_concurrent: int = 3):
+        self.name = name
+        self.provider = provider
+        self.provider_settings = provider_settings
+        self.model_name = provider_settings['model_name']
+        self.key_pool = key_pool
+        self.weight = weight
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.chars = 0
+        self.seconds = 0.0
+        self.speed: Optional[float] = None  # 每个请求的处理速度（字符/秒）的滑动平均
+        self.error_rate = 0.0  # 错误率的滑动平均
+        self.error_streak = 0
+        self.benched_until = 0.0
+
+    def health(self) -> float:
+        return max(MIN_HEALTH, 1.0 - self.error_rate)
+
+    def score(self, default_speed: float) -> float:
+        """Live weight: configured weight x observed speed x health"""
+        return self.weight * (self.speed or default_speed) * self.health()
+
+    def record(self, chars: int, seconds: float, error: bool):
+        self.requests += 1
+        self.seconds += seconds
+        self.error_rate += EWMA_ALPHA * ((1.0 if error else 0.0) - self.error_rate)
+        if error:
+            self.errors += 1
+            self.error_streak += 1
+            if self.error_streak >= SHARD_FAILURE_STREAK:
+                seconds = min(MAX_SHARD_COOLDOWN, SHARD_COOLDOWN * 2 ** (self.error_streak - SHARD_FAILURE_STREAK))
+                self.benched_until = time.monotonic() + seconds
+                logger.warning(f"Shard {self.name} failed {self.error_streak} times in a row, "
+                               f"pausing it for {seconds:.0f}s")
+            return
+        self.error_streak = 0
+        self.chars += chars
+        speed = chars / max(seconds, 1e-3)
+        self.speed = speed if self.speed is None else self.speed + EWMA_ALPHA * (speed - self.speed)
+
+    def report(self, default_speed: float) -> Dict:
+        return {
+            "provider": self.provider,
+            "model_name": self.model_name,
+            "requests": self.requests,
+            "errors": self.errors,
+            "chars": self.chars,
+            "in_flight": self.in_flight,
+            "avg_latency": round(self.seconds / self.requests, 3) if self.requests else 0.0,
+            "chars_per_second": round(self.chars / self.seconds, 1) if self.seconds else 0.0,
+            "error_rate": round(self.error_rate, 3),
+            "paused_seconds": round(max(0.0, self.benched_until - time.monotonic()), 1),
+            "live_weight": round(self.score(default_speed), 1),
+        }
+
+
+class ShardSet:
+    """
+    Spread requests over several providers/models at once.
+
+    Each shard has its own concurrency limit and key pool, so the total
+    throughput approaches the sum of the shards' capacity. A request goes to
+    the shard with the lowest load relative to its live weight (configured
+    weight x observed chars/s x (1 - error rate)); shards that are full,
+    whose keys are all benched, or that are paused after repeated failures
+    are skipped until they free up.
+    """
+
+    def __init__(self, shards: List[Shard]):
+        if not shards:
+            raise ValueError("At least one shard is required")
+        self.shards = shards
+        self._waiters: Deque[asyncio.Future] = collections.deque()
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def __iter__(self):
+        return iter(self.shards)
+
+    @property
+    def total_concurrency(self) -> int:
+        return sum(shard.max_concurrent for shard in self.shards)
+
+    @property
+    def total_keys(self) -> int:
+        return sum(len(shard.key_pool) for shard in self.shards)
+
+    def default_speed(self) -> float:
+        """Speed assumed for shards without observations: the mean of the others"""
+        speeds = [shard.speed for shard in self.shards if shard.speed]
+        return sum(speeds) / len(speeds) if speeds else 1.0
+
+    def _pick(self, exclude: Iterable[str]) -> Tuple[Optional[Shard], Optional[float]]:
+        """The shard to use now, or None and how long to wait at most (None: until a release)"""
+        candidates = [shard for shard in self.shards if shard.name not in exclude] or self.shards
+        default_speed = self.default_speed()
+        best, best_load, wait = None, None, None
+        now = time.monotonic()
+        for shard in candidates:
+            # 暂停结束后先只放行一个探测请求
+            limit = 1 if shard.error_streak >= SHARD_FAILURE_STREAK else shard.max_concurrent
+            if shard.in_flight >= limit:
+                continue
+            shard_wait = max(shard.benched_until - now, shard.key_pool.ready_in())
+            if shard_wait > 0:
+                wait = shard_wait if wait is None else min(wait, shard_wait)
+                continue
+            load = (shard.in_flight + 1) / shard.score(default_speed)
+            if best_load is None or load < best_load:
+                best, best_load = shard, load
+        return best, wait
+
+    async def acquire(self, exclude: Iterable[str] = ()) -> Shard:
+        exclude = set(exclude)
+        while True:
+            shard, wait = self._pick(exclude)
+            if shard is not None:
+                shard.in_flight += 1
+                return shard
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def release(self, shard: Shard, chars: int, seconds: float, error: Optional[BaseException] = None):
+        shard.in_flight -= 1
+        # 被限速由密钥池处理（停用该密钥），不计入服务商的错误率
+        shard.record(chars, seconds, error is not None and error_status(error) != STATUS_RATE_LIMITED)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def report(self) -> Dict[str, Dict]:
+        default_speed = self.default_speed()
+        return {shard.name: shard.report(default_speed) for shard in self.shards}
+
+
+def build_shards(specs: List[Dict], providers: Dict[str, Dict], max_concurrent: int) -> List[Shard]:
+    """
+    Shards from the "shards" setting. Each entry names a provider and may
+    override its settings (model_name, base_url, backend, ...), e.g.
+
+        "shards": [
+            {"provider": "openrouter", "weight": 1},
+            {"provider": "siliconflow", "model_name": "deepseek-ai/DeepSeek-V3", "max_concurrent": 6},
+            {"provider": "local", "weight": 0.5}
+        ]
+    """
+    shards = []
+    for spec in specs:
+        provider = spec.get('provider', spec.get('name', 'custom'))
+        provider_settings = dict(providers.get(provider, {}))
+        provider_settings.update({key: value for key, value in spec.items() if key not in _SHARD_FIELDS})
+        if 'base_url' not in provider_settings or 'model_name' not in provider_settings:
+            logger.warning(f"Skipping shard {spec}: unknown provider or missing base_url/model_name")
+            continue
+        name = spec.get('name') or f"{provider}/{provider_settings['model_name']}"
+        key_pool = get_key_pool(provider, get_api_keys(provider), provider_settings.get('key_requests_per_minute'))
+        shards.append(Shard(name, provider, provider_settings, key_pool,
+                            weight=float(spec.get('weight', 1.0)),
+                            max_concurrent=int(spec.get('max_concurrent', max_concurrent))))
+    return shards
+
+
+# 相同配置的任务共享同一组分片，使观测到的吞吐量和错误率跨任务生效
+_shard_sets: Dict[Hashable, ShardSet] = {}
+
+
+def get_shard_set(specs: List[Dict], providers: Dict[str, Dict], max_concurrent: int) -> Optional[ShardSet]:
+    """Shared ShardSet for the given settings, or None if no shard could be built"""
+    cache_key = (json.dumps(specs, sort_keys=True), json.dumps(providers, sort_keys=True), max_concurrent)
+    if cache_key not in _shard_sets:
+        shards = build_shards(specs, providers, max_concurrent)
+        if not shards:
+            return None
+        logger.info(f"Sharding requests across {', '.join(shard.name for shard in shards)}")
+        _shard_sets[cache_key] = ShardSet(shards)
+    return _shard_sets[cache_key]
@@ -0,0 +1,142 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import re
+
+from .formatter import DocumentFormatter
+
+# 每个块累积到该长度后，在下一个空行处切开，避免没有标题的超长章节占满内存
+DEFAULT_BLOCK_CHARS = 256 * 1024
+
+_SPACES_PATTERN = re.compile(r'[ \t]+')
+
+# (标题前缀行, 块内的行, 是否在空行处切开)
+Block = Tuple[List[str], List[str], bool]
+
+
+class Section:
+    """A markdown section with its header metadata (same interface as a LangChain Document)"""
+    __slots__ = ("page_content", "metadata", "continued", "chunk_offsets")
+
+    def __init__(self, page_content: str, metadata: Dict[str, str], continued: bool = False,
+                 chunk_offsets: Optional[List[Tuple[int, int]]] = None):
+        self.page_content = page_content
+        self.metadata = metadata
+        # 超长章节被切开后的后续部分，组装时不再重复标题
+        self.continued = continued
+        # 预先计算好的块偏移（并行预处理时由子进程计算）
+        self.chunk_offsets = chunk_offsets
+
+
+def _header_level(line: str) -> int:
+    """Markdown header level of a (preprocessed) line, 0 if it is not a header"""
+    level = len(line) - len(line.lstrip('#'))
+    if 1 <= level <= 6 and (len(line) == level or line[level] == ' '):
+        return level
+    return 0
+
+
+def iter_blocks(lines: Iterable[str], block_chars: int = DEFAULT_BLOCK_CHARS) -> Iterator[Block]:
+    """
+    Group lines into blocks that start at a header, or, for very long
+    sections, at a blank line once the block reaches `block_chars`.
+
+    Each block comes with the header lines enclosing it, so it can be split
+    on its own (see split_block) with the same result as the whole text.
+    """
+    block: List[str] = []
+    block_len = 0
+    block_stack: List[Tuple[int, str]] = []  # 块开始时的标题栈
+    header_stack: List[Tuple[int, str]] = []
+    in_code_block = False
+    opening_fence = ""
+
+    for raw_line in lines:
+        line = raw_line.rstrip('\r\n')
+        lead = line.lstrip()
+        if not lead:
+            stripped = ""
+        elif lead[0] not in '#`~' and lead[0].isprintable():
+            # 普通正文行既不是标题也不是代码块边界，无需完整规范化
+            stripped = None
+        else:
+            stripped = _SPACES_PATTERN.sub(' ', line).strip()
+            stripped = "".join(filter(str.isprintable, stripped))
+
+        if not in_code_block:
+            level = _header_level(stripped) if stripped else 0
+            can_cut = (stripped == "" and block_len >= block_chars
+                       and not (block and block[-1].rstrip().endswith('-')))
+            if block and (level or can_cut):
+                yield [f"{'#' * lvl} {text}" for lvl, text in block_stack], block, not level
+                block, block_len = [], 0
+                block_stack = list(header_stack)
+            if level:
+                while header_stack and header_stack[-1][0] >= level:
+                    header_stack.pop()
+                header_stack.append((level, stripped[level:].strip()))
+
+            # 代码块内部不切分，也不识别标题（与 MarkdownHeaderTextSplitter 的判断一致）
+            if stripped:
+                if stripped.startswith("```") and stripped.count("```") == 1:
+                    in_code_block, opening_fence = True, "```"
+                elif stripped.startswith("~~~"):
+                    in_code_block, opening_fence = True, "~~~"
+        elif stripped and stripped.startswith(opening_fence):
+            in_code_block, opening_fence = False, ""
+
+        block.append(line)
+        block_len += len(line) + 1
+
+    if block:
+        yield [f"{'#' * lvl} {text}" for lvl, text in block_stack], block, False
+
+
+def split_block(prefix: List[str], block: List[str], splitter) -> List[Section]:
+    """Preprocess one block and split it into sections with `splitter` (a MarkdownHeaderTextSplitter)"""
+    text = DocumentFormatter.preprocess_text("\n".join(prefix + block))
+    return [Section(doc.page_content, doc.metadata) for doc in splitter.split_text(text)]
+
+
+class SectionMerger:
+    """
+    Join the sections of consecutive blocks.
+
+    Like MarkdownHeaderTextSplitter, adjacent content with the same headers is
+    merged; across a size cut (or once the merged section is too long) the
+    next part is marked as a continuation instead.
+    """
+
+    def __init__(self, block_chars: int = DEFAULT_BLOCK_CHARS):
+        self.block_chars = block_chars
+        self.pending: Optional[Section] = None
+
+    def add(self, sections: List[Section], cut: bool) -> Iterator[Section]:
+        for index, section in enumerate(sections):
+            pending = self.pending
+            if index == 0 and pending is not None and pending.metadata == section.metadata:
+                if not cut and len(pending.page_content) < self.block_chars:
+                    pending.page_content += "  \n" + section.page_content
+                    pending.chunk_offsets = None  # 内容变化，块需要重新计算
+                    continue
+                section.continued = True
+            if pending is not None:
+                yield pending
+            self.pending = section
+
+    def finish(self) -> Iterator[Section]:
+        if self.pending is not None:
+            yield self.pending
+            self.pending = None
+
+
+def iter_sections(lines: Iterable[str], splitter, block_chars: int = DEFAULT_BLOCK_CHARS) -> Iterator[Section]:
+    """
+    Split a markdown document given as an iterable of lines into sections, lazily.
+
+    For documents without oversized sections the result is the same as
+    preprocessing and splitting the whole text at once, but only one block
+    is held in memory.
+    """
+    merger = SectionMerger(block_chars)
+    for prefix, block, cut in iter_blocks(lines, block_chars):
+        yield from merger.add(split_block(prefix, block, splitter), cut)
+    yield from merger.finish()
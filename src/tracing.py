@@ -0,0 +1,233 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 阶段名称
+STAGE_JOB = "job"
+STAGE_PREPROCESS = "preprocess"
+STAGE_SPLIT = "split"
+STAGE_MEMORY = "memory_lookup"
+STAGE_HEADERS = "headers"
+STAGE_CHUNK = "chunk"
+STAGE_PROMPT = "prompt"
+STAGE_SEMAPHORE = "semaphore_wait"
+STAGE_RATE_LIMIT = "rate_limit_wait"
+STAGE_LLM = "llm_call"
+STAGE_RESTORE = "restore"
+STAGE_VALIDATE = "validate"
+STAGE_ASSEMBLE = "assemble"
+STAGE_OUTPUT = "output"
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NullTracer:
+    """Tracer used when tracing is off: every call is a no-op"""
+    enabled = False
+
+    def span(self, name: str, **args) -> _NullSpan:
+        return _NULL_SPAN
+
+    def wait(self, name: str, lock):
+        return lock
+
+    def finish(self):
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: 'JobTracer', name: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.record(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class _WaitSpan:
+    """Async context manager that records the time spent acquiring `lock`, then holds it"""
+    __slots__ = ("tracer", "name", "lock")
+
+    def __init__(self, tracer: 'JobTracer', name: str, lock):
+        self.tracer = tracer
+        self.name = name
+        self.lock = lock
+
+    async def __aenter__(self):
+        start = time.perf_counter()
+        await self.lock.acquire()
+        self.tracer.record(self.name, start, time.perf_counter(), {})
+
+    async def __aexit__(self, *exc):
+        self.lock.release()
+        return False
+
+
+class JobTracer:
+    """
+    Wall time of every stage of one job, as nested spans.
+
+    Spans are grouped into lanes by asyncio task (each chunk is translated in
+    its own task), so the Chrome trace shows concurrent chunks side by side.
+    """
+    enabled = True
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.events: List[tuple] = []  # (name, start, end, lane, args)
+        self._lanes: Dict[int, int] = {}
+
+    def _lane(self) -> int:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task is not None else 0
+        if key not in self._lanes:
+            self._lanes[key] = len(self._lanes)
+        return self._lanes[key]
+
+    def span(self, name: str, **args) -> _Span:
+        return _Span(self, name, args)
+
+    def wait(self, name: str, lock) -> _WaitSpan:
+        return _WaitSpan(self, name, lock)
+
+    def record(self, name: str, start: float, end: float, args: Dict[str, Any]):
+        self.events.append((name, start - self.origin, end - self.origin, self._lane(), args))
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """count, total, mean and max seconds per stage"""
+        stages: Dict[str, Dict[str, float]] = {}
+        for name, start, end, _, _ in self.events:
+            stage = stages.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            stage["count"] += 1
+            stage["total"] += end - start
+            stage["max"] = max(stage["max"], end - start)
+        for stage in stages.values():
+            stage["mean"] = stage["total"] / stage["count"]
+            for key in ("total", "mean", "max"):
+                stage[key] = round(stage[key], 6)
+        return stages
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "summary": self.summary(),
+            "spans": [
+                {"name": name, "start": round(start, 6), "duration": round(end - start, 6), "lane": lane,
+                 "args": args}
+                for name, start, end, lane, args in self.events
+            ],
+        }
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Trace Event Format, for chrome://tracing or Perfetto"""
+        events = [{"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": self.name or "job"}}]
+        for name, start, end, lane, args in self.events:
+            events.append({
+                "name": name, "cat": "translation", "ph": "X", "pid": 1, "tid": lane,
+                "ts": round(start * 1e6, 1), "dur": round((end - start) * 1e6, 1), "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+# cProfile 依赖线程级的 profile 钩子，同一时间只能有一个任务被分析
+_profile_lock = threading.Lock()
+
+
+class JobProfiler:
+    """
+    cProfile capture for one job.
+
+    The profiler hooks the event loop thread, so work of other jobs running
+    at the same time is included; only one job can be profiled at once.
+    """
+
+    def __init__(self):
+        self._profile: Optional[cProfile.Profile] = None
+        self._stats: Optional[pstats.Stats] = None
+
+    @classmethod
+    def start(cls) -> Optional['JobProfiler']:
+        if not _profile_lock.acquire(blocking=False):
+            logger.warning("Another job is being profiled, skipping profiling for this job")
+            return None
+        profiler = cls()
+        profiler._profile = cProfile.Profile()
+        profiler._profile.enable()
+        return profiler
+
+    def stop(self):
+        if self._profile is None:
+            return
+        self._profile.disable()
+        self._stats = pstats.Stats(self._profile)
+        self._profile = None
+        _profile_lock.release()
+
+    def to_json(self, limit: int = 200) -> Dict[str, Any]:
+        """The `limit` functions with the highest cumulative time"""
+        if self._stats is None:
+            return {"functions": []}
+        functions = []
+        for (filename, line, function), (_, ncalls, tottime, cumtime, _) in self._stats.stats.items():
+            functions.append({
+                "function": function, "file": filename, "line": line, "ncalls": ncalls,
+                "tottime": round(tottime, 6), "cumtime": round(cumtime, 6),
+            })
+        functions.sort(key=lambda item: item["cumtime"], reverse=True)
+        return {"total_time": round(self._stats.total_tt, 6), "functions": functions[:limit]}
+
+    def to_text(self, limit: int = 60) -> str:
+        if self._stats is None:
+            return ""
+        output = io.StringIO()
+        self._stats.stream = output
+        self._stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return output.getvalue()
+
+    def to_pstats(self) -> bytes:
+        """Raw stats in the format written by Stats.dump_stats (for snakeviz and similar tools)"""
+        return marshal.dumps(self._stats.stats) if self._stats is not None else b""
+
@@ -0,0 +1,309 @@
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import zlib
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+_TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+# 仅对少量、较短的差异做直接替换，其余情况把旧译文作为参考交给模型
+MAX_REUSE_EDITS = 3
+MAX_REUSE_EDIT_CHARS = 40
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE_PATTERN.sub(' ', text).strip().lower()
+
+
+def _shingles(text: str, size: int) -> Set[int]:
+    """Hashes of the character n-grams of the normalized text"""
+    text = _normalize(text)
+    if len(text) <= size:
+        return {zlib.crc32(text.encode('utf-8'))}
+    return {zlib.crc32(text[i:i + size].encode('utf-8')) for i in range(len(text) - size + 1)}
+
+
+def adapt_translation(old_source: str, new_source: str, old_translation: str) -> Optional[str]:
+    """
+    Carry small literal edits (version numbers, identifiers, names) from the
+    source over to an earlier translation.
+
+    Returns None unless every difference is a short replacement whose old
+    text appears exactly once, as a whole token, in the old translation.
+    """
+    old_tokens = list(_TOKEN_PATTERN.finditer(old_source))
+    new_tokens = list(_TOKEN_PATTERN.finditer(new_source))
+    matcher = SequenceMatcher(None, [m.group() for m in old_tokens], [m.group() for m in new_tokens],
+                              autojunk=False)
+    edits = [op for op in matcher.get_opcodes() if op[0] != 'equal']
+    if len(edits) > MAX_REUSE_EDITS:
+        return None
+
+    replacements = []
+    for tag, i1, i2, j1, j2 in edits:
+        if tag != 'replace':
+            return None
+        old_text = old_source[old_tokens[i1].start():old_tokens[i2 - 1].end()]
+        new_text = new_source[new_tokens[j1].start():new_tokens[j2 - 1].end()]
+        if max(len(old_text), len(new_text)) > MAX_REUSE_EDIT_CHARS or old_translation.count(old_text) != 1:
+            return None
+        match = re.search(r'(?<!\w)' + re.escape(old_text) + r'(?!\w)', old_translation)
+        if match is None:
+            return None
+        replacements.append((match.start(), match.end(), new_text))
+
+    # 从后往前替换，避免位置偏移；替换区间不能重叠
+    replacements.sort()
+    if any(a[1] > b[0] for a, b in zip(replacements, replacements[1:])):
+        return None
+    translation = old_translation
+    for start, end, new_text in reversed(replacements):
+        translation = translation[:start] + new_text + translation[end:]
+    return translation
+
+
+@dataclass
+class MemoryMatch:
+    source: str
+    translation: str
+    similarity: float  # 估计的 Jaccard 相似度
+    reused: Optional[str] = None  # 可直接使用的译文（完全相同或仅有细微差异）
+
+
+class TranslationMemory:
+    """
+    Fuzzy translation memory.
+
+    Each source segment gets a MinHash signature over its character n-grams.
+    Signatures are split into LSH bands, and each band is hashed into a
+    bucket, so a lookup only compares against entries that share a bucket
+    rather than the whole memory. Entries are kept per target language and
+    persisted to a JSON-lines file: a header line with the signature
+    parameters, then one line per entry. Saving appends the entries added or
+    changed since the last save; the file is only rewritten to drop
+    superseded lines or to convert an older format.
+    """
+
+    VERSION = 2
+
+    def __init__(self, path: Optional[str] = None, num_perm: int = 64, bands: int = 16,
+                 shingle_size: int = 5, threshold: float = 0.7, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = Path(path) if path else None
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.seed = seed
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                       for _ in range(num_perm)]
+
+        self.entries: List[Dict] = []
+        self._exact: Dict[Tuple[str, str], int] = {}  # (语言, 原文哈希) -> 条目序号
+        self._buckets: Dict[Tuple[str, int, int], List[int]] = {}  # (语言, 分带, 分带哈希) -> 条目序号
+        self._pending: List[int] = []  # 上次保存后新增或修改的条目
+        self._superseded = 0  # 文件中已被后面的行覆盖的条目数
+        self._rewrite = False  # 需要重写整个文件（旧格式、签名参数变化）
+        self._write_lock = threading.Lock()
+        self.stats = {"lookups": 0, "reused": 0, "referenced": 0, "misses": 0, "candidates": 0}
+
+    def signature(self, text: str) -> List[int]:
+        hashes = _shingles(text, self.shingle_size)
+        return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._perms]
+
+    def _band_keys(self, language: str, signature: List[int]):
+        for band in range(self.bands):
+            rows = tuple(signature[band * self.rows:(band + 1) * self.rows])
+            yield language, band, hash(rows)
+
+    @staticmethod
+    def _source_key(language: str, source: str) -> Tuple[str, str]:
+        return language, hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+    def _index(self, entry_id: int):
+        entry = self.entries[entry_id]
+        self._exact[self._source_key(entry['language'], entry['source'])] = entry_id
+        for key in self._band_keys(entry['language'], entry['signature']):
+            self._buckets.setdefault(key, []).append(entry_id)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, source: str, translation: str, language: str, signature: Optional[List[int]] = None):
+        """
+        Remember a translation (replaces the translation of an identical
+        source). `signature` is the source's signature if already computed by
+        lookup_many.
+        """
+        entry_id = self._exact.get(self._source_key(language, source))
+        if entry_id is not None:
+            if self.entries[entry_id]['translation'] != translation:
+                self.entries[entry_id]['translation'] = translation
+                self._pending.append(entry_id)
+                self._superseded += 1
+            return
+        self.entries.append({
+            "source": source,
+            "translation": translation,
+            "language": language,
+            "signature": signature or self.signature(source),
+        })
+        self._index(len(self.entries) - 1)
+        self._pending.append(len(self.entries) - 1)
+
+    def lookup(self, source: str, language: str) -> Optional[MemoryMatch]:
+        """Best earlier translation of a similar source, if it is at least `threshold` similar"""
+        return self._lookup(source, language)[0]
+
+    def lookup_many(self, sources: Sequence[str], language: str
+                    ) -> Tuple[Dict[int, MemoryMatch], List[Optional[List[int]]]]:
+        """
+        Matches by index, and the signature computed for each source (None for
+        exact matches) so that add() does not compute it again. The signatures
+        are pure-Python work; callers on the event loop run this in a thread,
+        which is safe while entries are being added.
+        """
+        matches, signatures = {}, []
+        for index, source in enumerate(sources):
+            match, signature = self._lookup(source, language)
+            if match is not None:
+                matches[index] = match
+            signatures.append(signature)
+        return matches, signatures
+
+    def _lookup(self, source: str, language: str) -> Tuple[Optional[MemoryMatch], Optional[List[int]]]:
+        self.stats["lookups"] += 1
+        entry_id = self._exact.get(self._source_key(language, source))
+        if entry_id is not None:
+            entry = self.entries[entry_id]
+            self.stats["reused"] += 1
+            return MemoryMatch(entry['source'], entry['translation'], 1.0, reused=entry['translation']), None
+
+        signature = self.signature(source)
+        candidates = set()
+        for key in self._band_keys(language, signature):
+            candidates.update(self._buckets.get(key, ()))
+        self.stats["candidates"] += len(candidates)
+
+        best, best_similarity = None, 0.0
+        for candidate in candidates:
+            other = self.entries[candidate]['signature']
+            similarity = sum(1 for x, y in zip(signature, other) if x == y) / self.num_perm
+            if similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+        if best is None or best_similarity < self.threshold:
+            self.stats["misses"] += 1
+            return None, signature
+
+        entry = self.entries[best]
+        reused = adapt_translation(entry['source'], source, entry['translation'])
+        self.stats["reused" if reused is not None else "referenced"] += 1
+        return MemoryMatch(entry['source'], entry['translation'], best_similarity, reused=reused), signature
+
+    def _parameters(self) -> Tuple:
+        return self.num_perm, self.shingle_size, self.seed
+
+    def load(self):
+        if self.path is None or not self.path.is_file():
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                header = json.loads(f.readline() or '{}')
+                if 'entries' in header:
+                    # 版本 1 是单个 JSON 对象，条目在 "entries" 中
+                    self._load_entries(header, header['entries'])
+                else:
+                    self._load_entries(header, self._read_lines(f))
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Ignoring unreadable translation memory {self.path}: {e}")
+            return
+        logger.info(f"Loaded {len(self.entries)} translation memory entries from {self.path}")
+
+    def _read_lines(self, lines):
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # 写入中断留下的不完整行，下次保存时重写文件
+                logger.warning(f"Skipping a damaged line of translation memory {self.path}")
+                self._rewrite = True
+
+    def _load_entries(self, header: Dict, entries):
+        params = (header.get('num_perm'), header.get('shingle_size'), header.get('seed'))
+        recompute = params != self._parameters()
+        for entry in entries:
+            entry_id = self._exact.get(self._source_key(entry['language'], entry['source']))
+            if entry_id is not None:
+                # 同一原文后写入的译文覆盖先前的
+                self.entries[entry_id]['translation'] = entry['translation']
+                self._superseded += 1
+                continue
+            if recompute:
+                # 参数变化后旧签名不可比较，重新计算
+                entry['signature'] = self.signature(entry['source'])
+            self.entries.append(entry)
+            self._index(len(self.entries) - 1)
+        self._rewrite = self._rewrite or recompute or header.get('version') != self.VERSION
+
+    def save(self):
+        """
+        Append the entries added or changed since the last save. Safe to run
+        in a worker thread while the event loop keeps adding entries; saves
+        are serialized by a lock.
+        """
+        if self.path is None:
+            return
+        with self._write_lock:
+            pending, self._pending = self._pending, []
+            rewrite = self._rewrite or self._superseded > len(self.entries) or not self.path.is_file()
+            if not pending and not rewrite:
+                return
+            entries = list(self.entries) if rewrite else [self.entries[entry_id] for entry_id in pending]
+            lines = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                if rewrite:
+                    header = {"version": self.VERSION, "num_perm": self.num_perm,
+                              "shingle_size": self.shingle_size, "seed": self.seed}
+                    tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+                    tmp_path.write_text(json.dumps(header) + '\n' + lines, encoding='utf-8')
+                    tmp_path.replace(self.path)
+                    self._superseded = 0
+                    self._rewrite = False
+                else:
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(lines)
+            except OSError:
+                # 下次保存时重写整个文件
+                self._rewrite = True
+                raise
+
+
+# 同一路径的记忆库在进程内只加载一次，供多个翻译器共享
+_memories: Dict[str, TranslationMemory] = {}
+
+
+def get_translation_memory(path: str, threshold: float = 0.7) -> TranslationMemory:
+    key = str(Path(path).resolve())
+    memory = _memories.get(key)
+    if memory is None:
+        memory = TranslationMemory(path, threshold=threshold)
+        memory.load()
+        _memories[key] = memory
+    memory.threshold = threshold
+    return memory
@@ -1,151 +1,386 @@
-from typing import List, Optional, Tuple
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
-from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
+from dataclasses import replace
+from typing import Awaitable, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import io
 import logging
 import re
+import threading
+import zipfile
 
 from config.settings import get_provider_settings
-from config.config import SILICONFLOW_API_KEY, OPENROUTER_API_KEY
-from .output import create_translation_response
-from .progress import TranslationProgress
+from config.config import get_api_keys
+from .archive import ArchiveWriter, entry_lines, is_markdown
+from .output import TranslationOutputFormatter, create_translation_response
+from .progress import StreamPreview, TranslationProgress
 from .formatter import DocumentFormatter
+from .llm_backends import (
+    BACKEND_LANGCHAIN, StreamStalled, StreamStats, UsageStats, create_backend, is_transport_error
+)
+from .batching import encode_segments, pack_segments, parse_batch_response
+from .cancellation import CancellationToken, TranslationCancelled
+from .translation_memory import MemoryMatch, TranslationMemory, get_translation_memory
+from .preprocessing import (
+    ChunkSettings, aiter_sections, create_markdown_splitter, create_text_splitter, default_workers,
+    get_process_pool
+)
+from .chunks import CHUNK_DONE, CHUNK_FAILED, CHUNK_INVALID, ChunkTable
 
-from config.translation_config import TranslationConfig
+from config.translation_config import (
+    TranslationConfig, CONTEXT_SEQUENTIAL, CONTEXT_SOURCE, CONTEXT_SUMMARY, CONTEXT_MODES, TUNE_APPLY, TUNE_MODES,
+    TUNE_OBJECTIVES, TUNE_OFF
+)
+from .prompts import PromptBuilder
+from .rate_limit import RateLimiter
+from .key_pool import KeyPool, get_key_pool, is_key_error
+from .sharding import Shard, ShardSet, get_shard_set
+from .job_history import JobTelemetry, get_job_history
+from .scheduler import DEFAULT_CAPACITY, JobScheduler, ScheduledJob, default_priority, get_scheduler
+from .tracing import (
+    NULL_TRACER, STAGE_ASSEMBLE, STAGE_CHUNK, STAGE_HEADERS, STAGE_JOB, STAGE_LLM, STAGE_MEMORY, STAGE_OUTPUT,
+    STAGE_PREPROCESS, STAGE_PROMPT, STAGE_RATE_LIMIT, STAGE_RESTORE, STAGE_SEMAPHORE, STAGE_SPLIT, STAGE_VALIDATE,
+    JobProfiler, JobTracer
+)
+from .validation import CheckedTranslation, OutputValidator, ValidationStats, describe
+from .routing import CONTENT_HEADER, ModelRouter, Route
+from .tuning import TuningResult, recommend
 import asyncio
 import time
-from concurrent.futures import ThreadPoolExecutor
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# LangChain 的导入开销占据了冷启动的大部分时间，因此推迟到第一次翻译（或后台预热）时再加载
+def _import_langchain():
+    """Import the LangChain modules used by the translator (cached by sys.modules after the first call)"""
+    from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
+    return MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
+
+def warmup():
+    """Preload heavy dependencies so the first translation does not pay the import cost"""
+    start = time.perf_counter()
+    try:
+        _import_langchain()
+        if get_provider_settings()[1].get('backend', BACKEND_LANGCHAIN) == BACKEND_LANGCHAIN:
+            import langchain_openai  # noqa: F401
+    except Exception as e:
+        logger.warning(f"Translator warmup failed: {e}")
+        return
+    logger.info(f"Translator warmup finished in {time.perf_counter() - start:.2f}s")
+
+def start_background_warmup() -> threading.Thread:
+    """Run warmup() in a daemon thread"""
+    thread = threading.Thread(target=warmup, name="translator-warmup", daemon=True)
+    thread.start()
+    return thread
+
+HEADER_LEVELS = ["header1", "header2", "header3", "header4", "header5", "header6"]
+
 class DocumentTranslator:
     # 替换原来的 __init__ 方法
-    def __init__(self, config: Optional[TranslationConfig] = None):
+    def __init__(self, config: Optional[TranslationConfig] = None,
+                 provider: Optional[str] = None, provider_settings: Optional[dict] = None,
+                 api_key: Optional[str] = None, semaphore: Optional[asyncio.Semaphore] = None,
+                 rate_limiter: Optional[RateLimiter] = None, memory: Optional[TranslationMemory] = None):
         self.config = config or TranslationConfig()
         self.glossary = self.config.glossary or {}
         self.context_buffer = []  # 保持上下文缓冲区
     
-        self.active_provider, self.provider_settings = get_provider_settings()
-        self.api_key = SILICONFLOW_API_KEY if self.active_provider == 'siliconflow' else OPENROUTER_API_KEY
-    
-        self.llm = ChatOpenAI(
-        model_name=self.provider_settings['model_name'],
-        openai_api_base=self.provider_settings['base_url'],
-        openai_api_key=self.api_key,
-        temperature=self.config.temperature,
-        )
-    
-        self.markdown_splitter = MarkdownHeaderTextSplitter(
-            headers_to_split_on=[
-            ("#", "header1"),
-            ("##", "header2"),
-            ("###", "header3"),
-            ("####", "header4"),
-            ("#####", "header5"),
-            ("######", "header6"),
-            ]
-        )
-    
-        # 使用配置中的分隔符
-        separators = self.config.custom_separators or [
-            "\n\n",  # Paragraph separator
-            "\n",    # Line separator
-            ". ",    # Period
-            "! ",    # Exclamation mark
-            "? ",    # Question mark
-            "。",    # Chinese period
-            "！",    # Chinese exclamation mark
-            "？",    # Chinese question mark
-            "；",    # Chinese semicolon
-            "; ",    # English semicolon
-        ]
-    
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.config.chunk_size,
-            chunk_overlap=self.config.chunk_overlap,
-            length_function=len,
-            separators=separators
-        )
+        if provider_settings is None:
+            self.active_provider, self.provider_settings = get_provider_settings()
+        else:
+            # 显式指定的服务商（用于基准测试等场景）
+            self.active_provider, self.provider_settings = provider or 'custom', provider_settings
+        # 同一服务商的多个密钥组成密钥池，按剩余速率预算分配请求
+        keys = get_api_keys(self.active_provider) if api_key is None else [api_key]
+        self.key_pool: KeyPool = get_key_pool(self.active_provider, keys,
+                                              self.provider_settings.get('key_requests_per_minute'))
+        self.api_key = keys[0] if keys else None
+
+        # LLM 后端、提示词和分割器在第一次使用时才创建
+        self._backends = {}  # (shard, model_name, api_key) -> backend
+        self._prompts = None
+        self._markdown_splitter = None
+        self._text_splitter = None
     
-        # 添加信号量控制并发
-        self.semaphore = asyncio.Semaphore(self.config.max_concurrent)
+        if self.config.context_mode not in CONTEXT_MODES:
+            raise ValueError(f"Unknown context mode '{self.config.context_mode}', expected one of {CONTEXT_MODES}")
+        if self.config.auto_tune not in TUNE_MODES:
+            raise ValueError(f"Unknown auto_tune mode '{self.config.auto_tune}', expected one of {TUNE_MODES}")
+        if self.config.tune_objective not in TUNE_OBJECTIVES:
+            raise ValueError(f"Unknown tune objective '{self.config.tune_objective}', expected one of {TUNE_OBJECTIVES}")
+
+        # 按内容类型把块分配给不同的模型
+        self.router = ModelRouter(self.provider_settings)
+
+        # 多服务商模式：请求同时分发到多个服务商/模型，总并发为各分片并发之和
+        self.shards: Optional[ShardSet] = None
+        if self.config.shards:
+            from config.settings import load_settings
+            self.shards = get_shard_set(self.config.shards, load_settings().get('providers', {}),
+                                        self.config.max_concurrent)
+
+        # 添加信号量控制并发（批量翻译时多个翻译器可共享同一个信号量和限速器）
+        # 未指定信号量时，任务运行期间由全局调度器在各任务之间分配并发名额
+        self.max_concurrent = self.shards.total_concurrency if self.shards else self.config.max_concurrent
+        self.shared_semaphore = semaphore is not None
+        self.semaphore = semaphore or asyncio.Semaphore(self.max_concurrent)
+        self.scheduled_job: Optional[ScheduledJob] = None
+        if rate_limiter is None and self.config.requests_per_minute:
+            rate_limiter = RateLimiter(self.config.requests_per_minute)
+        self.rate_limiter = rate_limiter
+
+        # 翻译记忆库：相似的块复用或参考以前的译文
+        if memory is None and self.config.translation_memory:
+            memory = get_translation_memory(self.config.translation_memory, self.config.memory_threshold)
+        self.memory = memory
+
+        # 流式响应的首 token 时间、生成速度和卡顿次数
+        self.stream_stats = StreamStats()
+
+        # 译文校验（在 compile_prompts 中按目标语言创建）
+        self.validator: Optional[OutputValidator] = None
+        self.validation_stats = ValidationStats()
+
+        # 任务的设置和结果（块数、输出长度、错误数、耗时），记入任务历史供自动调优使用
+        self.telemetry = JobTelemetry()
+        self.tuning: Optional[TuningResult] = None
+
+        # 当前任务的取消令牌（客户端断开或主动取消时中止排队和进行中的请求）
+        self.cancel_token: Optional[CancellationToken] = None
+
+        # 最近一个任务的阶段耗时记录和 cProfile 结果（由 config.trace / config.profile 开启）
+        self.tracer = NULL_TRACER
+        self.profiler: Optional[JobProfiler] = None
+
+    @property
+    def backend(self):
+        """LLM backend selected by the provider's "backend" setting, for the primary model"""
+        return self.backend_for(self.provider_settings['model_name'])
 
+    def backend_for(self, model_name: str, api_key: Optional[str] = None, shard: Optional[Shard] = None):
+        """Backend for one of the provider's (or a shard's) models and one of its keys"""
+        if shard is None:
+            api_key = api_key or self.api_key
+        cache_key = (shard.name if shard else None, model_name, api_key)
+        if cache_key not in self._backends:
+            provider_settings = shard.provider_settings if shard else self.provider_settings
+            settings = dict(provider_settings, model_name=model_name)
+            self._backends[cache_key] = create_backend(settings, api_key, self.config.temperature)
+        return self._backends[cache_key]
 
-    def create_translation_prompt(self, text: str, previous_translation: Optional[str] = None) -> str:
-        # Get target language from configuration
+    @property
+    def requires_sequential_context(self) -> bool:
+        """True if each chunk depends on the translation of the previous one"""
+        return self.config.context_mode == CONTEXT_SEQUENTIAL
+
+    @property
+    def prompts(self) -> PromptBuilder:
+        """Prompt templates compiled for the current job"""
+        if self._prompts is None:
+            self.compile_prompts()
+        return self._prompts
+
+    def resolve_target_language(self) -> str:
+        """The configured target language, else the one in settings"""
+        if self.config.target_language:
+            return self.config.target_language
         from config.settings import load_settings
-        settings = load_settings()
-        target_language = settings.get('target_language', 'zh')
-        
-        language_map = {
-            'zh-Hans': 'fluent, professional Simplified Chinese that conforms to Chinese reading habits',
-            'zh-Hant': 'fluent, professional Traditional Chinese that conforms to Traditional Chinese reading habits',
-            'en': 'fluent, professional English that conforms to English writing conventions',
-            'ja': 'fluent, professional Japanese that conforms to Japanese writing conventions',
-            'ko': 'fluent, professional Korean that conforms to Korean writing conventions',
-            'fr': 'fluent, professional French that conforms to French writing conventions',
-            'de': 'fluent, professional German that conforms to German writing conventions',
-            'es': 'fluent, professional Spanish that conforms to Spanish writing conventions',
-            'pt': 'fluent, professional Portuguese that conforms to Portuguese writing conventions',
-            'ru': 'fluent, professional Russian that conforms to Russian writing conventions',
-            'ar': 'fluent, professional Arabic that conforms to Arabic writing conventions',
-            'hi': 'fluent, professional Hindi that conforms to Hindi writing conventions',
-            'it': 'fluent, professional Italian that conforms to Italian writing conventions',
-            'tr': 'fluent, professional Turkish that conforms to Turkish writing conventions',
-            'vi': 'fluent, professional Vietnamese that conforms to Vietnamese writing conventions',
-            'th': 'fluent, professional Thai that conforms to Thai writing conventions',
-            'id': 'fluent, professional Indonesian that conforms to Indonesian writing conventions',
-            'fa': 'fluent, professional Persian that conforms to Persian writing conventions'
-        }
-        
-        language_description = language_map.get(target_language, language_map['zh-Hans'])
-        
-        base_prompt = f"""You are an expert academic translator and formatter. Your task is to translate academic papers while preserving and improving their formatting. 
+        return load_settings().get('target_language', 'zh')
 
-Instructions:
-1. Translate the following text into {language_description}.
-2. Maintain all markdown formatting including headers, lists, code blocks, and links.
-3. Keep the same header hierarchy.
-4. Only output the translated {target_language} content, do not include the original text.
+    def compile_prompts(self) -> PromptBuilder:
+        """Read the target language once and build the job-constant prompt prefixes"""
+        target_language = self.resolve_target_language()
+        self._prompts = PromptBuilder(target_language, self.config.context_mode)
+        if self.config.validate_output:
+            self.validator = OutputValidator(target_language, self.config.min_length_ratio,
+                                             self.config.max_length_ratio)
+        return self._prompts
 
-Text to be translated:
-{{text}}"""
-        
-        if previous_translation:
-            context_prompt = """\n\nTo maintain contextual coherence, here is the previous paragraph's translation for reference:
-{previous_translation}
-
-Additional formatting instructions:
-1. Remove any extra spaces between characters or words in the main text.
-2. Preserve all links, image references, and URLs exactly as they appear.
-3. Correct any header levels if needed (e.g., 1, 2, 3 are first-level; 1.1, 1.2 are second-level).
-4. Ensure headers are properly separated with blank lines before and after.
-5. Maintain consistent terminology and writing style with the previous translation.
-6. Output only the translated text without any additional labels or explanations.
-"""
-            return base_prompt + context_prompt
-        
-        return base_prompt
+    @property
+    def usage(self) -> dict:
+        """Token usage summed over all backends used by this translator"""
+        total = UsageStats()
+        for backend in self._backends.values():
+            for key, value in vars(backend.usage).items():
+                setattr(total, key, getattr(total, key) + value)
+        return total.to_dict()
+
+    @property
+    def route_report(self) -> dict:
+        """Per-route request volume and latency"""
+        return self.router.report()
+
+    @property
+    def markdown_splitter(self):
+        if self._markdown_splitter is None:
+            self._markdown_splitter = create_markdown_splitter()
+        return self._markdown_splitter
+
+    @property
+    def text_splitter(self):
+        if self._text_splitter is None:
+            # 使用配置中的分隔符
+            self._text_splitter = create_text_splitter(*self.chunk_settings)
+        return self._text_splitter
+
+    @property
+    def chunk_settings(self) -> ChunkSettings:
+        """Text splitter parameters, in a form that can be sent to worker processes"""
+        separators = self.config.custom_separators
+        return self.config.chunk_size, self.config.chunk_overlap, tuple(separators) if separators else None
+
+    def prep_executor(self, total_chars: int):
+        """Process pool for preprocessing and chunking, or None if the document is too small to benefit"""
+        workers = self.config.prep_workers or default_workers()
+        if workers <= 1 or total_chars < self.config.parallel_prep_min_chars:
+            return None
+        return get_process_pool(workers)
+
+    def preview_for_job(self) -> Optional[StreamPreview]:
+        """Live preview of one response for the job's progress listeners, if anyone is listening"""
+        if self.config.job_id is None or not self.config.stream_responses:
+            return None
+        progress_tracker = TranslationProgress.for_job(self.config.job_id)
+        return StreamPreview(progress_tracker) if progress_tracker.has_preview_subscribers() else None
+
+    async def request(self, backend, prompt: str, system: Optional[str], provider_settings: dict,
+                      preview: Optional[StreamPreview] = None, attempts: int = 1) -> str:
+        """
+        One LLM call. Responses are streamed unless disabled in the config or
+        by the provider's "stream" setting; a stalled stream is retried up to
+        `attempts` times in total.
+        """
+        if not self.config.stream_responses or not provider_settings.get('stream', True):
+            return await backend.complete(prompt, system=system)
+        for attempt in range(attempts):
+            try:
+                return await self.stream_response(backend, prompt, system, preview)
+            except StreamStalled as e:
+                if attempt + 1 >= attempts:
+                    raise
+                logger.warning(f"{e}, retrying")
+                if preview is not None:
+                    preview.reset()
 
-    def translate_chunk(self, text: str, previous_translation: Optional[str] = None) -> str:
+    async def stream_response(self, backend, prompt: str, system: Optional[str],
+                              preview: Optional[StreamPreview] = None) -> str:
+        """Collect a streamed response, aborting it if tokens stop arriving"""
+        stream = backend.stream(prompt, system=system)
+        pieces = []
+        start = time.perf_counter()
+        first_token = None
+        try:
+            while True:
+                timeout = (self.config.stream_first_token_timeout if first_token is None
+                           else self.config.stream_stall_timeout)
+                try:
+                    piece = await asyncio.wait_for(stream.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    self.stream_stats.stalls += 1
+                    raise StreamStalled(f"Stream stalled: no tokens for {timeout:.0f}s after {len(pieces)} tokens")
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                pieces.append(piece)
+                if preview is not None:
+                    preview.add(piece)
+        finally:
+            await stream.aclose()
+
+        if first_token is not None:
+            generation = time.perf_counter() - start - first_token
+            self.stream_stats.add(first_token, len(pieces), generation)
+            tokens_per_second = round((len(pieces) - 1) / generation, 1) if generation > 0 else None
+            logger.debug(f"Streamed {len(pieces)} tokens, first after {first_token:.2f}s, {tokens_per_second} tokens/s")
+            if preview is not None:
+                preview.finish(ttft=round(first_token, 3), tokens_per_second=tokens_per_second)
+        return "".join(pieces)
+
+    async def complete(self, prompt: str, system: Optional[str] = None, route: Optional[Route] = None,
+                       segments: Sequence[str] = (), content_type: Optional[str] = None,
+                       preview: Optional[StreamPreview] = None) -> str:
+        """
+        Send one request to the route's backend, respecting the rate limit.
+
+        The request goes out with a key from the provider's key pool; if the
+        key is rate limited or rejected, it is retried once with each of the
+        other keys.
+        """
+        route = route or self.router.primary
+        if self.rate_limiter is not None:
+            with self.tracer.span(STAGE_RATE_LIMIT):
+                await self.rate_limiter.acquire()
+        if self.shards is not None:
+            return await self.complete_sharded(prompt, system, route, segments, preview)
+        for attempt in range(len(self.key_pool)):
+            key = await self.key_pool.acquire()
+            start = time.perf_counter()
+            error = None
+            try:
+                with self.tracer.span(STAGE_LLM, model=route.model_name, chars=len(prompt)):
+                    response = await self.request(self.backend_for(route.model_name, key.key), prompt, system,
+                                                  self.provider_settings, preview, self.config.max_retries)
+            except Exception as e:
+                error = e
+                self.telemetry.request_errors += 1
+                self.router.record(route, segments, time.perf_counter() - start, error=True,
+                                   content_type=content_type)
+                if is_key_error(e) and attempt + 1 < len(self.key_pool):
+                    logger.warning(f"Request with API key {key.label} failed ({e}), trying another key")
+                    continue
+                raise
+            finally:
+                self.key_pool.release(key, error)
+            self.router.record(route, segments, time.perf_counter() - start, content_type=content_type)
+            return response
+
+    async def complete_sharded(self, prompt: str, system: Optional[str], route: Route,
+                               segments: Sequence[str], preview: Optional[StreamPreview] = None) -> str:
+        """
+        Send one request to one of the shards.
+
+        Routes only apply to shards of the active provider; other shards use
+        their own model. A failed request is retried on another key of the
+        same shard if the key was the problem, otherwise on another shard.
+        """
+        chars = sum(len(segment) for segment in segments) or len(prompt)
+        tried = set()
+        attempts = self.shards.total_keys + len(self.shards)
+        for attempt in range(attempts):
+            shard = await self.shards.acquire(tried)
+            model_name = shard.model_name
+            if shard.provider == self.active_provider and route is not self.router.primary:
+                model_name = route.model_name
+            key = await shard.key_pool.acquire()
+            start = time.perf_counter()
+            error = None
+            try:
+                with self.tracer.span(STAGE_LLM, model=model_name, shard=shard.name, chars=len(prompt)):
+                    # 卡顿的流不在同一分片重试，而是换一个分片
+                    return await self.request(self.backend_for(model_name, key.key, shard), prompt, system,
+                                              shard.provider_settings, preview)
+            except Exception as e:
+                error = e
+                self.telemetry.request_errors += 1
+                if attempt + 1 >= attempts or (not is_key_error(e) and len(tried) + 1 >= len(self.shards)):
+                    raise
+                if not is_key_error(e):
+                    tried.add(shard.name)
+                logger.warning(f"Request to shard {shard.name} failed ({e}), retrying")
+                if preview is not None:
+                    preview.reset()
+            finally:
+                shard.key_pool.release(key, error)
+                self.shards.release(shard, chars, time.perf_counter() - start, error)
+
+    async def translate_chunk(self, text: str, previous_translation: Optional[str] = None) -> str:
         try:
             # Preprocess text
             text = DocumentFormatter.preprocess_text(text)
             
-            prompt = self.create_translation_prompt(text, previous_translation)
-            prompt_template = PromptTemplate(
-                template=prompt,
-                input_variables=["text"] if not previous_translation else ["text", "previous_translation"]
-            )
-            
-            input_variables = {"text": text}
-            if previous_translation:
-                input_variables["previous_translation"] = previous_translation
-            
-            result = prompt_template.format(**input_variables)
-            response = self.llm.predict(result)
+            system, prompt = self.prompts.chunk(text, previous_translation)
+            response = await self.complete(prompt, system, self.router.route(text), [text])
             
             # Post-process translation result
             translated_text = DocumentFormatter.postprocess_translation(response.strip())
@@ -156,25 +391,156 @@ Additional formatting instructions:
             logger.error(f"Error occurred while translating chunk: {str(e)}")
             return f"[Translation Error] {str(e)}"
 
-    def translate_header(self, header_text: str) -> str:
+    async def translate_header(self, header_text: str) -> str:
         """
         Translate header text
         """
         try:
-            # Create a simplified prompt for headers
-            prompt = self.create_translation_prompt(header_text)
-            # Escape curly braces in header text to prevent formatting issues
-            escaped_header_text = header_text.replace("{", "{{").replace("}", "}}")
-            prompt_template = PromptTemplate(template=prompt, input_variables=["text"])
-            result = prompt_template.format(text=escaped_header_text)
-            response = self.llm.predict(result)
+            system, prompt = self.prompts.chunk(header_text)
+            route = self.router.route(header_text, CONTENT_HEADER)
+            response = await self.complete(prompt, system, route, [header_text], CONTENT_HEADER)
             return response.strip()
         except Exception as e:
             logger.error(f"Error occurred while translating header: {str(e)}")
             return header_text  # If translation fails, return original header
 
-    # 完全替换 translate_document 方法
-    async def translate_document(self, text: str, original_filename: str) -> Tuple[bytes, str]:
+    async def translate_document(self, text: str, original_filename: str,
+                                 cancel_token: Optional[CancellationToken] = None) -> Tuple[bytes, str]:
+        """Translate a markdown document; cancelling `cancel_token` aborts it with TranslationCancelled"""
+        return await self.run_job(self._translate_document(text, original_filename), original_filename, cancel_token,
+                                  len(text))
+
+    async def run_job(self, job: Awaitable, original_filename: str, cancel_token: Optional[CancellationToken],
+                      total_chars: Optional[int] = None):
+        """Run a translation job with cancellation, scheduling, stage tracing and profiling as configured"""
+        self.tune()
+        self.telemetry = self.job_telemetry()
+        start = time.perf_counter()
+        own_semaphore = self.semaphore
+        if not self.shared_semaphore:
+            self.scheduled_job = self.schedule(original_filename, total_chars)
+            self.semaphore = self.scheduled_job
+        self.cancel_token = cancel_token
+        self.tracer = JobTracer(original_filename) if self.config.trace else NULL_TRACER
+        self.profiler = JobProfiler.start() if self.config.profile else None
+        try:
+            with self.tracer.span(STAGE_JOB, file=original_filename):
+                if cancel_token is None:
+                    result = await job
+                else:
+                    result = await cancel_token.run(job)
+            self.telemetry.wall_seconds = time.perf_counter() - start
+            self.telemetry.invalid_chunks = self.validation_stats.failed
+            if self.telemetry.chunks:
+                logger.info(f"Job telemetry: {self.telemetry.to_dict()}")
+            self.record_history(total_chars)
+            return result
+        except TranslationCancelled as e:
+            logger.info(f"Translation of {original_filename} cancelled: {e}")
+            progress_tracker = await TranslationProgress.get_instance(self.config.job_id)
+            await progress_tracker.update(
+                progress=progress_tracker.progress,
+                translated_chunks=progress_tracker.translated_chunks,
+                total_chunks=progress_tracker.total_chunks,
+                status="Translation cancelled",
+            )
+            raise
+        finally:
+            if self.scheduled_job is not None:
+                self.scheduled_job.close()
+                self.semaphore = own_semaphore
+            # 取消的任务已完成的块也保存
+            await self.save_memory()
+            TranslationProgress.discard(self.config.job_id)
+            if self.profiler is not None:
+                self.profiler.stop()
+            self.tracer.finish()
+
+    def job_telemetry(self) -> JobTelemetry:
+        """Telemetry of the next job, with the settings it runs with (after tune())"""
+        return JobTelemetry(
+            target_language=self.prompts.target_language,
+            context_mode=self.config.context_mode,
+            chunk_size=self.config.chunk_size,
+            chunk_overlap=self.config.chunk_overlap,
+            concurrency=1 if self.requires_sequential_context else self.effective_concurrency,
+            # 共用信号量或分片时，耗时不只取决于本任务的设置
+            shared=self.shared_semaphore or self.shards is not None,
+        )
+
+    def record_history(self, total_chars: Optional[int]):
+        """Add the finished job's request latency and telemetry to the job history (plan estimates, auto-tuning)"""
+        if not self.config.job_history:
+            return
+        get_job_history(self.config.job_history).record(
+            self.active_provider, self.provider_settings.get('model_name', 'unknown'), total_chars,
+            self.usage, self.stream_stats.to_dict(), self.telemetry)
+
+    def recommend_settings(self, explore: bool = True) -> Optional[TuningResult]:
+        """Chunk size and concurrency recommended by the job history for this provider, model and language"""
+        if not self.config.job_history:
+            return None
+        config = self.config
+        max_concurrency = config.max_tuned_concurrency
+        if not self.shared_semaphore:
+            # 任务的请求由全局调度器分配，并发数不会超过它的总名额
+            max_concurrency = min(max_concurrency, self.scheduler.capacity)
+        return recommend(get_job_history(config.job_history).jobs, self.active_provider,
+                         self.provider_settings.get('model_name', 'unknown'), self.resolve_target_language(),
+                         config.context_mode, config.chunk_size, config.chunk_overlap, self.effective_concurrency,
+                         config.tune_objective, config.max_error_rate, max_concurrency, explore)
+
+    @property
+    def effective_concurrency(self) -> int:
+        """max_concurrent, limited by the scheduler's capacity unless the translator has a shared semaphore"""
+        if self.shared_semaphore:
+            return self.max_concurrent
+        return min(self.max_concurrent, self.scheduler.capacity)
+
+    @property
+    def scheduler(self) -> JobScheduler:
+        """The global scheduler; with shards its capacity is at least the shards' total concurrency"""
+        capacity = self.config.max_concurrent_requests
+        if self.shards is not None:
+            # 与 batch_translate 相同：总名额不能少于各分片并发之和，否则分片任务被限制在默认名额
+            capacity = max(capacity or DEFAULT_CAPACITY, self.shards.total_concurrency)
+        return get_scheduler(capacity)
+
+    def tune(self):
+        """
+        Look up the recommended settings (config.auto_tune) and, in apply mode,
+        use them for the next job. The concurrency of shards and of semaphores
+        shared with other translators is left alone.
+        """
+        if self.config.auto_tune == TUNE_OFF or self.tuning is not None:
+            return
+        self.tuning = self.recommend_settings(explore=self.config.auto_tune == TUNE_APPLY)
+        if self.tuning is None:
+            return
+        tuning = self.tuning
+        logger.info(f"Auto-tuning: chunk_size {tuning.chunk_size}, overlap {tuning.chunk_overlap}, "
+                    f"concurrency {tuning.max_concurrent}{' (exploring)' if tuning.explore else ''} - {tuning.basis}")
+        if self.config.auto_tune != TUNE_APPLY:
+            return
+        # 配置对象可能与其他翻译器共用，替换而不修改
+        self.config = replace(self.config, chunk_size=tuning.chunk_size, chunk_overlap=tuning.chunk_overlap)
+        self._text_splitter = None
+        if not self.shared_semaphore and self.shards is None and tuning.max_concurrent != self.max_concurrent:
+            self.config.max_concurrent = self.max_concurrent = tuning.max_concurrent
+            self.semaphore = asyncio.Semaphore(self.max_concurrent)
+
+    def schedule(self, original_filename: str, total_chars: Optional[int]) -> ScheduledJob:
+        """Register the job with the global scheduler; its queue position goes to the job's progress stream"""
+        priority = self.config.priority or default_priority(total_chars)
+        # 调度器的总名额是全局设置；本任务的 max_concurrent 只限制本任务自己的请求
+        scheduled = self.scheduler.register(
+            self.config.job_id or original_filename, self.config.client_id, priority,
+            self.config.client_max_concurrent, self.max_concurrent)
+        if self.config.job_id is not None:
+            scheduled.on_position = TranslationProgress.for_job(self.config.job_id).update_queue_position
+        return scheduled
+
+    async def _translate_document(self, text: str, original_filename: str) -> Tuple[bytes, str]:
         logger.info(f"AI Provider: {self.active_provider}, Model: {self.provider_settings['model_name']}")
     
         try:
@@ -183,98 +549,554 @@ Additional formatting instructions:
         
             # 重置上下文缓冲区
             self.context_buffer = []
+
+            # 每个任务只编译一次提示词
+            self.compile_prompts()
         
-            # Preprocess the entire document
-            text = DocumentFormatter.preprocess_text(text)
+            executor = self.prep_executor(len(text))
+            if executor is not None:
+                # 大文档在标题边界处切开，由进程池并行预处理、分割和切块，事件循环保持响应
+                with self.tracer.span(STAGE_PREPROCESS, chars=len(text), parallel=True):
+                    markdown_docs = [section async for section in
+                                     aiter_sections(io.StringIO(text), self.chunk_settings, executor)]
+            else:
+                # Preprocess the entire document
+                with self.tracer.span(STAGE_PREPROCESS, chars=len(text)):
+                    text = DocumentFormatter.preprocess_text(text)
         
-            # Use MarkdownHeaderTextSplitter to split document while preserving header information
-            markdown_docs = self.markdown_splitter.split_text(text)
+                # Use MarkdownHeaderTextSplitter to split document while preserving header information
+                with self.tracer.span(STAGE_SPLIT, stage="sections"):
+                    markdown_docs = self.markdown_splitter.split_text(text)
         
             # Process each split document chunk
-            translated_sections = []
-            progress_tracker = await TranslationProgress.get_instance()
+            progress_tracker = await TranslationProgress.get_instance(self.config.job_id)
             progress_tracker.reset()  # 重置进度
-            total_sections = len(markdown_docs)
-        
-            # Calculate total chunks for more accurate progress tracking
-            total_chunks = 0
-            section_chunk_counts = []
-            for doc in markdown_docs:
-                chunks = self.text_splitter.split_text(doc.page_content)
-                section_chunk_counts.append(len(chunks))
-                total_chunks += len(chunks)
+
+            async def report_progress(processed_chunks: int, total_chunks: int, status: str, chunk_time: float):
+                await progress_tracker.update(
+                    progress=round((processed_chunks / total_chunks) * 100, 1),
+                    translated_chunks=processed_chunks,
+                    total_chunks=total_chunks,
+                    status=status,
+                    chunk_time=chunk_time
+                )
+
+            translated_sections = await self.translate_sections(markdown_docs, {}, report_progress)
+
+            # Merge translation results from all sections (already post-processed)
+            final_translation = "\n\n".join(section for section in translated_sections if section)
+            self.log_job_stats()
         
-            processed_chunks = 0
+            with self.tracer.span(STAGE_OUTPUT):
+                return create_translation_response(
+                    translated_text=final_translation,
+                    original_filename=original_filename,
+                    provider_name=provider_name,
+                    model_name=model_name
+                )
         
-            for i, doc in enumerate(markdown_docs):
-                # Further split each document chunk using text_splitter (if needed)
-                chunks = self.text_splitter.split_text(doc.page_content)
-            
-                # Translate each chunk
-                translated_chunks = []
-                for j, chunk in enumerate(chunks):
-                    chunk_start_time = time.time()
-                
-                    # 获取上下文
-                    context = self.get_context_for_translation()
-                
-                    # 异步翻译
-                    translated_chunk = await self.translate_chunk_async(chunk, context)
-                    translated_chunks.append(translated_chunk)
-                
-                    # 更新上下文缓冲区
-                    self.manage_context_buffer(translated_chunk)
-                
-                    # 计算处理时间
-                    chunk_time = time.time() - chunk_start_time
-                
-                    # Update processed chunks count
-                    processed_chunks += 1
-                
-                    # Update progress more frequently (per chunk rather than per section)
-                    progress = round((processed_chunks / total_chunks) * 100, 1)
+        except Exception as e:
+            logger.error(f"Error occurred while translating the document: {str(e)}")
+            raise
+
+    async def translate_stream(self, lines: Iterable[str], original_filename: str, output: BinaryIO,
+                               total_chars: Optional[int] = None,
+                               cancel_token: Optional[CancellationToken] = None) -> str:
+        """
+        Translate a document read line by line and write the result to `output`.
+
+        Sections are split lazily and translated in windows of roughly
+        `stream_window_chars`; each finished window is written out and
+        released, so memory use does not grow with the document size.
+        Returns the output filename.
+        """
+        return await self.run_job(self._translate_stream(lines, original_filename, output, total_chars),
+                                  original_filename, cancel_token, total_chars)
+
+    async def _translate_stream(self, lines: Iterable[str], original_filename: str, output: BinaryIO,
+                                total_chars: Optional[int]) -> str:
+        logger.info(f"AI Provider: {self.active_provider}, Model: {self.provider_settings['model_name']} (streaming)")
+        formatter = TranslationOutputFormatter(
+            self.provider_settings.get('name', self.active_provider),
+            self.provider_settings.get('model_name', 'unknown'),
+        )
+        self.context_buffer = []
+        self.compile_prompts()
+        progress_tracker = await TranslationProgress.get_instance(self.config.job_id)
+        progress_tracker.reset()
+
+        # 统计已读取的字符数，用于估算整体进度
+        consumed_chars = 0
+
+        def counted(source: Iterable[str]) -> Iterator[str]:
+            nonlocal consumed_chars
+            for line in source:
+                consumed_chars += len(line)
+                yield line
+
+        translated_headers: Dict[str, str] = {}  # 跨窗口复用已翻译的标题
+        done_chunks = 0
+        window_start_chars = 0
+        wrote_section = False
+        output.write(formatter.header().encode('utf-8'))
+
+        async def translate_window(window: List) -> None:
+            nonlocal done_chunks, window_start_chars, wrote_section
+            window_end_chars = consumed_chars
+            window_done = 0
+
+            async def report_progress(processed_chunks: int, total_chunks: int, status: str, chunk_time: float):
+                nonlocal window_done
+                window_done = processed_chunks
+                if total_chars:
+                    read = window_start_chars + (window_end_chars - window_start_chars) * processed_chunks / total_chunks
+                    progress = min(99.0, round(read / total_chars * 100, 1))
+                else:
+                    progress = progress_tracker.progress
+                await progress_tracker.update(
+                    progress=progress,
+                    translated_chunks=done_chunks + processed_chunks,
+                    total_chunks=done_chunks + total_chunks,
+                    status=status,
+                    chunk_time=chunk_time
+                )
+
+            translated = await self.translate_sections(window, translated_headers, report_progress)
+            with self.tracer.span(STAGE_OUTPUT, sections=len(window)):
+                for section in translated:
+                    if section:
+                        output.write((("\n\n" if wrote_section else "") + section).encode('utf-8'))
+                        wrote_section = True
+            done_chunks += window_done
+            window_start_chars = window_end_chars
+
+        executor = self.prep_executor(total_chars or 0)
+        sections = aiter_sections(counted(lines), self.chunk_settings, executor)
+        while True:
+            # 先读满一个窗口（读取、预处理和分割），再翻译该窗口
+            window, window_chars = [], 0
+            with self.tracer.span(STAGE_PREPROCESS):
+                async for section in sections:
+                    window.append(section)
+                    window_chars += len(section.page_content)
+                    if window_chars >= self.config.stream_window_chars:
+                        break
+            if not window:
+                break
+            await translate_window(window)
+
+        self.log_job_stats()
+        return formatter.output_filename(original_filename)
+
+    async def translate_archive(self, source: BinaryIO, original_filename: str, output: BinaryIO,
+                                cancel_token: Optional[CancellationToken] = None) -> str:
+        """
+        Translate every markdown file of a zip archive as one job and write a zip with the same layout.
+
+        The sections of all files share the translation windows, so small
+        files are batched together instead of each paying for a request;
+        other entries (images, ...) are copied unchanged. Entries are
+        decompressed while they are read and the output zip is written as
+        the windows finish. Returns the output filename.
+        """
+        with zipfile.ZipFile(source) as archive:
+            documents = [info for info in archive.infolist() if is_markdown(info)]
+            total_chars = sum(info.file_size for info in documents)
+            return await self.run_job(self._translate_archive(archive, documents, original_filename, output,
+                                                              total_chars),
+                                      original_filename, cancel_token, total_chars)
+
+    async def _translate_archive(self, archive: zipfile.ZipFile, documents: List[zipfile.ZipInfo],
+                                 original_filename: str, output: BinaryIO, total_chars: int) -> str:
+        logger.info(f"AI Provider: {self.active_provider}, Model: {self.provider_settings['model_name']} "
+                    f"(archive, {len(documents)} documents)")
+        formatter = TranslationOutputFormatter(
+            self.provider_settings.get('name', self.active_provider),
+            self.provider_settings.get('model_name', 'unknown'),
+        )
+        self.context_buffer = []
+        self.compile_prompts()
+        progress_tracker = await TranslationProgress.get_instance(self.config.job_id)
+        progress_tracker.reset()
+
+        writer = ArchiveWriter(output)
+        try:
+            with self.tracer.span(STAGE_OUTPUT, stage="copy_assets"):
+                for info in archive.infolist():
+                    if not is_markdown(info):
+                        writer.copy(archive, info)
+
+            translated_headers: Dict[str, str] = {}  # 所有文件共用已翻译的标题
+            done_chunks = 0
+            read_chars = 0
+            window: List[Tuple[int, object]] = []  # (文档序号, 章节)
+            window_chars = 0
+            window_documents: List[int] = []
+            finished_documents = set()
+            opened = set()  # 已在输出中创建条目的文档
+            written = set()  # 已写入至少一个章节的文档
+
+            async def translate_window():
+                nonlocal done_chunks, window, window_chars, window_documents
+                window_done = 0
+
+                async def report_progress(processed_chunks: int, total_chunks: int, status: str, chunk_time: float):
+                    nonlocal window_done
+                    window_done = processed_chunks
                     await progress_tracker.update(
-                        progress=progress,
-                        translated_chunks=processed_chunks,
-                        total_chunks=total_chunks,
-                        status=f"Translating section {i + 1}/{total_sections}, chunk {j + 1}/{len(chunks)}...",
+                        progress=min(99.0, round(read_chars / max(total_chars, 1) * 100, 1)),
+                        translated_chunks=done_chunks + processed_chunks,
+                        total_chunks=done_chunks + total_chunks,
+                        status=status,
                         chunk_time=chunk_time
                     )
-            
-                # Merge translation results for current section
-                section_translation = "\n\n".join(translated_chunks)
-            
-                # If the original document chunk has header metadata, add header context
-                if doc.metadata:
-                    # Build header context
-                    header_context = ""
-                    for header_level in ["header1", "header2", "header3", "header4", "header5", "header6"]:
-                        if header_level in doc.metadata:
-                            header_symbol = "#" * int(header_level[-1])
-                            # Translate header text
-                            translated_header = self.translate_header(doc.metadata[header_level])
-                            header_context += f"{header_symbol} {translated_header}\n\n"
-                
-                    section_translation = header_context + section_translation
-            
-                translated_sections.append(section_translation)
-        
-            # Merge translation results from all sections
-            final_translation = "\n\n".join(translated_sections)
-        
-            # Final post-processing
-            final_translation = DocumentFormatter.postprocess_translation(final_translation)
-        
-            return create_translation_response(
-                translated_text=final_translation,
-                original_filename=original_filename,
-                provider_name=provider_name,
-                model_name=model_name
+
+                translated = await self.translate_sections([section for _, section in window], translated_headers,
+                                                           report_progress)
+                with self.tracer.span(STAGE_OUTPUT, sections=len(window)):
+                    by_document: Dict[int, List[str]] = {index: [] for index in window_documents}
+                    for (index, _), section in zip(window, translated):
+                        if section:
+                            by_document[index].append(section)
+                    for index in window_documents:
+                        sections = by_document[index]
+                        text = "\n\n".join(sections)
+                        if index not in opened:
+                            opened.add(index)
+                            text = formatter.header() + text
+                        elif sections and index in written:
+                            text = "\n\n" + text
+                        if sections:
+                            written.add(index)
+                        writer.write(documents[index], text)
+                        if index in finished_documents:
+                            writer.finish()
+                done_chunks += window_done
+                window, window_chars, window_documents = [], 0, []
+
+            executor = self.prep_executor(total_chars)
+            for index, info in enumerate(documents):
+                window_documents.append(index)
+                with self.tracer.span(STAGE_PREPROCESS, file=info.filename):
+                    async for section in aiter_sections(entry_lines(archive, info), self.chunk_settings, executor):
+                        window.append((index, section))
+                        window_chars += len(section.page_content)
+                        if window_chars >= self.config.stream_window_chars:
+                            await translate_window()
+                            window_documents.append(index)
+                read_chars += info.file_size
+                finished_documents.add(index)
+            if window_documents:
+                await translate_window()
+        finally:
+            writer.close()
+
+        self.log_job_stats()
+        return formatter.output_filename(original_filename, ".zip")
+
+    def log_job_stats(self):
+        logger.info(f"Backend usage ({self.backend.name}): {self.usage}")
+        logger.info(f"Prompt stats: {self.prompts.stats()}")
+        if self.router.enabled:
+            logger.info(f"Route stats: {self.route_report}")
+        if self.memory is not None:
+            logger.info(f"Translation memory: {len(self.memory)} entries, {self.memory.stats}")
+        if len(self.key_pool) > 1:
+            logger.info(f"API keys: {self.key_pool.report()}")
+        if self.shards is not None:
+            logger.info(f"Shard stats: {self.shards.report()}")
+        if self.scheduled_job is not None:
+            logger.info(f"Scheduling: {self.scheduled_job.report()}")
+        if self.stream_stats.streams or self.stream_stats.stalls:
+            logger.info(f"Streaming: {self.stream_stats.to_dict()}")
+        if self.validation_stats.checked:
+            logger.info(f"Validation: {self.validation_stats.to_dict()}")
+        if self.tracer.enabled:
+            logger.info(f"Stage times: {self.tracer.summary()}")
+
+    async def translate_sections(self, markdown_docs, translated_headers: Dict[str, str],
+                                 report_progress: Callable[[int, int, str, float], Awaitable[None]]
+                                 ) -> List[Optional[str]]:
+        """
+        Translate and assemble a list of sections.
+
+        `translated_headers` caches header translations and is updated in
+        place, so it can be shared between calls for the same document.
+        """
+        total_sections = len(markdown_docs)
+
+        # Split every section once and flatten the chunks so small ones can be batched across sections.
+        # Chunks are kept as offsets into the section texts and only sliced out when they are sent.
+        with self.tracer.span(STAGE_SPLIT, stage="chunks", sections=total_sections):
+            chunks = ChunkTable.from_sections([doc.page_content for doc in markdown_docs], self.text_splitter,
+                                              [getattr(doc, 'chunk_offsets', None) for doc in markdown_docs])
+        section_counts = chunks.section_counts()
+        total_chunks = len(chunks)
+        translated_chunks: List[Optional[str]] = [None] * total_chunks
+        self.telemetry.chunks += total_chunks
+        self.telemetry.chunk_chars += sum(chunks.lengths())
+        with self.tracer.span(STAGE_MEMORY, chunks=total_chunks):
+            memory_matches, signatures = await self.lookup_memory(chunks)
+
+        # Headers repeat across sections (parent headers are in every child's metadata), translate each once
+        headers = [doc.metadata[level] for doc in markdown_docs for level in HEADER_LEVELS if level in doc.metadata]
+        with self.tracer.span(STAGE_HEADERS):
+            translated_headers.update(await self.translate_headers(
+                [header for header in headers if header not in translated_headers]
+            ))
+    
+        # 每个章节的块全部完成后立即组装该章节，最终结果只需按顺序拼接
+        translated_sections: List[Optional[str]] = [None] * total_sections
+        pending_chunks = list(section_counts)
+
+        def finish_section(i: int):
+            start = chunks.section_starts[i]
+            with self.tracer.span(STAGE_ASSEMBLE, section=i):
+                translated_sections[i] = self.assemble_section(
+                    markdown_docs[i], translated_chunks[start:start + section_counts[i]], translated_headers
+                )
+
+        for i, count in enumerate(pending_chunks):
+            if count == 0:
+                finish_section(i)
+
+        def complete_chunk(index: int):
+            translated_chunk = translated_chunks[index]
+            if translated_chunk.startswith("[Translation Error]"):
+                chunks.status[index] = CHUNK_FAILED
+            elif not getattr(translated_chunk, 'issues', None):
+                chunks.status[index] = CHUNK_DONE
+            section_index = chunks.section[index]
+            pending_chunks[section_index] -= 1
+            if pending_chunks[section_index] == 0:
+                finish_section(section_index)
+
+        # 未通过校验的块及其翻译时使用的上下文，在其余块完成后重新翻译
+        requeue: List[Tuple[int, Optional[str]]] = []
+        processed_chunks = 0
+        last_completion = time.time()
+
+        async def translate_planned_batch(batch: List[int], context: Optional[str]):
+            nonlocal processed_chunks, last_completion
+            batch_texts = [chunks[index] for index in batch]
+
+            # 异步翻译
+            with self.tracer.span(STAGE_CHUNK, chunks=batch, section=chunks.section[batch[0]]):
+                if len(batch) == 1:
+                    match = memory_matches.get(batch[0])
+                    if match is not None and match.reused is not None:
+                        # 与记忆库中的原文相同或只有细微差异，无需请求模型
+                        batch_translations = [match.reused]
+                    else:
+                        batch_translations = [await self.translate_chunk_async(batch_texts[0], context, match)]
+                else:
+                    batch_translations = await self.translate_batch_async(batch_texts, context)
+
+            for index, translated_chunk in zip(batch, batch_translations):
+                translated_chunks[index] = translated_chunk
+                if getattr(translated_chunk, 'issues', None):
+                    # 章节等重新翻译完成后再组装
+                    chunks.status[index] = CHUNK_INVALID
+                    requeue.append((index, context))
+                else:
+                    complete_chunk(index)
+
+            # 按完成间隔计算每块耗时，并行时剩余时间估算依然准确
+            now = time.time()
+            chunk_time = (now - last_completion) / len(batch)
+            last_completion = now
+
+            # Update processed chunks count
+            processed_chunks += len(batch)
+
+            # Update progress more frequently (per chunk rather than per section)
+            i, j = chunks.position(batch[-1])
+            await report_progress(
+                processed_chunks, total_chunks,
+                f"Translating section {i + 1}/{total_sections}, chunk {j + 1}/{section_counts[i]}...",
+                chunk_time
             )
-        
-        except Exception as e:
-            logger.error(f"Error occurred while translating the document: {str(e)}")
-            raise
+            return batch_translations
+
+        batches = self.plan_batches(chunks.lengths())
+        if memory_matches:
+            # 命中记忆库的块单独翻译，以便带上匹配到的译文
+            batches = [part for batch in batches
+                       for part in ([[index] for index in batch] if any(index in memory_matches for index in batch)
+                                    else [batch])]
+
+        if self.requires_sequential_context:
+            # 每一块都依赖上一块的译文，只能顺序翻译
+            for batch in batches:
+                # 获取上下文
+                context = self.get_context_for_translation()
+                for translated_chunk in await translate_planned_batch(batch, context):
+                    # 更新上下文缓冲区
+                    self.manage_context_buffer(translated_chunk)
+        else:
+            # 上下文在翻译前即可确定，所有批次并发执行（由信号量限制并发数）
+            summaries = {}
+            if self.config.context_mode == CONTEXT_SUMMARY:
+                summaries = await self.summarize_sections(markdown_docs, section_counts)
+            await asyncio.gather(*[
+                translate_planned_batch(batch, self.get_independent_context(batch, chunks, summaries))
+                for batch in batches
+            ])
+
+        if requeue:
+            await report_progress(processed_chunks, total_chunks,
+                                  f"Retranslating {len(requeue)} chunks that failed validation...", 0.0)
+            await self.requeue_invalid(requeue, chunks, translated_chunks)
+            for index, _ in requeue:
+                complete_chunk(index)
+
+        self.telemetry.failed_chunks += chunks.status.count(CHUNK_FAILED)
+        self.telemetry.output_chars += sum(len(chunk) for chunk in translated_chunks if chunk is not None)
+        self.remember_translations(chunks, translated_chunks, signatures)
+        return translated_sections
+
+    async def requeue_invalid(self, requeue: List[Tuple[int, Optional[str]]], chunks: ChunkTable,
+                              translated_chunks: List[Optional[str]]):
+        """
+        Translate chunks that failed validation again, one request each, with the
+        reasons in the prompt and on the provider's "fallback_model" if set. A chunk
+        that still fails keeps the translation with the fewest issues.
+        """
+        self.validation_stats.requeued += len(requeue)
+        for _ in range(self.config.validation_retries):
+            pending = [(index, context) for index, context in requeue if chunks.status[index] == CHUNK_INVALID]
+            if not pending:
+                break
+            retries = await asyncio.gather(*[
+                self.translate_chunk_async(chunks[index], context, rejected=translated_chunks[index].issues)
+                for index, context in pending
+            ])
+            for (index, _), retry in zip(pending, retries):
+                if retry.startswith("[Translation Error]"):
+                    continue
+                issues = getattr(retry, 'issues', [])
+                if len(issues) < len(translated_chunks[index].issues):
+                    translated_chunks[index] = retry
+                if not issues:
+                    chunks.status[index] = CHUNK_DONE
+                    self.validation_stats.fixed += 1
+        invalid = [index for index, _ in requeue if chunks.status[index] == CHUNK_INVALID]
+        if invalid:
+            logger.warning(f"{len(invalid)} chunks still fail validation: "
+                           f"{[(index, translated_chunks[index].issues) for index in invalid[:10]]}")
+
+    def validate(self, source: str, response: str) -> List[str]:
+        """Issues found in a model response (both in placeholder form); empty if it passed or validation is off"""
+        if self.validator is None:
+            return []
+        start = time.perf_counter()
+        with self.tracer.span(STAGE_VALIDATE):
+            issues = self.validator.check(source, response)
+        stats = self.validation_stats
+        stats.seconds += time.perf_counter() - start
+        stats.checked += 1
+        if issues:
+            stats.failed += 1
+            for issue in issues:
+                stats.issues[issue] = stats.issues.get(issue, 0) + 1
+        return issues
+
+    @staticmethod
+    def assemble_section(doc, translated_chunks: List[str], translated_headers: Dict[str, str]) -> str:
+        """Prefix a section's translated chunks with its translated header context"""
+        if getattr(doc, 'continued', False):
+            # 超长章节的后续部分，标题已随前一部分输出
+            return DocumentFormatter.postprocess_section([], translated_chunks)
+        headers = [
+            (int(header_level[-1]), translated_headers[doc.metadata[header_level]])
+            for header_level in HEADER_LEVELS if header_level in doc.metadata
+        ]
+        return DocumentFormatter.postprocess_section(headers, translated_chunks)
+
+    def get_independent_context(self, batch: List[int], chunks: ChunkTable,
+                                summaries: Dict[int, str]) -> Optional[str]:
+        """Context for modes that do not depend on earlier translations"""
+        first = batch[0]
+        if self.config.context_mode == CONTEXT_SOURCE:
+            preceding = [chunks[index] for index in range(max(0, first - self.config.context_window), first)]
+            return "\n\n".join(preceding) or None
+        if self.config.context_mode == CONTEXT_SUMMARY:
+            return summaries.get(chunks.section[first])
+        return None
+
+    async def summarize_sections(self, markdown_docs, section_counts: List[int]) -> Dict[int, str]:
+        """Summarize every section that spans several chunks, once, before translation starts"""
+        # 摘要只需要章节的开头部分，限制输入长度以控制成本
+        max_chars = self.config.chunk_size * 4
+
+        async def summarize(index: int, text: str) -> Tuple[int, Optional[str]]:
+            system, prompt = self.prompts.summary(text[:max_chars])
+            try:
+                async with self.tracer.wait(STAGE_SEMAPHORE, self.semaphore):
+                    return index, (await self.complete(prompt, system)).strip()
+            except Exception as e:
+                logger.warning(f"Could not summarize section {index + 1}: {e}")
+                return index, None
+
+        results = await asyncio.gather(*[
+            summarize(i, doc.page_content)
+            for i, doc in enumerate(markdown_docs) if section_counts[i] > 1
+        ])
+        return {index: summary for index, summary in results if summary}
+
+    async def lookup_memory(self, chunks: Sequence[str]) -> Tuple[Dict[int, MemoryMatch], List[Optional[List[int]]]]:
+        """Translation-memory matches by chunk index, and the chunks' signatures for remember_translations"""
+        if self.memory is None:
+            return {}, []
+        # MinHash 签名是纯 Python 计算（每个 2000 字符的块数十毫秒），放到线程中以免阻塞事件循环
+        return await asyncio.to_thread(self.memory.lookup_many, list(chunks), self.prompts.target_language)
+
+    def remember_translations(self, chunks: Sequence[str], translations: List[Optional[str]],
+                              signatures: List[Optional[List[int]]]):
+        """Add successful chunk translations to the translation memory (saved by run_job at the end of the job)"""
+        if self.memory is None:
+            return
+        language = self.prompts.target_language
+        for chunk, translation, signature in zip(chunks, translations, signatures):
+            if (translation and not translation.startswith("[Translation Error]")
+                    and not getattr(translation, 'issues', None)):
+                self.memory.add(chunk, translation, language, signature)
+
+    async def save_memory(self):
+        """Append the job's new translation memory entries to its file, off the event loop"""
+        if self.memory is None:
+            return
+        try:
+            await asyncio.to_thread(self.memory.save)
+        except OSError as e:
+            logger.warning(f"Could not save translation memory: {e}")
+
+    def plan_batches(self, lengths: List[int]) -> List[List[int]]:
+        """Group consecutive small chunks (given by their lengths) into multi-segment requests"""
+        if not self.config.batch_small_chunks:
+            return [[index] for index in range(len(lengths))]
+        return pack_segments(
+            lengths,
+            threshold=self.config.batch_threshold,
+            max_chars=self.config.chunk_size,
+            max_segments=self.config.batch_max_segments,
+        )
+
+    async def translate_headers(self, headers: List[str]) -> Dict[str, str]:
+        """Translate unique header texts, batching them like small chunks"""
+        unique_headers = list(dict.fromkeys(headers))
+        translated: Dict[str, str] = {}
+        for batch in self.plan_batches([len(header) for header in unique_headers]):
+            batch_headers = [unique_headers[index] for index in batch]
+            if len(batch_headers) == 1:
+                results = [await self.translate_header(batch_headers[0])]
+            else:
+                results = await self.translate_batch_async(batch_headers, protect=False, content_type=CONTENT_HEADER)
+                # 标题翻译失败时保留原文，与 translate_header 的行为一致
+                results = [header if result.startswith("[Translation Error]") else result.strip()
+                           for header, result in zip(batch_headers, results)]
+            translated.update(zip(batch_headers, results))
+        return translated
 
     def apply_glossary(self, text: str) -> str:
         """应用术语表"""
@@ -299,69 +1121,116 @@ Additional formatting instructions:
         return "\n\n".join(self.context_buffer[-self.config.context_window:])
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=8)
+        wait=wait_exponential(multiplier=1, min=2, max=8),
+        retry=retry_if_exception(is_transport_error),
+        reraise=True
     )
-    def translate_chunk_with_retry(self, text: str, context: Optional[str] = None) -> str:
+    async def translate_chunk_with_retry(self, text: str, context: Optional[str] = None,
+                                         memory: Optional[MemoryMatch] = None,
+                                         rejected: Optional[List[str]] = None) -> str:
         """带重试机制的翻译"""
         try:
-            return self.translate_chunk_enhanced(text, context)
+            return await self.translate_chunk_enhanced(text, context, memory, rejected)
         except Exception as e:
             logger.warning(f"Translation attempt failed: {e}")
             raise
 
-    def translate_chunk_enhanced(self, text: str, context: Optional[str] = None) -> str:
-        """增强的翻译方法"""
+    def protect_segment(self, text: str) -> Tuple[str, List[str], List[str]]:
+        """Replace code blocks and links with placeholders, then preprocess and apply the glossary"""
+        # 提取并保护代码块和链接
+        text_without_code, code_blocks = DocumentFormatter.extract_code_blocks(text)
+        text_without_links, link_elements = DocumentFormatter.extract_links_and_images(text_without_code)
+    
+        # 预处理文本
+        processed_text = DocumentFormatter.preprocess_text(text_without_links)
+    
+        # 应用术语表
+        processed_text = self.apply_glossary(processed_text)
+        return processed_text, code_blocks, link_elements
+
+    @staticmethod
+    def restore_segment(response: str, code_blocks: List[str], link_elements: List[str]) -> str:
+        """Restore placeholders in a model response and post-process it"""
+        # 恢复代码块和链接
+        translated_text = DocumentFormatter.restore_links_and_images(response.strip(), link_elements)
+        translated_text = DocumentFormatter.restore_code_blocks(translated_text, code_blocks)
+    
+        # 后处理翻译结果
+        return DocumentFormatter.postprocess_translation(translated_text)
+
+    async def translate_chunk_enhanced(self, text: str, context: Optional[str] = None,
+                                       memory: Optional[MemoryMatch] = None,
+                                       rejected: Optional[List[str]] = None) -> str:
+        """增强的翻译方法（rejected：上一次译文未通过的校验项，重新翻译时使用）"""
         try:
-            # 提取并保护代码块和链接
-            text_without_code, code_blocks = DocumentFormatter.extract_code_blocks(text)
-            text_without_links, link_elements = DocumentFormatter.extract_links_and_images(text_without_code)
-        
-            # 预处理文本
-            processed_text = DocumentFormatter.preprocess_text(text_without_links)
-        
-            # 应用术语表
-            processed_text = self.apply_glossary(processed_text)
-        
-            # 创建提示词
-            prompt = self.create_translation_prompt(processed_text, context)
-            prompt_template = PromptTemplate(
-                template=prompt,
-                input_variables=["text"] if not context else ["text", "previous_translation"]
-            )
-        
-            input_variables = {"text": processed_text}
-            if context:
-                input_variables["previous_translation"] = context
-        
-            result = prompt_template.format(**input_variables)
-            response = self.llm.predict(result)
-        
-            # 恢复代码块和链接
-            translated_text = DocumentFormatter.restore_links_and_images(response.strip(), link_elements)
-            translated_text = DocumentFormatter.restore_code_blocks(translated_text, code_blocks)
-        
-            # 后处理翻译结果
-            translated_text = DocumentFormatter.postprocess_translation(translated_text)
-        
-            return translated_text
+            with self.tracer.span(STAGE_PROMPT):
+                processed_text, code_blocks, link_elements = self.protect_segment(text)
+            
+                # 创建提示词（命中记忆库时附带以前的译文作为参考）
+                system, prompt = self.prompts.chunk(processed_text, context,
+                                                    (memory.source, memory.translation) if memory else None,
+                                                    describe(rejected) if rejected else None)
+            route = self.router.route(text)
+            if rejected and self.router.fallback is not None:
+                route = self.router.fallback
+            response = await self.complete(prompt, system, route, [text], preview=self.preview_for_job())
+            issues = self.validate(processed_text, response)
         
+            with self.tracer.span(STAGE_RESTORE):
+                return CheckedTranslation(self.restore_segment(response, code_blocks, link_elements), issues)
+
         except Exception as e:
+            if is_transport_error(e):
+                # 请求失败交给 translate_chunk_with_retry 重试，不把错误当作译文校验
+                raise
             logger.error(f"Error occurred while translating chunk: {str(e)}")
             return f"[Translation Error] {str(e)}"
 
-    async def translate_chunk_async(self, text: str, context: Optional[str] = None) -> str:
-        """异步翻译块"""
-        async with self.semaphore:
-            # 在线程池中执行翻译以避免阻塞
-            loop = asyncio.get_event_loop()
-            with ThreadPoolExecutor() as executor:
-                return await loop.run_in_executor(
-                    executor, 
-                    self.translate_chunk_with_retry, 
-                    text, 
-                    context
-                )
+    async def translate_batch_async(self, texts: List[str], context: Optional[str] = None,
+                                    protect: bool = True, content_type: Optional[str] = None) -> List[str]:
+        """Translate several small segments in one request, falling back to one request per segment"""
+        with self.tracer.span(STAGE_PROMPT, segments=len(texts)):
+            if protect:
+                protected = [self.protect_segment(text) for text in texts]
+            else:
+                protected = [(text, [], []) for text in texts]
 
+            system, prompt = self.prompts.batch(encode_segments([segment for segment, _, _ in protected]),
+                                                len(texts), context)
 
-    
-    
\ No newline at end of file
+        segments = None
+        async with self.tracer.wait(STAGE_SEMAPHORE, self.semaphore):
+            try:
+                route = self.router.route_batch(texts, content_type)
+                response = await self.complete(prompt, system, route, texts, content_type)
+                segments = parse_batch_response(response, len(texts))
+            except Exception as e:
+                logger.warning(f"Batch translation request failed: {e}")
+
+        if segments is None:
+            logger.warning(f"Malformed batch of {len(texts)} segments, translating them individually")
+            return list(await asyncio.gather(*[self.translate_chunk_async(text, context) for text in texts]))
+
+        issues = [self.validate(source, segment) for segment, (source, _, _) in zip(segments, protected)]
+        with self.tracer.span(STAGE_RESTORE, segments=len(texts)):
+            return [CheckedTranslation(self.restore_segment(segment, code_blocks, link_elements), segment_issues)
+                    for segment, (_, code_blocks, link_elements), segment_issues in zip(segments, protected, issues)]
+
+    async def translate_chunk_async(self, text: str, context: Optional[str] = None,
+                                    memory: Optional[MemoryMatch] = None,
+                                    rejected: Optional[List[str]] = None) -> str:
+        """异步翻译块"""
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+        async with self.tracer.wait(STAGE_SEMAPHORE, self.semaphore):
+            # 排队期间任务可能已被取消，此时直接释放并发名额
+            if self.cancel_token is not None:
+                self.cancel_token.raise_if_cancelled()
+            # 后端本身是异步的，不再需要线程池
+            try:
+                return await self.translate_chunk_with_retry(text, context, memory, rejected)
+            except Exception as e:
+                if not is_transport_error(e):
+                    raise
+                logger.error(f"Error occurred while translating chunk: {str(e)}")
+                return f"[Translation Error] {str(e)}"
@@ -0,0 +1,159 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.translation_config import CONTEXT_SEQUENTIAL, TUNE_CHARS, TUNE_CHUNKS
+
+# 调优时尝试的 chunk_size
+CHUNK_SIZES = (500, 1000, 1500, 2000, 3000, 4000, 6000, 8000)
+MIN_JOBS = 2  # 每种设置至少有几个任务才参与比较
+MIN_JOB_CHUNKS = 4  # 块数更少的任务用不满并发，不用于调优
+RECENT_JOBS = 200  # 每个服务商、模型和语言只看最近的任务
+
+
+@dataclass
+class SettingStats:
+    """Throughput and error rate of the recorded jobs that used one chunk size and concurrency"""
+    chunk_size: int
+    concurrency: int
+    jobs: int = 0
+    chars: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    errors: int = 0  # 失败的请求、失败的块和未通过校验的块
+
+    def add(self, job: Dict):
+        self.jobs += 1
+        # 块长度包含重叠部分，优先使用原文长度
+        self.chars += job.get('source_chars') or job.get('chunk_chars', 0)
+        self.chunks += job.get('chunks', 0)
+        self.seconds += job.get('wall_seconds', 0.0)
+        self.errors += job.get('request_errors', 0) + job.get('failed_chunks', 0) + job.get('invalid_chunks', 0)
+
+    @property
+    def chars_per_second(self) -> float:
+        return self.chars / self.seconds if self.seconds else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / (self.chunks + self.errors) if self.chunks + self.errors else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "chunk_size": self.chunk_size,
+            "concurrency": self.concurrency,
+            "jobs": self.jobs,
+            "chars_per_second": round(self.chars_per_second, 1),
+            "chunks_per_second": round(self.chunks_per_second, 3),
+            "error_rate": round(self.error_rate, 4),
+        }
+
+
+@dataclass
+class TuningResult:
+    chunk_size: int
+    chunk_overlap: int
+    max_concurrent: int
+    basis: str
+    explore: bool = False  # 尚未测量过的相邻设置，本次任务用来测量它
+    best: Optional[SettingStats] = None
+    settings: List[SettingStats] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "max_concurrent": self.max_concurrent,
+            "basis": self.basis,
+            "explore": self.explore,
+            "best": self.best.to_dict() if self.best else None,
+            "settings": [stats.to_dict() for stats in self.settings],
+        }
+
+
+def setting_stats(jobs: Iterable[Dict], provider: str, model_name: str, target_language: str,
+                  context_mode: str) -> Dict[Tuple[int, int], SettingStats]:
+    """Recorded jobs of this provider, model, language and context mode, grouped by (chunk size, concurrency)"""
+    matching = [
+        job for job in jobs
+        if job.get('provider') == provider and job.get('model_name') == model_name
+        and job.get('target_language') == target_language and job.get('context_mode') == context_mode
+        and not job.get('shared') and job.get('chunks', 0) >= MIN_JOB_CHUNKS and job.get('wall_seconds')
+    ]
+    stats: Dict[Tuple[int, int], SettingStats] = {}
+    for job in matching[-RECENT_JOBS:]:
+        key = (job['chunk_size'], job['concurrency'])
+        stats.setdefault(key, SettingStats(*key)).add(job)
+    return stats
+
+
+def _chunk_neighbours(chunk_size: int) -> List[int]:
+    """The next larger and smaller sizes of CHUNK_SIZES around `chunk_size`"""
+    larger = [size for size in CHUNK_SIZES if size > chunk_size]
+    smaller = [size for size in CHUNK_SIZES if size < chunk_size]
+    return larger[:1] + smaller[-1:]
+
+
+def recommend(jobs: Iterable[Dict], provider: str, model_name: str, target_language: str, context_mode: str,
+              chunk_size: int, chunk_overlap: int, concurrency: int, objective: str = TUNE_CHARS,
+              max_error_rate: float = 0.02, max_concurrency: int = 8, explore: bool = True) -> TuningResult:
+    """
+    Chunk size and concurrency with the highest measured throughput.
+
+    Only settings measured in at least MIN_JOBS jobs and with an error rate
+    of at most `max_error_rate` are considered. With `explore`, a
+    neighbouring setting of the best one (one concurrency step, or the next
+    size in CHUNK_SIZES) that has not been measured yet is returned instead,
+    so repeated jobs hill-climb towards the optimum and stop exploring once
+    every neighbour of the best setting has been measured. Concurrency
+    above a setting that exceeded the error limit is not tried. In
+    sequential context mode chunks are translated one at a time and only the
+    chunk size is tuned. The overlap keeps its ratio to the chunk size.
+    """
+    sequential = context_mode == CONTEXT_SEQUENTIAL
+    current = (chunk_size, 1 if sequential else concurrency)
+    stats = setting_stats(jobs, provider, model_name, target_language, context_mode)
+    measured = sorted(stats.values(), key=lambda s: (s.chunk_size, s.concurrency))
+
+    def throughput(s: SettingStats) -> float:
+        return s.chunks_per_second if objective == TUNE_CHUNKS else s.chars_per_second
+
+    def result(setting: Tuple[int, int], basis: str, exploring: bool = False) -> TuningResult:
+        size, slots = setting
+        return TuningResult(size, round(size * chunk_overlap / chunk_size) if chunk_size else 0,
+                            concurrency if sequential else slots, basis, exploring, best, measured)
+
+    eligible = [s for s in measured if s.jobs >= MIN_JOBS and s.error_rate <= max_error_rate]
+    best = max(eligible, key=throughput, default=None)
+    if best is None:
+        if current in stats and stats[current].error_rate > max_error_rate and not sequential and concurrency > 1:
+            # 当前设置出错太多且没有更好的设置：先降低并发
+            return result((chunk_size, concurrency - 1), "current settings exceed the error limit")
+        return result(current, "not enough measured jobs yet, measuring the current settings")
+    anchor = (best.chunk_size, best.concurrency)
+    basis = (f"{best.jobs} jobs at chunk_size {best.chunk_size}, concurrency {best.concurrency}: "
+             f"{best.chars_per_second:.0f} chars/s, error rate {best.error_rate:.1%}")
+    if not explore:
+        return result(anchor, basis)
+
+    def too_many_errors(size: int, slots: int) -> bool:
+        # 同样的块大小下，并发数不超过 slots 的设置已经超出错误率上限
+        return any(s.chunk_size == size and s.concurrency <= slots and s.error_rate > max_error_rate
+                   for s in measured)
+
+    candidates = []
+    if not sequential and best.concurrency < max_concurrency:
+        candidates.append((best.chunk_size, best.concurrency + 1))
+    candidates += [(size, best.concurrency) for size in _chunk_neighbours(best.chunk_size)]
+    if not sequential and best.concurrency > 1:
+        candidates.append((best.chunk_size, best.concurrency - 1))
+    for size, slots in candidates:
+        if (size, slots) in stats and stats[(size, slots)].jobs >= MIN_JOBS:
+            continue
+        if too_many_errors(size, slots):
+            continue
+        return result((size, slots), f"measuring a neighbour of the best setting ({basis})", True)
+    return result(anchor, basis)
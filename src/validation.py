@@ -0,0 +1,204 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+import collections
+import re
+
+# 校验问题
+ISSUE_LENGTH = "length_ratio"
+ISSUE_UNTRANSLATED = "untranslated"
+ISSUE_PLACEHOLDERS = "placeholders"
+ISSUE_LINKS = "links"
+ISSUE_STRUCTURE = "structure"
+
+# 重新翻译时告诉模型上一次的译文为什么被拒绝
+ISSUE_DESCRIPTIONS = {
+    ISSUE_LENGTH: "its length does not match the original (it was incomplete or contained extra text)",
+    ISSUE_UNTRANSLATED: "it was not in the target language",
+    ISSUE_PLACEHOLDERS: "placeholders such as __CODE_BLOCK_0__ or __LINK_ELEMENT_0__ were missing or changed",
+    ISSUE_LINKS: "URLs were missing or changed",
+    ISSUE_STRUCTURE: "headers, list items or table rows were missing or merged",
+}
+
+# 各目标语言使用的文字；未列出的语言使用拉丁字母
+_CJK = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+_LATIN = 'A-Za-z\u00c0-\u024f\u1e00-\u1eff'
+SCRIPTS = {
+    'zh': _CJK,
+    'ja': '\u3040-\u30ff' + _CJK,
+    'ko': '\u1100-\u11ff\u3130-\u318f\uac00-\ud7af',
+    'ru': '\u0400-\u04ff',
+    'ar': '\u0600-\u06ff\u0750-\u077f',
+    'fa': '\u0600-\u06ff\u0750-\u077f',
+    'hi': '\u0900-\u097f',
+    'th': '\u0e00-\u0e7f',
+}
+# 这些文字一个字符大约相当于其他文字的一个单词
+WIDE_SCRIPTS = ('zh', 'ja', 'ko', 'th')
+WIDE_CHAR_PATTERN = re.compile('[\u0e00-\u0e7f\u1100-\u11ff\u3040-\u30ff\u3130-\u318f\u3400-\u4dbf'
+                               '\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+_ACCENTED_PATTERN = re.compile('[\u00c0-\u024f\u1e00-\u1eff]')
+_NOT_ASCII_LETTERS = bytes(b for b in range(256) if not (65 <= b <= 90 or 97 <= b <= 122))
+NARROW_WEIGHT = 0.2  # 字母文字每个字母的权重（约五个字母一个单词）
+# 以单个字符类开头，正则引擎可以快速跳过不可能匹配的位置
+_PROTECTED_PATTERN = re.compile(r'[_h](?:_(?:CODE_BLOCK|LINK_ELEMENT)_\d+__|(ttps?://[^\s)>\]]+))')
+_STRUCTURE_PATTERN = re.compile(r'^[ \t]*(?:(#{1,6}[ \t])|((?:[-*+]|\d+[.)])[ \t])|(\|))', re.MULTILINE)
+
+MIN_CHECK_TOKENS = 30  # 更短的片段不检查长度比例和文字
+MIN_UNTRANSLATED_LETTERS = 20
+MIN_TARGET_SHARE = 0.3  # 译文中目标文字的最低占比
+RATIO_SAMPLES = 200
+MIN_RATIO_SAMPLES = 8
+RELATIVE_RATIO_BOUNDS = (0.45, 2.5)  # 相对本任务已通过校验的块的中位数
+
+
+class CheckedTranslation(str):
+    """A translated segment together with the validation issues found in it (empty if it passed)"""
+    issues: List[str] = []
+
+    def __new__(cls, text: str, issues: Sequence[str] = ()):
+        translation = super().__new__(cls, text)
+        translation.issues = list(issues)
+        return translation
+
+
+def script_key(language: str) -> str:
+    """'zh-Hans' -> 'zh'"""
+    return language.split('-')[0].lower()
+
+
+@dataclass
+class ValidationStats:
+    checked: int = 0
+    failed: int = 0
+    requeued: int = 0
+    fixed: int = 0
+    seconds: float = 0.0
+    issues: Dict[str, int] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict:
+        return {
+            "checked": self.checked,
+            "failed": self.failed,
+            "requeued": self.requeued,
+            "fixed": self.fixed,
+            "issues": dict(self.issues),
+            "us_per_check": round(self.seconds / self.checked * 1e6, 1) if self.checked else 0.0,
+        }
+
+
+class OutputValidator:
+    """
+    Fast checks of a model response against its source segment.
+
+    Both texts are compared in placeholder form (before code blocks and
+    links are restored). Checks: length ratio within fixed bounds and
+    within bounds around the median of this job's accepted segments, share
+    of the target language's script, identical placeholders and URLs, and
+    the same number of headers, table rows and (roughly) list items. Each
+    check is one regex pass or less, about 0.1 ms per 1000 characters.
+    """
+
+    def __init__(self, target_language: str, min_ratio: float = 0.3, max_ratio: float = 3.0):
+        key = script_key(target_language)
+        # 拉丁字母的目标语言：ASCII 字母直接计数，正则只统计较少出现的重音字母
+        self.target_pattern = re.compile(f"[{SCRIPTS[key]}]") if key in SCRIPTS else _ACCENTED_PATTERN
+        self.latin_target = key not in SCRIPTS
+        self.wide_target = key in WIDE_SCRIPTS
+        self.min_ratio = min_ratio
+        self.max_ratio = max_ratio
+        self.ratios = collections.deque(maxlen=RATIO_SAMPLES)
+        self._median: Optional[float] = None
+
+    def measure(self, text: str) -> Tuple[int, Optional[float]]:
+        """
+        (estimated tokens, weighted share of the target script among the letters) of
+        `text`; the share is None if it has too few letters. Non-ASCII characters
+        outside the wide scripts all count as letters (full-width punctuation
+        included), which is close enough here.
+        """
+        wide = len(WIDE_CHAR_PATTERN.findall(text))
+        tokens = wide + (len(text) - wide + 3) // 4  # 与 estimate_tokens 相同
+        ascii_text = text.encode('ascii', 'ignore')
+        ascii_letters = len(ascii_text.translate(None, _NOT_ASCII_LETTERS))
+        narrow = ascii_letters + len(text) - len(ascii_text) - wide
+        if narrow + wide < MIN_UNTRANSLATED_LETTERS:
+            return tokens, None
+        target = len(self.target_pattern.findall(text))
+        if self.latin_target:
+            target += ascii_letters
+        if self.wide_target:
+            own = target
+            other = (wide - target) + narrow * NARROW_WEIGHT
+        else:
+            own = target * NARROW_WEIGHT
+            other = wide + max(0, narrow - target) * NARROW_WEIGHT
+        return tokens, own / (own + other) if own + other else None
+
+    @staticmethod
+    def _protected(text: str):
+        """(placeholders, URLs) in order of appearance, and the text without them"""
+        placeholders, urls, parts = [], [], []
+        position = 0
+        for match in _PROTECTED_PATTERN.finditer(text):
+            (urls if match.group(1) else placeholders).append(match.group())
+            parts.append(text[position:match.start()])
+            position = match.end()
+        if not parts:
+            return placeholders, urls, text
+        parts.append(text[position:])
+        return placeholders, urls, ' '.join(parts)
+
+    @staticmethod
+    def _structure(text: str) -> List[int]:
+        counts = [0, 0, 0]  # 标题、列表项、表格行
+        for match in _STRUCTURE_PATTERN.finditer(text):
+            counts[match.lastindex - 1] += 1
+        return counts
+
+    def check(self, source: str, response: str) -> List[str]:
+        issues = []
+        source_placeholders, source_urls, source_text = self._protected(source)
+        placeholders, urls, text = self._protected(response)
+        if sorted(placeholders) != sorted(source_placeholders):
+            issues.append(ISSUE_PLACEHOLDERS)
+        if sorted(urls) != sorted(source_urls):
+            issues.append(ISSUE_LINKS)
+
+        headers, items, rows = self._structure(response)
+        source_headers, source_items, source_rows = self._structure(source)
+        if (headers != source_headers or rows != source_rows
+                or abs(items - source_items) > max(1, source_items // 10)):
+            issues.append(ISSUE_STRUCTURE)
+
+        source_tokens, source_share = self.measure(source_text)
+        if source_tokens >= MIN_CHECK_TOKENS:
+            tokens, share = self.measure(text)
+            ratio = tokens / source_tokens
+            low, high = self.min_ratio, self.max_ratio
+            if self._median is not None:
+                low = max(low, self._median * RELATIVE_RATIO_BOUNDS[0])
+                high = min(high, self._median * RELATIVE_RATIO_BOUNDS[1])
+            if not low <= ratio <= high:
+                issues.append(ISSUE_LENGTH)
+
+            if share is not None and source_share is not None and source_share < 0.5:
+                # 原文不是目标文字：译文中目标文字应占多数
+                if share < MIN_TARGET_SHARE:
+                    issues.append(ISSUE_UNTRANSLATED)
+            elif share is not None and ' '.join(text.split()) == ' '.join(source_text.split()):
+                # 原文和目标语言使用同一种文字（例如英译法）：只能发现原样返回的情况
+                issues.append(ISSUE_UNTRANSLATED)
+
+            if not issues:
+                self._add_ratio(ratio)
+        return issues
+
+    def _add_ratio(self, ratio: float):
+        self.ratios.append(ratio)
+        if len(self.ratios) >= MIN_RATIO_SAMPLES:
+            ordered = sorted(self.ratios)
+            self._median = ordered[len(ordered) // 2]
+
+
+def describe(issues: Sequence[str]) -> List[str]:
+    return [ISSUE_DESCRIPTIONS[issue] for issue in issues]
@@ -13,12 +13,17 @@ const app = createApp({
             selectedFile: null,
             isDragging: false,
             isTranslating: false,
+            isCancelling: false,
+            jobId: null,
+            abortController: null,
             error: null,
             progress: 0,
             translatedChunks: 0,
             totalChunks: 0,
             startTime: null,
             progressStatus: 'Preparing...',
+            livePreview: '',
+            previewStats: null,
             languageList: [],
             selectedLanguage: null
         }
@@ -141,7 +146,7 @@ const app = createApp({
         },
         handleFile(file) {
             // Validate file type
-            const allowedTypes = ['.txt', '.md', '.json', '.csv'];
+            const allowedTypes = ['.txt', '.md', '.json', '.csv', '.zip'];
             const fileExtension = '.' + file.name.split('.').pop().toLowerCase();
             
             if (!allowedTypes.includes(fileExtension)) {
@@ -178,20 +183,31 @@ const app = createApp({
             this.totalChunks = 0;
             this.startTime = Date.now();
             this.progressStatus = 'Preparing translation...';
+            this.jobId = Date.now().toString(36) + Math.random().toString(36).slice(2);
+            this.abortController = new AbortController();
 
             const formData = new FormData();
             formData.append('file', this.selectedFile);
             formData.append('model_name', this.selectedModel.id);
+            formData.append('job_id', this.jobId);
 
             // Setup progress tracking
             let eventSource = null;
             
             try {
                 // Start progress monitoring
-                eventSource = new EventSource('/translate-progress');
+                eventSource = new EventSource(`/translate-progress?job_id=${encodeURIComponent(this.jobId)}`);
                 eventSource.onmessage = (event) => {
                     try {
                         const data = JSON.parse(event.data);
+                        if (data.type === 'preview') {
+                            // Text of the response being generated right now
+                            this.livePreview = data.text;
+                            if (data.done && data.ttft !== undefined) {
+                                this.previewStats = { ttft: data.ttft, tokensPerSecond: data.tokens_per_second };
+                            }
+                            return;
+                        }
                         this.progress = data.progress || 0;
                         this.translatedChunks = data.translated_chunks || 0;
                         this.totalChunks = data.total_chunks || 0;
@@ -211,6 +227,7 @@ const app = createApp({
                         'Content-Type': 'multipart/form-data'
                     },
                     responseType: 'blob',
+                    signal: this.abortController.signal,
                     onUploadProgress: (progressEvent) => {
                         if (progressEvent.total) {
                             const uploadProgress = Math.round((progressEvent.loaded * 100) / progressEvent.total);
@@ -264,6 +281,12 @@ const app = createApp({
                 if (eventSource) {
                     eventSource.close();
                 }
+
+                // Cancelled by the user, nothing to report
+                if (axios.isCancel(error) || (error.response && error.response.status === 499)) {
+                    this.resetTranslationState();
+                    return;
+                }
                 
                 let errorMessage = 'An unexpected error occurred during translation';
                 
@@ -283,8 +306,15 @@ const app = createApp({
                         errorMessage = `Server error: ${error.response.status}`;
                     }
                 } else if (error.request) {
-                    // Network error
-                    errorMessage = 'Network error. Please check your connection and try again.';
+                    // Network error: the translation may have finished, fetch it from the result store
+                    try {
+                        await axios.head(`/results/${this.jobId}`);
+                        window.location.href = `/results/${this.jobId}`;
+                        this.resetTranslationState();
+                        return;
+                    } catch (storeError) {
+                        errorMessage = 'Network error. Please check your connection and try again.';
+                    }
                 } else if (error.code === 'ECONNABORTED') {
                     // Timeout error
                     errorMessage = 'Translation timeout. The file might be too large or the server is busy.';
@@ -294,13 +324,33 @@ const app = createApp({
                 this.resetTranslationState();
             }
         },
+        async cancelTranslation() {
+            if (!this.isTranslating || this.isCancelling) return;
+
+            this.isCancelling = true;
+            this.progressStatus = 'Cancelling translation...';
+            try {
+                // Stop the server-side job first so no further chunks are sent to the model
+                await axios.post(`/translate/${this.jobId}/cancel`);
+            } catch (error) {
+                console.error('Cancel error:', error);
+            }
+            if (this.abortController) {
+                this.abortController.abort();
+            }
+        },
         resetTranslationState() {
             this.isTranslating = false;
+            this.isCancelling = false;
+            this.jobId = null;
+            this.abortController = null;
             this.progress = 0;
             this.translatedChunks = 0;
             this.totalChunks = 0;
             this.startTime = null;
             this.progressStatus = 'Ready to start translation';
+            this.livePreview = '';
+            this.previewStats = null;
         },
         // Handle drag events
         handleDragOver(event) {
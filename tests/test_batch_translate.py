@@ -0,0 +1,32 @@
+from dataclasses import replace
+
+from batch_translate import TUNED_FIELDS, settings_fingerprint
+from config.translation_config import TranslationConfig
+
+PROVIDER = {"base_url": "https://api.example.com/v1", "model_name": "model-a"}
+
+
+def fingerprint(config: TranslationConfig, provider_settings=PROVIDER, exclude=()) -> str:
+    return settings_fingerprint("example", provider_settings, config, exclude)
+
+
+def test_runtime_settings_do_not_change_the_fingerprint():
+    config = TranslationConfig()
+    changed = replace(config, max_concurrent=config.max_concurrent + 5, max_retries=9, requests_per_minute=30,
+                      max_concurrent_requests=12, job_history=None)
+    assert fingerprint(changed) == fingerprint(config)
+
+
+def test_output_settings_change_the_fingerprint():
+    config = TranslationConfig()
+    assert fingerprint(replace(config, target_language="ja")) != fingerprint(config)
+    assert fingerprint(replace(config, chunk_size=config.chunk_size * 2)) != fingerprint(config)
+    assert fingerprint(config, dict(PROVIDER, model_name="model-b")) != fingerprint(config)
+
+
+def test_auto_tuned_chunk_settings_can_be_excluded():
+    config = TranslationConfig()
+    tuned = replace(config, chunk_size=config.chunk_size * 2, chunk_overlap=config.chunk_overlap * 2)
+    assert fingerprint(tuned, exclude=TUNED_FIELDS) == fingerprint(config, exclude=TUNED_FIELDS)
+    assert fingerprint(replace(config, target_language="ja"), exclude=TUNED_FIELDS) != \
+        fingerprint(config, exclude=TUNED_FIELDS)
@@ -0,0 +1,35 @@
+from src.chunks import CHUNK_PENDING, ChunkTable
+from src.preprocessing import create_text_splitter
+
+SECTIONS = [
+    "First paragraph of the section.\n\nSecond paragraph, a little longer than the first.\n\nThird one.",
+    "Another section\n\nwith two parts.",
+]
+
+
+def test_chunks_match_the_splitter():
+    splitter = create_text_splitter(40, 10)
+    table = ChunkTable.from_sections(SECTIONS, splitter)
+    expected = [chunk for text in SECTIONS for chunk in splitter.split_text(text)]
+    assert list(table) == expected
+    assert table.lengths() == [len(chunk) for chunk in expected]
+    assert all(status == CHUNK_PENDING for status in table.status)
+
+
+def test_sections_and_positions():
+    table = ChunkTable.from_sections(SECTIONS, create_text_splitter(40, 0))
+    counts = table.section_counts()
+    assert sum(counts) == len(table)
+    assert table.section_starts == [0, counts[0]]
+    assert table.position(len(table) - 1) == (1, counts[1] - 1)
+    assert table[-1] == table[len(table) - 1]
+
+
+def test_precomputed_offsets_and_overrides():
+    table = ChunkTable.from_sections(["abcdef", "xyz"], None, [[(0, 3), (2, 6)], [(0, 3)]])
+    assert list(table) == ["abc", "cdef", "xyz"]
+    assert table.section_counts() == [2, 1]
+    # 无法定位到原文中的块保存为文本
+    table.append(1, 0, -1, "not in the source")
+    assert table[3] == "not in the source"
+    assert table.length(3) == len("not in the source")
@@ -0,0 +1,25 @@
+import asyncio
+
+from src.progress import TranslationProgress
+
+
+def test_previews_only_reach_subscribers_of_the_job():
+    async def run():
+        job = TranslationProgress.for_job("preview-job")
+        everything = await job.subscribe()
+        own = await job.subscribe("preview-job")
+        assert TranslationProgress.for_job("unwatched-job").has_preview_subscribers() is False
+        assert job.has_preview_subscribers()
+        job.preview(1, "translated text")
+        job.publish(0.0)
+        events = [everything.get_nowait() for _ in range(everything.qsize())]
+        own_events = [own.get_nowait() for _ in range(own.qsize())]
+        await job.unsubscribe(everything)
+        await job.unsubscribe(own)
+        TranslationProgress.discard("preview-job")
+        TranslationProgress.discard("unwatched-job")
+        return events, own_events
+
+    events, own_events = asyncio.run(run())
+    assert [event.get("type") for event in events] == [None]
+    assert [event.get("type") for event in own_events] == ["preview", None]
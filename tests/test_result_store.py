@@ -0,0 +1,103 @@
+import asyncio
+import gzip
+import io
+import os
+import time
+
+from starlette.requests import Request
+
+from src.result_store import ResultStore
+from web_app import parse_range, result_response
+
+CONTENT = b"# Translated\n\n" + "一段译文。\n".encode("utf-8") * 2000
+
+
+def make_request(method="GET", **headers) -> Request:
+    return Request({"type": "http", "method": method, "path": "/results/job",
+                    "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]})
+
+
+async def read_body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+def test_save_and_read(tmp_path):
+    store = ResultStore(tmp_path)
+    entry = store.save("job", io.BytesIO(CONTENT), "doc.md")
+    assert entry.size == len(CONTENT) and entry.compressed_size < entry.size
+    assert b"".join(store.read(entry)) == CONTENT
+    assert b"".join(store.read(entry, 10, 19)) == CONTENT[10:20]
+    assert gzip.decompress(b"".join(store.read_compressed(entry))) == CONTENT
+    # 相同内容只保存一份
+    store.save("other", io.BytesIO(CONTENT), "copy.md")
+    assert len(list(tmp_path.glob("*.gz"))) == 1
+    assert [e.job_id for e in ResultStore(tmp_path).entries()] == ["other", "job"]
+
+
+def test_expired_results_are_hidden_and_evicted(tmp_path):
+    store = ResultStore(tmp_path, max_age_hours=1)
+    entry = store.save("old", io.BytesIO(CONTENT), "doc.md")
+    entry.created = time.time() - 7200
+    assert store.get("old") is None and store.entries() == []
+    store.evict()
+    assert len(store) == 0 and not store.blob_path(entry.digest).exists()
+
+
+def test_size_limit_evicts_oldest_first(tmp_path):
+    store = ResultStore(tmp_path)
+    store.max_total_bytes = 2500
+    for i in range(3):
+        # 随机内容几乎无法压缩，每个结果约 1000 字节
+        store.save(f"job{i}", io.BytesIO(os.urandom(1000)), "doc.md")
+    assert store.get("job0") is None
+    assert store.get("job1") is not None and store.get("job2") is not None
+
+
+def test_load_only_removes_its_own_files(tmp_path):
+    store = ResultStore(tmp_path)
+    store.save("job", io.BytesIO(CONTENT), "doc.md")
+    own_orphan = tmp_path / ("a" * 64 + ".gz")
+    own_tmp = tmp_path / ("b" * 32 + ".tmp")
+    foreign = [tmp_path / "archive.gz", tmp_path / "notes.tmp"]
+    for path in [own_orphan, own_tmp, *foreign]:
+        path.write_bytes(b"x")
+    reloaded = ResultStore(tmp_path)
+    assert len(reloaded) == 1
+    assert not own_orphan.exists() and not own_tmp.exists()
+    assert all(path.exists() for path in foreign)
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=95-200", 100) == (95, 99)
+    assert parse_range("bytes=100-", 100) == "invalid"
+    assert parse_range("bytes=0-1,5-6", 100) is None
+
+
+def test_response_etag_and_ranges(tmp_path):
+    store = ResultStore(tmp_path)
+    entry = store.save("job", io.BytesIO(CONTENT), "doc.md")
+
+    plain = result_response(make_request(), store, entry)
+    assert plain.status_code == 200 and "content-encoding" not in plain.headers
+    assert asyncio.run(read_body(plain)) == CONTENT
+    etag = plain.headers["etag"]
+
+    assert result_response(make_request(if_none_match=etag), store, entry).status_code == 304
+
+    partial = result_response(make_request(range="bytes=100-199"), store, entry)
+    assert partial.status_code == 206
+    assert partial.headers["content-range"] == f"bytes 100-199/{len(CONTENT)}"
+    assert asyncio.run(read_body(partial)) == CONTENT[100:200]
+
+    # 范围作用于发送的表示：gzip 编码时是压缩后的字节
+    compressed = result_response(make_request(accept_encoding="gzip"), store, entry)
+    assert compressed.headers["content-encoding"] == "gzip" and compressed.headers["etag"] != etag
+    assert gzip.decompress(asyncio.run(read_body(compressed))) == CONTENT
+
+    stale = result_response(make_request(range="bytes=0-9", if_range='"other"'), store, entry)
+    assert stale.status_code == 200
+    invalid = result_response(make_request(range=f"bytes={len(CONTENT)}-"), store, entry)
+    assert invalid.status_code == 416
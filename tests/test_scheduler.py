@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from src.scheduler import PRIORITY_BULK, PRIORITY_INTERACTIVE, JobScheduler
+
+
+async def grant_order(scheduler, jobs, requests_per_job):
+    """Job ids in the order their queued requests get a slot (capacity 1, every request queued first)"""
+    order = []
+    blocker = scheduler.register("blocker", "blocker")
+    await blocker.acquire()
+
+    async def request(job):
+        async with job:
+            order.append(job.job_id)
+            await asyncio.sleep(0)
+
+    tasks = [asyncio.create_task(request(job)) for _ in range(requests_per_job) for job in jobs]
+    await asyncio.sleep(0)
+    blocker.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+async def peak_running(scheduler, jobs, requests_per_job):
+    """Highest number of requests running at once, per job and in total"""
+    peaks = {job.job_id: 0 for job in jobs}
+    peak_total = 0
+
+    async def request(job):
+        nonlocal peak_total
+        async with job:
+            peaks[job.job_id] = max(peaks[job.job_id], job.running)
+            peak_total = max(peak_total, scheduler.running)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*[request(job) for job in jobs for _ in range(requests_per_job)])
+    return peaks, peak_total
+
+
+def test_capacity_is_shared_by_all_jobs():
+    scheduler = JobScheduler(3)
+    jobs = [scheduler.register(f"job{i}", f"client{i}") for i in range(3)]
+    peaks, peak_total = asyncio.run(peak_running(scheduler, jobs, 5))
+    assert peak_total == 3
+    assert scheduler.running == 0
+
+
+def test_job_max_concurrent_caps_only_that_job():
+    scheduler = JobScheduler(4)
+    capped = scheduler.register("capped", "a", max_concurrent=1)
+    other = scheduler.register("other", "b")
+    peaks, peak_total = asyncio.run(peak_running(scheduler, [capped, other], 8))
+    assert peaks["capped"] == 1
+    assert peaks["other"] >= 3
+    # 任务的并发上限不改变调度器的总名额
+    assert scheduler.capacity == 4
+
+
+def test_client_max_concurrent():
+    scheduler = JobScheduler(4)
+    jobs = [scheduler.register("a1", "a", client_max_concurrent=1), scheduler.register("a2", "a")]
+    peaks, peak_total = asyncio.run(peak_running(scheduler, jobs, 4))
+    assert peak_total == 1
+
+
+def test_interactive_jobs_get_most_slots_without_starving_bulk():
+    scheduler = JobScheduler(1)
+    jobs = [scheduler.register("bulk", "c", PRIORITY_BULK), scheduler.register("interactive", "c")]
+    order = asyncio.run(grant_order(scheduler, jobs, 20))
+    assert order[:9].count("interactive") == 8
+    assert "bulk" in order[:10]
+
+
+def test_clients_share_slots_equally():
+    scheduler = JobScheduler(1)
+    jobs = [scheduler.register("a", "client-a", PRIORITY_BULK),
+            scheduler.register("b1", "client-b", PRIORITY_BULK),
+            scheduler.register("b2", "client-b", PRIORITY_BULK)]
+    order = asyncio.run(grant_order(scheduler, jobs, 10))
+    first = order[:10]
+    assert first.count("a") == 5
+    assert first.count("b1") + first.count("b2") == 5
+
+
+def test_unknown_priority():
+    with pytest.raises(ValueError):
+        JobScheduler(1).register("job", priority="urgent")
+
+
+def test_closed_job_frees_its_client():
+    scheduler = JobScheduler(2)
+    job = scheduler.register("job", "client", PRIORITY_INTERACTIVE)
+    job.close()
+    assert scheduler.report()["clients"] == {}
@@ -0,0 +1,56 @@
+from src.translation_memory import TranslationMemory, adapt_translation
+
+
+def test_adapt_carries_small_edits():
+    assert adapt_translation("Install version 1.2 of the tool.", "Install version 1.3 of the tool.",
+                             "安装 1.2 版本的工具。") == "安装 1.3 版本的工具。"
+    assert adapt_translation("Call get_user() first.", "Call get_account() first.",
+                             "先调用 get_user()。") == "先调用 get_account()。"
+
+
+def test_adapt_rejects_other_differences():
+    # 插入、过多的改动、旧文本在译文中出现多次或不是完整的词
+    assert adapt_translation("Run the tool.", "Run the new tool.", "运行工具。") is None
+    assert adapt_translation("a x b x c x d", "p x q x r x s", "a b c d") is None
+    assert adapt_translation("Use v2 here.", "Use v3 here.", "v2 与 v2") is None
+    assert adapt_translation("Use 2 here.", "Use 3 here.", "使用 v2。") is None
+
+
+def test_lookup_exact_and_similar():
+    memory = TranslationMemory()
+    source = "The quick brown fox jumps over the lazy dog near the river bank every morning."
+    memory.add(source, "敏捷的棕色狐狸……", "zh")
+    exact = memory.lookup(source, "zh")
+    assert exact.reused == "敏捷的棕色狐狸……" and exact.similarity == 1.0
+    similar = memory.lookup(source.replace("morning", "evening"), "zh")
+    assert similar is not None and similar.source == source
+    assert memory.lookup(source, "ja") is None
+
+
+def test_save_appends_and_reloads(tmp_path):
+    path = tmp_path / "memory.jsonl"
+    memory = TranslationMemory(str(path))
+    memory.add("First sentence of the document.", "第一句。", "zh")
+    memory.save()
+    memory.add("Second sentence of the document.", "第二句。", "zh")
+    memory.add("First sentence of the document.", "第一句（修订）。", "zh")
+    memory.save()
+    # 表头一行，每次保存追加新增或修改的条目
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 4
+
+    reloaded = TranslationMemory(str(path))
+    reloaded.load()
+    assert len(reloaded) == 2
+    assert reloaded.lookup("First sentence of the document.", "zh").reused == "第一句（修订）。"
+
+
+def test_damaged_lines_are_skipped(tmp_path):
+    path = tmp_path / "memory.jsonl"
+    memory = TranslationMemory(str(path))
+    memory.add("A sentence that is kept.", "保留的句子。", "zh")
+    memory.save()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"source": "trunc')
+    reloaded = TranslationMemory(str(path))
+    reloaded.load()
+    assert len(reloaded) == 1
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from tenacity import wait_none
+
+from config.translation_config import TranslationConfig
+from src.llm_backends import BackendError, StreamStalled
+from src.translator import DocumentTranslator
+
+PROVIDER = {"base_url": "http://127.0.0.1:1/v1", "model_name": "test-model", "backend": "native"}
+SOURCE = "Download the package and unpack it into a new folder, then install the dependencies."
+TRANSLATION = "下载软件包并将其解压到一个新文件夹中，然后安装依赖项。"
+
+
+@pytest.fixture
+def translator(monkeypatch):
+    # 重试不等待
+    monkeypatch.setattr(DocumentTranslator.translate_chunk_with_retry.retry, "wait", wait_none())
+    return DocumentTranslator(TranslationConfig(validate_output=True, target_language="zh-Hans"),
+                              provider="test", provider_settings=PROVIDER)
+
+
+def failing_then(translator, errors, response=TRANSLATION):
+    calls = []
+
+    async def complete(prompt, system=None, route=None, segments=(), content_type=None, preview=None):
+        calls.append(prompt)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return response
+
+    translator.complete = complete
+    return calls
+
+
+def test_failed_requests_are_retried(translator):
+    calls = failing_then(translator, [BackendError("HTTP 503: overloaded", status_code=503),
+                                      StreamStalled("Stream stalled")])
+    result = asyncio.run(translator.translate_chunk_async(SOURCE))
+    assert len(calls) == 3
+    assert result == TRANSLATION and result.issues == []
+
+
+def test_request_failing_every_attempt_is_a_translation_error(translator):
+    calls = failing_then(translator, [BackendError("HTTP 500: down", status_code=500)] * 3)
+    result = asyncio.run(translator.translate_chunk_async(SOURCE))
+    assert len(calls) == 3
+    assert result.startswith("[Translation Error]")
+    assert translator.validation_stats.checked == 0
+
+
+def test_other_errors_are_not_retried(translator):
+    calls = failing_then(translator, [KeyError("choices")])
+    result = asyncio.run(translator.translate_chunk_async(SOURCE))
+    assert len(calls) == 1
+    assert result.startswith("[Translation Error]")
+
+
+def test_scheduler_has_room_for_all_shards():
+    shards = [{"provider": "openrouter", "max_concurrent": 5}, {"provider": "siliconflow", "max_concurrent": 4}]
+    translator = DocumentTranslator(TranslationConfig(shards=shards), provider="test", provider_settings=PROVIDER)
+    assert translator.max_concurrent == 9
+    assert translator.scheduler.capacity >= 9
+    assert translator.effective_concurrency == 9
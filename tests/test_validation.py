@@ -0,0 +1,42 @@
+from src.validation import (
+    ISSUE_LENGTH, ISSUE_LINKS, ISSUE_PLACEHOLDERS, ISSUE_STRUCTURE, ISSUE_UNTRANSLATED, OutputValidator
+)
+
+SOURCE = ("## Installation\n\n"
+          "Download the package from https://example.com/download and unpack it into a new folder. "
+          "Then run __CODE_BLOCK_0__ to install the dependencies and start the server on your machine.\n\n"
+          "- Step one\n- Step two\n")
+TRANSLATION = ("## 安装\n\n"
+               "从 https://example.com/download 下载软件包，并将其解压到一个新文件夹中。"
+               "然后运行 __CODE_BLOCK_0__ 安装依赖项，并在你的计算机上启动服务器，完成全部的安装和配置步骤。\n\n"
+               "- 第一步\n- 第二步\n")
+
+
+def test_good_translation_passes():
+    assert OutputValidator("zh-Hans").check(SOURCE, TRANSLATION) == []
+
+
+def test_missing_placeholder_and_link():
+    response = TRANSLATION.replace("__CODE_BLOCK_0__", "命令").replace("https://example.com/download", "官网")
+    issues = OutputValidator("zh-Hans").check(SOURCE, response)
+    assert ISSUE_PLACEHOLDERS in issues and ISSUE_LINKS in issues
+
+
+def test_merged_structure():
+    response = TRANSLATION.replace("- 第一步\n- 第二步\n", "第一步，第二步\n").replace("## 安装", "安装")
+    assert ISSUE_STRUCTURE in OutputValidator("zh-Hans").check(SOURCE, response)
+
+
+def test_untranslated_response():
+    assert ISSUE_UNTRANSLATED in OutputValidator("zh-Hans").check(SOURCE, SOURCE)
+    # 原文与目标语言同为拉丁字母时，只能发现原样返回的情况
+    assert ISSUE_UNTRANSLATED in OutputValidator("fr").check(SOURCE, SOURCE)
+
+
+def test_truncated_response():
+    source = "Download the package and unpack it into a new folder, then install the dependencies. " * 3
+    assert ISSUE_LENGTH in OutputValidator("zh-Hans").check(source, "下载软件包，然后解压到新文件夹中。")
+
+
+def test_short_segments_skip_length_and_script_checks():
+    assert OutputValidator("zh-Hans").check("Save", "Save") == []
@@ -1,27 +1,35 @@
-from fastapi import FastAPI, Request, UploadFile, File, Form, Response
+from fastapi import FastAPI, Request, UploadFile, File, Form, Query, Response
 from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from src.translator import DocumentTranslator
+from src.translator import DocumentTranslator, start_background_warmup
+from src.archive import is_archive
+from src.cancellation import CancellationToken, TranslationCancelled
+from src.scheduler import PRIORITY_WEIGHTS, get_scheduler
+from src.result_store import (
+    DEFAULT_MAX_AGE_HOURS, DEFAULT_MAX_TOTAL_MB, ResultStore, StoredResult, get_result_store
+)
+from src.job_history import DEFAULT_HISTORY_PATH, LatencyModel, get_job_history
+from src.planner import plan_translation
+from config.translation_config import TUNE_APPLY, TranslationConfig
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 import uvicorn
 from pathlib import Path
+from typing import List
+import asyncio
+import collections
+import io
 import json
+import multiprocessing
 import sys
 import os
+import re
+import tempfile
+import uuid
 
-# Function to get the correct path for resources, works for both development and PyInstaller
-def get_resource_path(relative_path):
-    """Get absolute path to resource, works for dev and for PyInstaller"""
-    try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        base_path = sys._MEIPASS
-    except AttributeError:
-        # Running in development mode
-        base_path = os.path.abspath(".")
-    
-    return os.path.join(base_path, relative_path)
+from config.paths import get_resource_path
 
 # Create FastAPI instance
 app = FastAPI(title="Infinity Translator")
@@ -43,8 +51,8 @@ def get_settings():
     return load_settings()
 
 # Get paths for static and templates directories
-static_dir = get_resource_path("static")
-templates_dir = get_resource_path("templates")
+static_dir = str(get_resource_path("static"))
+templates_dir = str(get_resource_path("templates"))
 
 # Ensure directories exist
 if not os.path.exists(static_dir):
@@ -61,6 +69,11 @@ templates = Jinja2Templates(directory=templates_dir)
 # Load settings
 settings = get_settings()
 
+@app.on_event("startup")
+async def warmup_translator():
+    # Load the translation stack in the background so the first request is not slowed down
+    start_background_warmup()
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request, "settings": settings})
@@ -133,14 +146,14 @@ async def set_language(request: Request):
 from src.progress import TranslationProgress
 
 @app.get("/translate-progress")
-async def translation_progress():
-    """Server-Sent Events endpoint for getting translation progress"""
+async def translation_progress(job_id: str = None):
+    """Server-Sent Events endpoint for getting translation progress (of one job if job_id is given)"""
     from src.progress import TranslationProgress
     import asyncio
     import json
     
     progress = await TranslationProgress.get_instance()
-    queue = await progress.subscribe()
+    queue = await progress.subscribe(job_id)
     
     async def event_generator():
         try:
@@ -155,12 +168,252 @@ async def translation_progress():
         media_type="text/event-stream"
     )
 
+# Running translations by job id, so they can be cancelled
+active_jobs = {}
+
+def client_id(request: Request) -> str:
+    """Client a job is scheduled for: the X-Client-Id header, else the client address"""
+    return request.headers.get("x-client-id") or (request.client.host if request.client else "default")
+
+# How often /translate checks whether the client is still connected (seconds)
+DISCONNECT_POLL_INTERVAL = 1.0
+
+async def cancel_on_disconnect(request: Request, token: CancellationToken):
+    """Cancel the job as soon as the client closes the connection"""
+    while not token.cancelled:
+        if await request.is_disconnected():
+            token.cancel("client disconnected")
+            return
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+@app.post("/translate/{job_id}/cancel")
+async def cancel_translation(job_id: str):
+    token = active_jobs.get(job_id)
+    if token is None:
+        return JSONResponse(status_code=404, content={"message": "No running translation with this id"})
+    token.cancel("cancelled by user")
+    return JSONResponse(content={"status": "cancelled"})
+
+# Stage traces and profiles of recent jobs (only jobs run with trace/profile enabled)
+job_reports = collections.OrderedDict()
+MAX_JOB_REPORTS = 20
+
+def keep_job_report(job_id: str, translator: DocumentTranslator):
+    if not translator.tracer.enabled and translator.profiler is None:
+        return
+    job_reports[job_id] = (translator.tracer, translator.profiler)
+    while len(job_reports) > MAX_JOB_REPORTS:
+        job_reports.popitem(last=False)
+
+@app.get("/translate/{job_id}/trace")
+async def get_job_trace(job_id: str, format: str = "json"):
+    """Per-stage timings of a job: format=json (spans and summary) or chrome (chrome://tracing, Perfetto)"""
+    tracer = job_reports.get(job_id, (None, None))[0]
+    if tracer is None or not tracer.enabled:
+        return JSONResponse(status_code=404, content={"message": "No trace for this job"})
+    if format == "chrome":
+        return JSONResponse(content=tracer.to_chrome_trace(),
+                            headers={'Content-Disposition': f'attachment; filename="{job_id}.trace.json"'})
+    return JSONResponse(content=tracer.to_json())
+
+@app.get("/translate/{job_id}/profile")
+async def get_job_profile(job_id: str, format: str = "json"):
+    """cProfile results of a job: format=json, text or pstats (for snakeviz and similar tools)"""
+    profiler = job_reports.get(job_id, (None, None))[1]
+    if profiler is None:
+        return JSONResponse(status_code=404, content={"message": "No profile for this job"})
+    if format == "text":
+        return Response(profiler.to_text(), media_type="text/plain")
+    if format == "pstats":
+        return Response(profiler.to_pstats(), media_type="application/octet-stream",
+                        headers={'Content-Disposition': f'attachment; filename="{job_id}.prof"'})
+    return JSONResponse(content=profiler.to_json())
+
+@app.get("/api/queue")
+async def get_queue():
+    """Jobs sharing the LLM request slots, with their queue positions and waits"""
+    return JSONResponse(content=get_scheduler().report())
+
+# Finished translations can be kept compressed on disk so they can be downloaded again (opt-in)
+def result_store_for(settings: dict):
+    """The result store configured by "result_store" (a directory); None unless it is set"""
+    directory = settings.get("result_store")
+    if not directory:
+        return None
+    return get_result_store(directory, settings.get("result_max_age_hours", DEFAULT_MAX_AGE_HOURS),
+                            settings.get("result_max_total_mb", DEFAULT_MAX_TOTAL_MB))
+
+_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+def parse_range(header: str, length: int):
+    """(start, end) of a single-range Range header, None to send everything, or "invalid" (416)"""
+    match = _RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None  # 多段或无法识别的范围：按规范忽略，返回完整内容
+    start, end = match.groups()
+    if not start:
+        if not end or int(end) == 0:
+            return "invalid"
+        return max(0, length - int(end)), length - 1
+    start = int(start)
+    end = min(int(end), length - 1) if end else length - 1
+    if start >= length or start > end:
+        return "invalid"
+    return start, end
+
+def media_type(filename: str) -> str:
+    return 'application/zip' if filename.lower().endswith('.zip') else 'text/markdown'
+
+def result_response(request: Request, store: ResultStore, entry: StoredResult, headers: dict = None) -> Response:
+    """
+    Serve a stored result: gzip-encoded as stored if the client accepts it,
+    with ETag/If-None-Match and single byte ranges (of the representation sent).
+    """
+    use_gzip = "gzip" in request.headers.get("accept-encoding", "").lower()
+    etag = f'"{entry.digest}{"-gzip" if use_gzip else ""}"'
+    headers = dict(headers or {})
+    headers.update({
+        'Content-Disposition': f'attachment; filename="{entry.filename}"',
+        'ETag': etag,
+        'Vary': 'Accept-Encoding',
+        'Accept-Ranges': 'bytes',
+    })
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or
+                          etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    length = entry.compressed_size if use_gzip else entry.size
+    if use_gzip:
+        headers['Content-Encoding'] = 'gzip'
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) == etag:
+        byte_range = parse_range(range_header, length)
+    if byte_range == "invalid":
+        headers.pop('Content-Encoding', None)
+        return Response(status_code=416, headers={**headers, 'Content-Range': f'bytes */{length}'})
+
+    start, end = byte_range or (0, length - 1)
+    headers['Content-Length'] = str(end - start + 1)
+    if byte_range is not None:
+        headers['Content-Range'] = f'bytes {start}-{end}/{length}'
+    if request.method == "HEAD" or length == 0:
+        body = iter(())
+    else:
+        body = (store.read_compressed if use_gzip else store.read)(entry, start, end)
+    return StreamingResponse(body, status_code=206 if byte_range else 200, headers=headers,
+                             media_type=media_type(entry.filename))
+
+@app.get("/api/results")
+async def list_results(job_id: List[str] = Query(default=[])):
+    """Stored results of the jobs given as ?job_id=...; job ids grant access, so other jobs are never listed"""
+    store = result_store_for(get_settings())
+    requested = set(job_id)
+    entries = [entry for entry in store.entries() if entry.job_id in requested] if store is not None else []
+    return JSONResponse(content=[{"job_id": entry.job_id, "filename": entry.filename, "size": entry.size,
+                                  "compressed_size": entry.compressed_size, "created": entry.created,
+                                  "url": f"/results/{entry.job_id}"} for entry in entries])
+
+@app.api_route("/results/{job_id}", methods=["GET", "HEAD"])
+async def download_result(request: Request, job_id: str):
+    store = result_store_for(get_settings())
+    entry = store.get(job_id) if store is not None else None
+    if entry is None:
+        return JSONResponse(status_code=404, content={"message": "No stored result for this job"})
+    return result_response(request, store, entry, {'X-Job-Id': job_id})
+
+@app.delete("/results/{job_id}")
+async def delete_result(job_id: str):
+    store = result_store_for(get_settings())
+    if store is None or not store.delete(job_id):
+        return JSONResponse(status_code=404, content={"message": "No stored result for this job"})
+    return JSONResponse(content={"status": "deleted"})
+
+def job_history_path(settings: dict):
+    """The job history file configured by "job_history" (false disables it)"""
+    return settings.get("job_history", str(DEFAULT_HISTORY_PATH)) or None
+
+TUNING_SETTINGS = ("auto_tune", "tune_objective", "max_error_rate", "max_tuned_concurrency")
+
+def tuning_settings(settings: dict) -> dict:
+    """TranslationConfig fields for auto-tuning set in settings ("auto_tune": "off", "recommend" or "apply")"""
+    return {name: settings[name] for name in TUNING_SETTINGS if settings.get(name) is not None}
+
+@app.get("/api/tuning")
+async def get_tuning(model_name: str = None, context_mode: str = None, target_language: str = None):
+    """Measured throughput per chunk size and concurrency, and the recommended settings for the next job"""
+    settings = get_settings()
+    active_provider = settings["active_provider"]
+    provider_info = dict(settings["providers"][active_provider])
+    if model_name:
+        provider_info["model_name"] = model_name
+    history = job_history_path(settings)
+    if not history:
+        return JSONResponse(status_code=404, content={"message": "The job history is disabled"})
+    config = TranslationConfig(job_history=history, target_language=target_language,
+                               max_concurrent_requests=settings.get("max_concurrent_requests"),
+                               **tuning_settings(settings))
+    if context_mode:
+        config.context_mode = context_mode
+    try:
+        translator = DocumentTranslator(config, provider=active_provider, provider_settings=provider_info)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
+    tuning = translator.recommend_settings(explore=config.auto_tune == TUNE_APPLY)
+    return JSONResponse(content=dict(tuning.to_dict(), provider=active_provider,
+                                     model_name=provider_info.get("model_name"),
+                                     target_language=translator.resolve_target_language(),
+                                     context_mode=config.context_mode, auto_tune=config.auto_tune,
+                                     objective=config.tune_objective))
+
+@app.post("/plan")
+async def plan(file: UploadFile = File(...), model_name: str = Form(None), sections: bool = Form(True)):
+    """Sections, chunks, token estimates and projected wall time of a translation, without calling the model"""
+    settings = get_settings()
+    active_provider = settings["active_provider"]
+    provider_info = dict(settings["providers"][active_provider])
+    if model_name:
+        provider_info["model_name"] = model_name
+    config = TranslationConfig(shards=settings.get("shards"), job_history=job_history_path(settings),
+                               max_concurrent_requests=settings.get("max_concurrent_requests"),
+                               **tuning_settings(settings))
+    translator = DocumentTranslator(config, provider=active_provider, provider_settings=provider_info)
+    # Plan with the chunk size and concurrency the job would use after auto-tuning
+    translator.tune()
+    config = translator.config
+    history = job_history_path(settings)
+    latency = (get_job_history(history).latency_model(active_provider, provider_info.get("model_name"))
+               if history else LatencyModel())
+    total_chars = file.file.seek(0, os.SEEK_END)
+    file.file.seek(0)
+    lines = io.TextIOWrapper(file.file, encoding='utf-8')
+    try:
+        # Same windows as translate_stream, which /translate uses
+        result = await plan_translation(translator, lines, latency, total_chars, config.stream_window_chars,
+                                        include_sections=sections)
+    except UnicodeDecodeError:
+        return JSONResponse(status_code=400, content={"message": "The file is not UTF-8 text"})
+    finally:
+        lines.detach()
+    if translator.tuning is not None:
+        result["tuning"] = translator.tuning.to_dict()
+    return JSONResponse(content=dict(result, file=file.filename, provider=active_provider,
+                                     model_name=provider_info.get("model_name")))
+
 @app.post("/translate")
-async def translate(file: UploadFile = File(...), model_name: str = Form(...)):
+async def translate(request: Request, file: UploadFile = File(...), model_name: str = Form(...),
+                    job_id: str = Form(None), trace: bool = Form(False), profile: bool = Form(False),
+                    priority: str = Form(None)):
+    if priority and priority not in PRIORITY_WEIGHTS:
+        return JSONResponse(status_code=400, content={"message": f"Unknown priority '{priority}'"})
+    job_id = job_id or uuid.uuid4().hex
+    token = CancellationToken()
+    active_jobs[job_id] = token
+    watcher = asyncio.create_task(cancel_on_disconnect(request, token))
+    output_path = None
+    translator = None
     try:
-        content = await file.read()
-        text = content.decode('utf-8')
-        
         # Get settings and update model name
         settings = get_settings()
         active_provider = settings["active_provider"]
@@ -171,22 +424,79 @@ async def translate(file: UploadFile = File(...), model_name: str = Form(...)):
         save_settings(settings)
         
         # Get translator instance and perform translation
-        translator = DocumentTranslator()
-        content_bytes, output_filename = await translator.translate_document(text, file.filename)
+        translator = DocumentTranslator(TranslationConfig(translation_memory=settings.get("translation_memory"),
+                                                           shards=settings.get("shards"),
+                                                           trace=trace or settings.get("trace_jobs", False),
+                                                           profile=profile, job_id=job_id,
+                                                           client_id=client_id(request), priority=priority,
+                                                           client_max_concurrent=settings.get("client_max_concurrent"),
+                                                           max_concurrent_requests=settings.get("max_concurrent_requests"),
+                                                           job_history=job_history_path(settings),
+                                                           **tuning_settings(settings)))
+        # The upload is spooled to disk by Starlette; read it line by line and write
+        # the translation to a temporary file so large documents are never held in memory
+        if is_archive(file.filename, file.file):
+            # A zip of markdown files is translated as one job into a zip with the same layout
+            with tempfile.NamedTemporaryFile(prefix="infinity_translator_", suffix=".zip", delete=False) as output:
+                output_path = output.name
+                output_filename = await translator.translate_archive(file.file, file.filename, output, token)
+        else:
+            total_chars = file.file.seek(0, os.SEEK_END)
+            file.file.seek(0)
+            lines = io.TextIOWrapper(file.file, encoding='utf-8')
+            try:
+                with tempfile.NamedTemporaryFile(prefix="infinity_translator_", suffix=".md",
+                                                 delete=False) as output:
+                    output_path = output.name
+                    output_filename = await translator.translate_stream(lines, file.filename, output,
+                                                                        total_chars, token)
+            finally:
+                # 不分离的话，包装器被回收时会关闭 UploadFile 的临时文件
+                lines.detach()
         
-        # Return translated file
+        store = result_store_for(settings)
+        if store is not None:
+            # Keep the result (compressed) so it can be downloaded again from /results/{job_id}
+            try:
+                with open(output_path, 'rb') as result:
+                    entry = await asyncio.to_thread(store.save, job_id, result, output_filename)
+                return result_response(request, store, entry, {'X-Job-Id': job_id,
+                                                               'X-Result-Url': f'/results/{job_id}'})
+            except OSError as e:
+                print(f"Could not store the result: {str(e)}")
+
+        # Return translated file (removed once it has been sent)
         headers = {
-            'Content-Disposition': f'attachment; filename="{output_filename}"'
+            'Content-Disposition': f'attachment; filename="{output_filename}"',
+            'X-Job-Id': job_id,
         }
-        return Response(content_bytes, headers=headers, media_type='text/markdown')
+        response = FileResponse(output_path, headers=headers, media_type=media_type(output_filename),
+                                background=BackgroundTask(os.unlink, output_path))
+        output_path = None
+        return response
         
+    except TranslationCancelled as e:
+        print(f"Translation cancelled: {str(e)}")
+        # 499: client closed request (nginx convention)
+        return JSONResponse(status_code=499, content={"message": "Translation cancelled"})
     except Exception as e:
         print(f"Translation error: {str(e)}")
         return JSONResponse(status_code=500, content={"message": f"Translation failed: {str(e)}"})
+    finally:
+        watcher.cancel()
+        active_jobs.pop(job_id, None)
+        if translator is not None:
+            keep_job_report(job_id, translator)
+        if output_path is not None:
+            os.unlink(output_path)
 
 def start_web_server():
     """Start the web server (for standalone web mode)"""
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    # The port can be overridden for benchmarks or when 8000 is taken
+    port = int(os.getenv("INFINITY_TRANSLATOR_PORT", "8000"))
+    uvicorn.run(app, host="127.0.0.1", port=port)
 
 if __name__ == "__main__":
+    # Worker processes (document preprocessing) re-run the entry point when frozen by PyInstaller
+    multiprocessing.freeze_support()
     start_web_server()
\ No newline at end of file